@@ -0,0 +1,441 @@
+# -*- coding:utf8 -*-
+"""
+内置DNS应答模块
+在独立线程的asyncio事件循环中监听UDP/TCP，直接从内存中用当前WAN口IP应答配置域名的A查询，
+允许的客户端的其他查询转发到上游DNS，其余拒绝
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 报文头：ID、标志、问题数、回答数、授权数、附加数
+_HEADER = struct.Struct('!HHHHHH')
+# 回答记录：名称压缩指针（指向问题中的域名）、类型、类、TTL、数据长度
+_ANSWER = struct.Struct('!HHHIH')
+_NAME_POINTER = 0xC00C
+
+TYPE_A = 1
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+RCODE_REFUSED = 5
+
+_FLAG_QR = 0x8000
+_FLAG_AA = 0x0400
+_FLAG_RD = 0x0100
+_FLAG_RA = 0x0080
+_OPCODE_MASK = 0x7800
+
+# 默认允许转发的客户端：本机和私有网络，避免成为开放的DNS转发器
+DEFAULT_FORWARD_ALLOW = ('127.0.0.0/8', '::1/128', '10.0.0.0/8', '172.16.0.0/12',
+                         '192.168.0.0/16', '169.254.0.0/16', 'fc00::/7', 'fe80::/10')
+
+
+class DnsFormatError(ValueError):
+    """无法解析的DNS报文"""
+
+
+def parse_question(packet: bytes) -> Tuple[int, int, str, int, int, int]:
+    """
+    解析查询报文中的第一个问题
+
+    Returns:
+        tuple: (ID, 标志, 小写域名, 类型, 类, 问题部分结束的位置)
+    """
+    if len(packet) < _HEADER.size:
+        raise DnsFormatError("报文过短")
+    query_id, flags, qdcount, _, _, _ = _HEADER.unpack_from(packet)
+    if qdcount != 1 or flags & _FLAG_QR:
+        raise DnsFormatError("不是单个问题的查询")
+    labels = []
+    position = _HEADER.size
+    while True:
+        if position >= len(packet):
+            raise DnsFormatError("域名不完整")
+        length = packet[position]
+        position += 1
+        if length == 0:
+            break
+        if length > 63:
+            # 查询中的问题不应使用压缩指针
+            raise DnsFormatError("无效的标签长度")
+        labels.append(packet[position:position + length])
+        position += length
+    if position + 4 > len(packet):
+        raise DnsFormatError("问题不完整")
+    qtype, qclass = struct.unpack_from('!HH', packet, position)
+    name = b'.'.join(labels).decode('ascii', 'replace').lower()
+    return query_id, flags, name, qtype, qclass, position + 4
+
+
+def build_query(name: str, qtype: int = TYPE_A, query_id: int = 0) -> bytes:
+    """构造查询报文（供测试和压测使用）"""
+    question = b''.join(bytes([len(label)]) + label.encode('ascii')
+                        for label in name.rstrip('.').split('.'))
+    return (_HEADER.pack(query_id, _FLAG_RD, 1, 0, 0, 0) + question + b'\x00' +
+            struct.pack('!HH', qtype, CLASS_IN))
+
+
+def parse_response(packet: bytes) -> Tuple[int, int, List[str]]:
+    """
+    解析本模块生成的应答报文（供测试和压测使用）
+
+    Returns:
+        tuple: (ID, 响应码, A记录的IP列表)
+    """
+    query_id, flags, _, ancount, _, _ = _HEADER.unpack_from(packet)
+    position = _HEADER.size
+    while packet[position]:
+        position += packet[position] + 1
+    position += 5
+    addresses = []
+    for _ in range(ancount):
+        _, rtype, _, _, length = _ANSWER.unpack_from(packet, position)
+        position += _ANSWER.size
+        if rtype == TYPE_A and length == 4:
+            addresses.append(socket.inet_ntoa(packet[position:position + 4]))
+        position += length
+    return query_id, flags & 0x000F, addresses
+
+
+class DnsResponder:
+    """配置域名的权威应答器"""
+
+    def __init__(self, listen: str = '127.0.0.1', port: int = 53, ttl: int = 30,
+                 upstream: Optional[str] = None, tcp: bool = True,
+                 forward_timeout: float = 2.0, forward_allow=DEFAULT_FORWARD_ALLOW,
+                 max_forwards: int = 64, source_order: Optional[List[str]] = None):
+        """
+        Args:
+            listen: 监听地址，默认只监听本机
+            port: 监听端口（53需要root权限或 CAP_NET_BIND_SERVICE）
+            ttl: 应答的TTL（秒），IP会变化，宜设置得较短
+            upstream: 上游DNS（host 或 host:port），其他域名的查询转发到该地址，None表示拒绝
+            tcp: 是否同时监听TCP
+            forward_timeout: 等待上游应答的超时（秒）
+            forward_allow: 允许转发查询的客户端网络（CIDR），其他客户端只能查询配置的域名
+            max_forwards: 同时等待上游应答的查询数上限，超出时直接返回SERVFAIL
+            source_order: 来源的优先顺序（舰队配置中的路由器顺序），同一域名由多个来源提供时
+                排在前面的来源生效，未列出的来源按名称排在其后
+        """
+        self.listen = listen
+        self.port = port
+        self.ttl = ttl
+        self.upstream = self._parse_upstream(upstream) if upstream else None
+        self.tcp = tcp
+        self.forward_timeout = forward_timeout
+        self.forward_allow = [ipaddress.ip_network(network, strict=False)
+                              for network in forward_allow]
+        self.max_forwards = max_forwards
+        self._forward_slots = None
+
+        # 来源（路由器名称） -> (IP, 域名列表)；合并后的 域名 -> A记录数据
+        self._sources: Dict[str, Tuple[str, List[str]]] = {}
+        self._records: Dict[str, bytes] = {}
+        self._sources_lock = threading.Lock()
+        self._source_rank = {source: rank for rank, source in enumerate(source_order or [])}
+        # 域名 -> 提供该域名的来源（按优先顺序），只在冲突变化时记录日志
+        self._conflicts: Dict[str, Tuple[str, ...]] = {}
+
+        self.stats = {'queries': 0, 'answered': 0, 'forwarded': 0,
+                      'refused': 0, 'overloaded': 0, 'errors': 0}
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_error = None
+
+    @classmethod
+    def from_config(cls, config, source_order: Optional[List[str]] = None) -> 'DnsResponder':
+        """根据配置创建应答器，source_order 为舰队模式下的路由器顺序"""
+        return cls(listen=config.get('dns_listen', '127.0.0.1'),
+                   port=config.get('dns_port', 53),
+                   ttl=config.get('dns_ttl', 30),
+                   upstream=config.get('dns_upstream'),
+                   tcp=config.get('dns_tcp', True),
+                   forward_allow=config.get('dns_forward_allow') or DEFAULT_FORWARD_ALLOW,
+                   max_forwards=config.get('dns_max_forwards', 64),
+                   source_order=source_order)
+
+    @staticmethod
+    def _parse_upstream(upstream: str) -> Tuple[str, int]:
+        """解析 host 或 host:port（IPv6地址不带端口）"""
+        if upstream.count(':') == 1:
+            host, port = upstream.split(':')
+            return host, int(port)
+        return upstream, 53
+
+    # ---- 记录 ----
+
+    def update_records(self, source: str, ip: str, domains: List[str]):
+        """
+        更新某个路由器的域名和IP，替换后立即对新查询生效
+
+        同一域名由多个来源提供时按 source_order 决定，与各来源更新的先后无关
+
+        Args:
+            source: 来源名称，舰队模式下为路由器名称
+            ip: 当前WAN口IP
+            domains: 指向该IP的域名列表
+        """
+        with self._sources_lock:
+            self._sources[source] = (ip, list(domains))
+            records = {}
+            owners: Dict[str, List[str]] = {}
+            for name in sorted(self._sources, key=self._source_key):
+                source_ip, source_domains = self._sources[name]
+                rdata = socket.inet_aton(source_ip)
+                for domain in source_domains:
+                    domain = domain.rstrip('.').lower()
+                    records.setdefault(domain, rdata)
+                    owners.setdefault(domain, []).append(name)
+            # 整体替换，事件循环线程读取时不需要加锁
+            self._records = records
+            self._log_conflicts(owners)
+        logging.info(f"DNS应答记录已更新: {len(records)} 个域名")
+
+    def _source_key(self, source: str) -> Tuple[int, str]:
+        return self._source_rank.get(source, len(self._source_rank)), source
+
+    def _log_conflicts(self, owners: Dict[str, List[str]]):
+        """记录新出现或变化的域名冲突"""
+        conflicts = {domain: tuple(sources) for domain, sources in owners.items()
+                     if len(sources) > 1}
+        for domain, sources in conflicts.items():
+            if self._conflicts.get(domain) != sources:
+                logging.warning(f"域名 {domain} 同时由 {', '.join(sources)} 提供，"
+                                f"使用 {sources[0]} 的IP")
+        self._conflicts = conflicts
+
+    def lookup(self, name: str) -> Optional[str]:
+        """查询域名当前应答的IP"""
+        rdata = self._records.get(name.rstrip('.').lower())
+        return socket.inet_ntoa(rdata) if rdata else None
+
+    # ---- 应答 ----
+
+    def _reply(self, packet: bytes, query_id: int, flags: int, question_end: int,
+               rcode: int, rdata: Optional[bytes] = None, authoritative: bool = True) -> bytes:
+        """按查询报文中的问题构造应答，问题部分原样返回（保留域名大小写）"""
+        reply_flags = (_FLAG_QR | (flags & (_OPCODE_MASK | _FLAG_RD)) | rcode |
+                       (_FLAG_AA if authoritative else 0) | (_FLAG_RA if self.upstream else 0))
+        header = _HEADER.pack(query_id, reply_flags, 1, 1 if rdata else 0, 0, 0)
+        reply = header + packet[_HEADER.size:question_end]
+        if rdata:
+            reply += _ANSWER.pack(_NAME_POINTER, TYPE_A, CLASS_IN, self.ttl, len(rdata)) + rdata
+        return reply
+
+    def may_forward(self, client: Optional[str]) -> bool:
+        """客户端是否允许转发查询（client为None表示内部调用）"""
+        if client is None:
+            return True
+        try:
+            address = ipaddress.ip_address(client.split('%')[0])
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        return any(address in network for network in self.forward_allow)
+
+    def resolve_local(self, packet: bytes, client: Optional[str] = None
+                      ) -> Tuple[Optional[bytes], bool]:
+        """
+        用内存中的记录应答
+
+        Args:
+            packet: 查询报文
+            client: 客户端地址，用于判断是否允许转发
+
+        Returns:
+            tuple: (应答报文, 是否需要转发)；无法解析的报文返回 (None, False)
+        """
+        self.stats['queries'] += 1
+        try:
+            query_id, flags, name, qtype, qclass, question_end = parse_question(packet)
+        except DnsFormatError:
+            self.stats['errors'] += 1
+            if len(packet) < 4 or struct.unpack_from('!H', packet, 2)[0] & _FLAG_QR:
+                # 不应答应答报文，避免两个DNS服务之间互相反射
+                return None, False
+            query_id = struct.unpack_from('!H', packet)[0]
+            return _HEADER.pack(query_id, _FLAG_QR | RCODE_FORMERR, 0, 0, 0, 0), False
+
+        rdata = self._records.get(name)
+        if rdata is not None and qclass == CLASS_IN:
+            self.stats['answered'] += 1
+            # 非A类型的查询返回无数据（NOERROR且没有回答）
+            return self._reply(packet, query_id, flags, question_end, RCODE_NOERROR,
+                               rdata if qtype == TYPE_A else None), False
+        if self.upstream and self.may_forward(client):
+            return None, True
+        self.stats['refused'] += 1
+        return self._reply(packet, query_id, flags, question_end, RCODE_REFUSED,
+                           authoritative=False), False
+
+    async def handle(self, packet: bytes, client: Optional[str] = None,
+                     tcp: bool = False) -> Optional[bytes]:
+        """处理一个查询报文，返回应答报文"""
+        reply, forward = self.resolve_local(packet, client)
+        if forward:
+            return await self.forward(packet, tcp)
+        return reply
+
+    def _servfail(self, packet: bytes) -> bytes:
+        query_id, flags, _, _, _, question_end = parse_question(packet)
+        return self._reply(packet, query_id, flags, question_end, RCODE_SERVFAIL,
+                           authoritative=False)
+
+    async def forward(self, packet: bytes, tcp: bool = False) -> bytes:
+        """
+        转发到上游，上游无应答或同时转发的查询过多时返回SERVFAIL
+
+        TCP客户端的查询通过TCP转发，上游被截断的UDP应答不会原样交给TCP客户端
+        """
+        if self._forward_slots is None:
+            self._forward_slots = asyncio.Semaphore(self.max_forwards)
+        if self._forward_slots.locked():
+            # 不排队等待：上游变慢时积压的查询和套接字不会无限增长
+            self.stats['overloaded'] += 1
+            return self._servfail(packet)
+        async with self._forward_slots:
+            self.stats['forwarded'] += 1
+            try:
+                if tcp:
+                    return await asyncio.wait_for(self._forward_tcp(packet), self.forward_timeout)
+                return await self._forward(packet)
+            except Exception as e:
+                logging.debug(f"转发DNS查询失败: {e}")
+                self.stats['errors'] += 1
+                return self._servfail(packet)
+
+    async def _forward_tcp(self, packet: bytes) -> bytes:
+        """通过TCP把查询转发到上游并读取应答"""
+        reader, writer = await asyncio.open_connection(*self.upstream)
+        try:
+            writer.write(struct.pack('!H', len(packet)) + packet)
+            await writer.drain()
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    async def _forward(self, packet: bytes) -> bytes:
+        """通过UDP把查询原样转发到上游并等待应答"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ForwardProtocol(future), remote_addr=self.upstream)
+        try:
+            transport.sendto(packet)
+            return await asyncio.wait_for(future, self.forward_timeout)
+        finally:
+            transport.close()
+
+    # ---- 运行 ----
+
+    def start(self):
+        """在后台线程中启动监听，端口绑定失败时抛出异常"""
+        self._ready.clear()
+        self._start_error = None
+        self._thread = threading.Thread(target=self._run, name='dns-responder', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._start_error:
+            raise self._start_error
+        logging.info(f"DNS应答器已启动: {self.listen}:{self.port}"
+                     f"{'（UDP/TCP）' if self.tcp else '（UDP）'}，"
+                     f"其他查询{'转发到 %s:%d' % self.upstream if self.upstream else '拒绝'}")
+
+    def stop(self):
+        """停止监听"""
+        if self._loop and self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stop_future.set_result, None)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            self._start_error = e
+        finally:
+            self._ready.set()
+            self._loop.close()
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
+        self._stop_future = loop.create_future()
+        self._forward_slots = asyncio.Semaphore(self.max_forwards)
+        udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpProtocol(self), local_addr=(self.listen, self.port))
+        if self.port == 0:
+            # 端口为0时使用系统分配的端口（测试用），TCP监听同一端口
+            self.port = udp_transport.get_extra_info('sockname')[1]
+        tcp_server = None
+        try:
+            if self.tcp:
+                tcp_server = await asyncio.start_server(self._handle_tcp, self.listen, self.port)
+            self._ready.set()
+            await self._stop_future
+        finally:
+            udp_transport.close()
+            if tcp_server:
+                tcp_server.close()
+                await tcp_server.wait_closed()
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """TCP连接：每个报文前有2字节长度，同一连接可以发送多个查询"""
+        peer = writer.get_extra_info('peername')
+        client = peer[0] if peer else ''
+        try:
+            while True:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+                reply = await self.handle(await reader.readexactly(length), client, tcp=True)
+                if reply is None:
+                    break
+                writer.write(struct.pack('!H', len(reply)) + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, responder: DnsResponder):
+        self.responder = responder
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        reply, forward = self.responder.resolve_local(data, addr[0])
+        if forward:
+            # 只有转发需要等待，本地应答直接在回调中发送
+            asyncio.ensure_future(self._forward(data, addr))
+        elif reply is not None:
+            self.transport.sendto(reply, addr)
+
+    async def _forward(self, data, addr):
+        reply = await self.responder.forward(data)
+        if not self.transport.is_closing():
+            self.transport.sendto(reply, addr)
+
+
+class _ForwardProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
@@ -0,0 +1,123 @@
+# -*- coding:utf8 -*-
+"""
+ds接口查询构造模块
+将多个数据表请求合并为一次 /stok=.../ds 请求，并按表拆分响应
+"""
+from typing import Any, Dict, List, Optional
+
+from utils import json_codec
+
+# stok失效时路由器返回的错误码
+ERROR_STOK_EXPIRED = -40401
+
+
+class DsResult:
+    """ds接口的查询结果，按模块和表名拆分"""
+
+    def __init__(self, body: Dict[str, Any]):
+        self.body = body
+        self.error_code = body.get('error_code', 0)
+
+    @property
+    def ok(self) -> bool:
+        """查询是否成功"""
+        return self.error_code == 0
+
+    @property
+    def stok_expired(self) -> bool:
+        """stok是否已失效"""
+        return self.error_code == ERROR_STOK_EXPIRED
+
+    def module(self, module: str) -> Dict[str, Any]:
+        """获取某个模块的全部结果"""
+        section = self.body.get(module)
+        return section if isinstance(section, dict) else {}
+
+    def name(self, module: str, name: str) -> Optional[Dict[str, Any]]:
+        """获取按名称查询的结果，如 network/wan_status"""
+        value = self.module(module).get(name)
+        return value if isinstance(value, dict) else None
+
+    def table(self, module: str, table: str) -> List[Dict[str, Any]]:
+        """
+        获取按表查询的结果，如 hosts_info/host_info
+
+        路由器返回的表行形如 {"host_info_1": {...}}，这里统一展开为行字典列表
+        """
+        rows = self.module(module).get(table) or []
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        result = []
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            if len(row) == 1:
+                value = next(iter(row.values()))
+                if isinstance(value, dict):
+                    row = value
+            result.append(row)
+        return result
+
+    @property
+    def wan_status(self) -> Optional[Dict[str, Any]]:
+        """WAN口状态"""
+        return self.name('network', 'wan_status')
+
+    @property
+    def host_table(self) -> List[Dict[str, Any]]:
+        """客户端设备表"""
+        return self.table('hosts_info', 'host_info')
+
+
+class DsQuery:
+    """ds接口批量查询构造器"""
+
+    def __init__(self, router=None):
+        """
+        Args:
+            router: 执行查询的RouterMonitor，仅构造payload时可以为None
+        """
+        self.router = router
+        self.modules = {}
+
+    def _add(self, module: str, kind: str, items) -> 'DsQuery':
+        section = self.modules.setdefault(module, {})
+        values = section.setdefault(kind, [])
+        for item in items:
+            if item not in values:
+                values.append(item)
+        return self
+
+    def name(self, module: str, *names: str) -> 'DsQuery':
+        """按名称查询，如 name('network', 'wan_status')"""
+        return self._add(module, 'name', names)
+
+    def table(self, module: str, *tables: str) -> 'DsQuery':
+        """按表查询，如 table('hosts_info', 'host_info')"""
+        return self._add(module, 'table', tables)
+
+    def merge(self, other: 'DsQuery') -> 'DsQuery':
+        """合并另一个查询的全部请求"""
+        for module, section in other.modules.items():
+            for kind, items in section.items():
+                self._add(module, kind, items)
+        return self
+
+    def build_payload(self) -> bytes:
+        """生成请求体"""
+        payload = {}
+        for module, section in self.modules.items():
+            payload[module] = {}
+            for kind, items in section.items():
+                # 单个表沿用路由器页面的字符串写法
+                if kind == 'table' and len(items) == 1:
+                    payload[module][kind] = items[0]
+                else:
+                    payload[module][kind] = list(items)
+        payload['method'] = 'get'
+        return json_codec.dumps_bytes(payload)
+
+    def execute(self, stok: str, **kwargs) -> Optional[DsResult]:
+        """使用给定stok执行查询"""
+        return self.router.execute_query(self, stok, **kwargs)
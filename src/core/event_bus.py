@@ -0,0 +1,247 @@
+# -*- coding:utf8 -*-
+"""
+事件总线模块
+轮询线程只发布事件，通知、hosts更新、Git推送、数据保存等副作用由各消费者的工作线程处理
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Event:
+    """事件基类"""
+
+    __slots__ = ('source', 'timestamp')
+
+    def __init__(self, source=None):
+        """
+        Args:
+            source: 发布事件的监控服务，消费者通过它访问对应路由器的组件
+        """
+        self.source = source
+        self.timestamp = time.time()
+
+
+class WanSampled(Event):
+    """获取到一次WAN状态"""
+
+    __slots__ = ('sample',)
+
+    def __init__(self, sample, source=None):
+        """
+        Args:
+            sample: 解析后的采样（core.models.WanSample）
+        """
+        super().__init__(source)
+        self.sample = sample
+
+
+class StartupObserved(Event):
+    """启动后首次获取到WAN口IP"""
+
+    __slots__ = ('ip',)
+
+    def __init__(self, ip: str, source=None):
+        super().__init__(source)
+        self.ip = ip
+
+
+class IpChanged(Event):
+    """WAN口IP发生变化"""
+
+    __slots__ = ('old_ip', 'new_ip')
+
+    def __init__(self, old_ip: str, new_ip: str, source=None):
+        super().__init__(source)
+        self.old_ip = old_ip
+        self.new_ip = new_ip
+
+
+class HostsRefresh(Event):
+    """配置变化后需要按当前IP重新生成hosts文件"""
+
+    __slots__ = ('ip',)
+
+    def __init__(self, ip: str, source=None):
+        super().__init__(source)
+        self.ip = ip
+
+
+class _Consumer:
+    """事件消费者：一个有界队列加一组工作线程"""
+
+    _STOP = object()
+
+    # 队列中全是不可丢弃的事件时，发布不可丢弃的事件最多等待的秒数
+    KEEP_TIMEOUT = 5.0
+
+    def __init__(self, name: str, handler: Callable[[Event], Any],
+                 event_types: Iterable[type], workers: int, maxsize: int,
+                 keep: Iterable[type] = ()):
+        self.name = name
+        self.handler = handler
+        self.event_types = tuple(event_types)
+        self.keep_types = tuple(keep)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self._stats_lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._work, name=f'{name}-{index}', daemon=True)
+            for index in range(max(workers, 1))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def offer(self, event: Event):
+        """
+        入队，队列满时丢弃最旧的可丢弃事件
+
+        keep 中的事件类型（如IP变化记录）不会被丢弃：队列中没有可丢弃的事件时，
+        新的可丢弃事件被丢弃，不可丢弃的事件等待队列空出位置
+        """
+        item = (time.monotonic(), event)
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            if self._evict_oldest():
+                self._count_dropped("队列已满，丢弃最旧的事件")
+                continue
+            if not isinstance(event, self.keep_types):
+                self._count_dropped(f"队列已满，丢弃新的 {type(event).__name__} 事件")
+                return
+            try:
+                self.queue.put(item, timeout=self.KEEP_TIMEOUT)
+                return
+            except queue.Full:
+                self._count_dropped(f"处理阻塞，{self.KEEP_TIMEOUT:.0f}秒内无法加入 "
+                                    f"{type(event).__name__} 事件，已丢弃")
+                return
+
+    def _evict_oldest(self) -> bool:
+        """删除队列中最旧的一个可丢弃事件，没有可丢弃的事件时返回False"""
+        with self.queue.mutex:
+            for index, item in enumerate(self.queue.queue):
+                if item is not self._STOP and not isinstance(item[1], self.keep_types):
+                    del self.queue.queue[index]
+                    # 相当于 get_nowait() + task_done()
+                    self.queue.unfinished_tasks -= 1
+                    self.queue.not_full.notify()
+                    return True
+        return False
+
+    def _count_dropped(self, message: str):
+        with self._stats_lock:
+            self.dropped += 1
+        logging.warning(f"事件消费者 {self.name} {message}")
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                enqueued_at, event = item
+                lag = time.monotonic() - enqueued_at
+                try:
+                    self.handler(event)
+                    with self._stats_lock:
+                        self.processed += 1
+                        self.last_lag = lag
+                except Exception as e:
+                    with self._stats_lock:
+                        self.errors += 1
+                    logging.error(f"事件消费者 {self.name} 处理 "
+                                  f"{type(event).__name__} 失败: {e}")
+            finally:
+                self.queue.task_done()
+
+    def oldest_age(self) -> float:
+        """队列中最旧事件已等待的秒数"""
+        with self.queue.mutex:
+            if not self.queue.queue:
+                return 0.0
+            oldest = self.queue.queue[0]
+        if oldest is self._STOP:
+            return 0.0
+        return time.monotonic() - oldest[0]
+
+    def stop(self, timeout: float):
+        """处理完已入队的事件后停止工作线程，最多等待timeout秒"""
+        deadline = time.monotonic() + timeout
+        for _ in self.threads:
+            try:
+                # 处理函数卡住且队列已满时不无限等待（工作线程是守护线程）
+                self.queue.put(self._STOP, timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                logging.warning(f"事件消费者 {self.name} 未能在 {timeout} 秒内处理完队列，"
+                                f"放弃等待")
+                return
+        for thread in self.threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+
+class EventBus:
+    """进程内事件总线"""
+
+    def __init__(self, default_maxsize: int = 100):
+        self.default_maxsize = default_maxsize
+        self.consumers: List[_Consumer] = []
+        self.published = 0
+
+    def subscribe(self, name: str, handler: Callable[[Event], Any],
+                  event_types: Iterable[type], workers: int = 1,
+                  maxsize: Optional[int] = None, keep: Iterable[type] = ()):
+        """
+        注册消费者
+
+        Args:
+            name: 消费者名称，用于统计和日志
+            handler: 事件处理函数，在消费者自己的工作线程中执行
+            event_types: 关心的事件类型
+            workers: 工作线程数，需要保证顺序的消费者应为1
+            maxsize: 队列容量
+            keep: 队列满时也不丢弃的事件类型
+        """
+        consumer = _Consumer(name, handler, event_types, workers,
+                             maxsize or self.default_maxsize, keep)
+        self.consumers.append(consumer)
+
+    def publish(self, event: Event):
+        """发布事件，不会阻塞调用方"""
+        self.published += 1
+        for consumer in self.consumers:
+            if isinstance(event, consumer.event_types):
+                consumer.offer(event)
+
+    def stop(self, timeout: float = 30):
+        """停止所有消费者"""
+        for consumer in self.consumers:
+            consumer.stop(timeout)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各消费者的队列深度和延迟
+
+        Returns:
+            dict: 消费者名称 -> 统计信息
+        """
+        stats = {}
+        for consumer in self.consumers:
+            with consumer._stats_lock:
+                stats[consumer.name] = {
+                    'depth': consumer.queue.qsize(),
+                    'oldest_age': consumer.oldest_age(),
+                    'last_lag': consumer.last_lag,
+                    'processed': consumer.processed,
+                    'dropped': consumer.dropped,
+                    'errors': consumer.errors
+                }
+        return stats
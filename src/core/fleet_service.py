@@ -0,0 +1,152 @@
+# -*- coding:utf8 -*-
+"""
+路由器舰队监控服务
+在单个进程内基于asyncio并发监控多台路由器
+"""
+import asyncio
+import logging
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from core.dns_responder import DnsResponder
+from core.event_bus import EventBus
+from core.monitor_service import RouterMonitorService
+from core.scheduler import PollScheduler
+from utils.config_manager import ConfigManager
+
+
+class FleetMonitorService:
+    """路由器舰队监控服务"""
+
+    def __init__(self, config_manager: Optional[ConfigManager] = None):
+        self.config_manager = config_manager or ConfigManager()
+
+        # 加载配置
+        self.config = self.config_manager.get_config() or self.config_manager.load_config()
+        if not self.config or not self.config.get('routers'):
+            raise Exception("配置文件中没有routers列表，舰队模式启动失败")
+
+        self.poll_interval = self.config.get('poll_interval', 60)
+
+        # 所有路由器共享一组事件消费者
+        self.event_bus = EventBus(self.config.get('event_queue_size', 100))
+        RouterMonitorService.register_consumers(self.event_bus, self.config)
+        self.sites = self._init_sites(self.config['routers'])
+        
+        # 所有路由器共用一个DNS应答器，各自的域名指向各自的WAN口IP，
+        # 同一域名由多台路由器提供时以配置中靠前的路由器为准
+        self.dns_responder = None
+        if self.config.get('dns_enabled', False):
+            self.dns_responder = DnsResponder.from_config(
+                self.config, source_order=[site.name for site in self.sites])
+
+        # 路由器客户端为阻塞式，统一放到有界线程池中执行，事件循环本身不阻塞
+        max_workers = self.config.get('fleet_workers', min(32, len(self.sites)))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='fleet')
+        # stok刷新使用单独的小线程池，轮询占满线程池（如路由器无响应）时刷新不会被推迟到过期之后
+        self.refresh_executor = ThreadPoolExecutor(
+            max_workers=self.config.get('fleet_refresh_workers', min(2, len(self.sites))),
+            thread_name_prefix='fleet-refresh')
+
+    def _init_sites(self, routers: List[Dict[str, Any]]) -> List[RouterMonitorService]:
+        """为每台路由器创建独立的监控服务（各自维护stok、上次IP和域名列表）"""
+        sites = []
+        names = set()
+        for index, router in enumerate(routers):
+            name = router.get('name') or router.get('host') or f'router{index + 1}'
+            if name in names:
+                raise Exception(f"路由器名称重复: {name}")
+            names.add(name)
+
+            # 读取时依次查找路由器自身配置、站点默认值、全局配置；
+            # stok等写入只落在路由器自身的配置项中，且不会读到全局的登录状态
+            site_defaults = {
+                'hosts_file': f'hosts_{name}',
+                'stok': '',
+                'encrypt_password': '',
+                'last_login_time': ''
+            }
+            site_config = ChainMap(router, site_defaults, self.config)
+            sites.append(RouterMonitorService(self.config_manager, site_config, name,
+                                              self.event_bus))
+            logging.info(f"已加载路由器 {name} ({site_config.get('host')})")
+        return sites
+
+    def run(self):
+        """启动舰队监控"""
+        logging.info(f"开始舰队监控，共 {len(self.sites)} 台路由器，"
+                     f"每 {self.poll_interval} 秒获取一次数据...")
+        self.dns_responder = RouterMonitorService.start_dns_responder(self.dns_responder)
+        for site in self.sites:
+            site.dns_responder = self.dns_responder
+        if self.config.get('config_hot_reload', True):
+            self.config_manager.watch(self.apply_config_changes,
+                                      self.config.get('config_watch_interval', 2))
+        try:
+            asyncio.run(self._run())
+        finally:
+            self.config_manager.stop_watching()
+            if self.dns_responder:
+                self.dns_responder.stop()
+            self.executor.shutdown(wait=False)
+            self.refresh_executor.shutdown(wait=False)
+            self.event_bus.stop()
+            for site in self.sites:
+                site.data_manager.close()
+
+    def apply_config_changes(self, changes: Dict[str, Any]):
+        """把热加载的配置分发给各路由器：顶层配置项影响所有路由器"""
+        if changes['routers_changed']:
+            logging.warning("路由器列表有增删，需要重启服务才能生效")
+        for site in self.sites:
+            keys = changes['keys'] | changes['routers'].get(site.name, set())
+            site.apply_config_changes(keys)
+
+    async def _run(self):
+        """并发运行所有路由器的监控循环"""
+        tasks = []
+        for index, site in enumerate(self.sites):
+            tasks.append(self._monitor_site(site, index))
+            tasks.append(self._refresh_site_session(site))
+        await asyncio.gather(*tasks)
+
+    async def _monitor_site(self, site: RouterMonitorService, index: int):
+        """单台路由器的监控循环"""
+        loop = asyncio.get_running_loop()
+
+        # 错开各路由器的首次轮询，避免所有请求集中在同一时刻
+        await asyncio.sleep(self.poll_interval * index / len(self.sites))
+        site.scheduler.start()
+
+        while True:
+            try:
+                outcome = await loop.run_in_executor(self.executor,
+                                                     site._check_wan_status)
+            except Exception as e:
+                logging.error(f"[{site.name}] 监控过程中发生错误: {e}")
+                outcome = PollScheduler.FAILED
+
+            await asyncio.sleep(site.scheduler.advance(outcome))
+
+    async def _refresh_site_session(self, site: RouterMonitorService):
+        """在stok过期前主动刷新（代替每台路由器一个后台线程）"""
+        loop = asyncio.get_running_loop()
+        session = site.session_manager
+
+        while True:
+            remaining = session.seconds_until_refresh()
+            wait = 30 if remaining is None else min(remaining, 30)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                refreshed = await loop.run_in_executor(self.refresh_executor,
+                                                       session.maybe_refresh)
+            except Exception as e:
+                logging.error(f"[{site.name}] 后台刷新stok失败: {e}")
+                refreshed = False
+            if not refreshed:
+                # 刷新失败时稍后再试，避免反复请求路由器
+                await asyncio.sleep(30)
@@ -0,0 +1,119 @@
+# -*- coding:utf8 -*-
+"""
+数据模型模块
+路由器响应只解析一次，之后以定长槽位的对象在服务内部传递
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from utils.net_utils import int_to_ip, ip_to_int, wan_is_up
+
+
+class WanSample:
+    """
+    一次WAN口采样
+
+    IP、网关和DNS以整数保存；原始响应只在存储后端需要时保留，
+    舰队模式下大量采样不再各自持有一份嵌套字典
+    """
+
+    __slots__ = ('timestamp', 'ip', 'proto', 'gateway', 'dns', 'up',
+                 'error_code', 'latency_ms', '_payload')
+
+    def __init__(self, timestamp: float, ip: int = 0, proto: str = '', gateway: int = 0,
+                 dns: Tuple[int, ...] = (), up: Optional[bool] = None, error_code: int = 0,
+                 latency_ms: Optional[float] = None,
+                 payload: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            timestamp: 采样时间（Unix时间戳）
+            ip: WAN口IPv4地址的整数形式，0表示没有IP
+            proto: 上网方式，如dhcp、pppoe
+            gateway: 网关地址的整数形式
+            dns: DNS服务器地址的整数形式
+            up: WAN口是否在线，None表示未知
+            error_code: 路由器返回的错误码
+            latency_ms: 本次轮询的耗时（毫秒）
+            payload: 原始响应，None表示未保留
+        """
+        self.timestamp = timestamp
+        self.ip = ip
+        self.proto = proto
+        self.gateway = gateway
+        self.dns = dns
+        self.up = up
+        self.error_code = error_code
+        self.latency_ms = latency_ms
+        self._payload = payload
+
+    @classmethod
+    def from_payload(cls, payload: Optional[Dict[str, Any]], latency_ms: Optional[float] = None,
+                     keep_payload: bool = False,
+                     timestamp: Optional[float] = None) -> 'WanSample':
+        """
+        解析路由器的WAN状态响应
+
+        Args:
+            payload: 响应内容（{'network': {'wan_status': {...}}, 'error_code': 0}）
+            latency_ms: 本次轮询的耗时（毫秒）
+            keep_payload: 是否保留原始响应，需要保存完整数据时使用
+            timestamp: 采样时间，默认为当前时间
+        """
+        payload = payload or {}
+        wan_status = (payload.get('network') or {}).get('wan_status') or {}
+        dns = tuple(value for value in (ip_to_int(wan_status.get('pri_dns')),
+                                        ip_to_int(wan_status.get('snd_dns'))) if value)
+        return cls(time.time() if timestamp is None else timestamp,
+                   ip=ip_to_int(wan_status.get('ipaddr')),
+                   proto=wan_status.get('proto') or '',
+                   gateway=ip_to_int(wan_status.get('gateway')),
+                   dns=dns,
+                   up=wan_is_up(wan_status),
+                   error_code=int(payload.get('error_code', 0) or 0),
+                   latency_ms=latency_ms,
+                   payload=payload if keep_payload else None)
+
+    @property
+    def ip_address(self) -> Optional[str]:
+        """WAN口IP地址，没有IP时为None"""
+        return int_to_ip(self.ip)
+
+    @property
+    def gateway_address(self) -> Optional[str]:
+        return int_to_ip(self.gateway)
+
+    @property
+    def dns_servers(self) -> Tuple[str, ...]:
+        return tuple(int_to_ip(value) for value in self.dns)
+
+    @property
+    def has_payload(self) -> bool:
+        """是否保留了原始响应"""
+        return self._payload is not None
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        """原始响应；未保留时按已解析的字段还原出WAN状态部分"""
+        if self._payload is not None:
+            return self._payload
+        wan_status = {'proto': self.proto, 'ipaddr': self.ip_address, 'up': self.up}
+        if self.gateway:
+            wan_status['gateway'] = self.gateway_address
+        for key, server in zip(('pri_dns', 'snd_dns'), self.dns_servers):
+            wan_status[key] = server
+        return {'network': {'wan_status': wan_status}, 'error_code': self.error_code}
+
+    def to_record(self) -> Dict[str, Any]:
+        """转为历史记录格式（{'timestamp', 'data', 'latency_ms'}）"""
+        record = {
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'data': self.payload
+        }
+        if self.latency_ms is not None:
+            record['latency_ms'] = round(self.latency_ms, 2)
+        return record
+
+    def __repr__(self) -> str:
+        return (f"WanSample(ip={self.ip_address!r}, proto={self.proto!r}, "
+                f"up={self.up!r}, latency_ms={self.latency_ms!r})")
@@ -4,39 +4,135 @@
 整合所有功能模块的主服务类
 """
 import logging
+import os
 import time
 from typing import Optional
 
+from core.dns_responder import DnsResponder
+from core.event_bus import EventBus, HostsRefresh, IpChanged, StartupObserved, WanSampled
+from core.models import WanSample
+from core.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded
 from core.router_monitor import RouterMonitor
+from core.scheduler import PollScheduler
+from core.session_manager import StokSessionManager
 from notifiers.feishu_notifier import FeishuNotifier
 from managers.hosts_manager import HostsManager, GitManager
+from managers.hosts_table import DEFAULT_GROUP
+from managers.device_inventory import DeviceInventory
+from managers.resolver_outputs import ResolverOutputs
 from utils.config_manager import ConfigManager
 from utils.data_manager import DataManager
+from utils.runtime_state import RuntimeState
+
+# 修改后需要重启服务才能生效的配置项
+RESTART_KEYS = ('host', 'http_pool_size', 'connect_timeout', 'read_timeout',
+                'circuit_failure_threshold', 'circuit_reset_timeout', 'data_dir',
+                'event_queue_size', 'notifier_workers', 'fleet_workers', 'fleet_refresh_workers',
+                'hosts_enabled')
+RESTART_KEY_PREFIXES = ('history_', 'dns_')
 
 
 class RouterMonitorService:
     """路由器监控服务"""
     
-    def __init__(self):
+    def __init__(self, config_manager: Optional[ConfigManager] = None,
+                 site_config=None, name: Optional[str] = None,
+                 event_bus: Optional[EventBus] = None):
+        """
+        初始化监控服务
+        
+        Args:
+            config_manager: 配置管理器，默认新建
+            site_config: 舰队模式下单个路由器的配置视图，默认加载整个配置文件
+            name: 舰队模式下的路由器名称，单路由器模式为None
+            event_bus: 共享的事件总线（舰队模式），默认新建并注册消费者
+        """
         # 初始化各个管理器
-        self.config_manager = ConfigManager()
-        self.data_manager = DataManager()
+        self.config_manager = config_manager or ConfigManager()
+        self.name = name
         
         # 加载配置
-        self.config = self.config_manager.load_config()
+        if site_config is not None:
+            self.config = site_config
+        else:
+            self.config = self.config_manager.load_config()
         if not self.config:
             raise Exception("无法加载配置文件，服务启动失败")
         
+        self.data_manager = self._init_data_manager()
+        
         # 初始化各个模块
-        self.router = RouterMonitor(self.config.get('host', '192.168.1.1'))
+        self.router = RouterMonitor(
+            self.config.get('host', '192.168.1.1'),
+            self.config.get('http_pool_size', 2),
+            connect_timeout=self.config.get('connect_timeout', 3),
+            read_timeout=self.config.get('read_timeout', 10),
+            breaker=CircuitBreaker(
+                failure_threshold=self.config.get('circuit_failure_threshold', 3),
+                reset_timeout=self.config.get('circuit_reset_timeout', 30)))
+        self.session_manager = StokSessionManager(
+            self.router, self.config,
+            refresh_margin=self.config.get('stok_refresh_margin', 0.8),
+            default_lifetime=self.config.get('stok_lifetime'),
+            login_listener=self.data_manager.record_login)
+        self.scheduler = PollScheduler.from_config(self.config)
         self.feishu_notifier = self._init_feishu_notifier()
         self.hosts_manager = self._init_hosts_manager()
+        self.resolver_outputs = self._init_resolver_outputs(self.hosts_manager)
         self.git_manager = self._init_git_manager()
+        self.device_inventory = self._init_device_inventory()
+        # 舰队模式下由舰队服务创建并共享
+        self.dns_responder = self._init_dns_responder() if name is None else None
+        
+        # 轮询线程只发布事件，副作用交给事件消费者处理
+        if event_bus is None:
+            event_bus = EventBus(self.config.get('event_queue_size', 100))
+            self.register_consumers(event_bus, self.config)
+        self.event_bus = event_bus
         
         # 状态变量
         self.last_ip = None
         self.startup_notification_sent = False
+        self.last_inventory_time = None
+        self.runtime_state = RuntimeState(self._data_file('runtime_state.json'))
+        self._restore_runtime_state()
+        
+    @staticmethod
+    def register_consumers(event_bus: EventBus, config):
+        """
+        在事件总线上注册副作用消费者
         
+        消费者通过 event.source 找到发布事件的服务，舰队模式下所有路由器共享同一组消费者
+        """
+        event_bus.subscribe('notifier',
+                            lambda event: event.source._on_notify_event(event),
+                            (StartupObserved, IpChanged),
+                            workers=config.get('notifier_workers', 1))
+        # hosts更新和Git提交必须按顺序执行
+        event_bus.subscribe('hosts',
+                            lambda event: event.source._on_hosts_event(event),
+                            (StartupObserved, IpChanged, HostsRefresh))
+        if config.get('dns_enabled', False):
+            # DNS应答只更新内存，不排在Git推送之后
+            event_bus.subscribe('dns',
+                                lambda event: event.source._on_dns_event(event),
+                                (StartupObserved, IpChanged, HostsRefresh))
+        # IP变化记录不能被大量的采样事件挤掉
+        event_bus.subscribe('storage',
+                            lambda event: event.source._on_storage_event(event),
+                            (WanSampled, IpChanged), keep=(IpChanged,))
+    
+    def _data_file(self, filename: str) -> str:
+        """数据文件路径，舰队模式下按路由器名称区分"""
+        if self.name:
+            stem, ext = os.path.splitext(filename)
+            filename = f'{stem}_{self.name}{ext}'
+        return os.path.join(self.config.get('data_dir', 'data'), filename)
+    
+    def _init_data_manager(self) -> DataManager:
+        """初始化历史数据存储"""
+        return DataManager.from_config(self.config, self.name)
+    
     def _init_feishu_notifier(self) -> Optional[FeishuNotifier]:
         """初始化飞书通知器"""
         feishu_webhook = self.config.get('feishu_webhook_url')
@@ -53,13 +149,23 @@ class RouterMonitorService:
         """初始化hosts管理器"""
         if self.config.get('hosts_enabled', True):
             hosts_file = self.config.get('hosts_file', 'hosts')
-            return HostsManager(hosts_file)
+            # 多个路由器配置了同一个hosts文件时共用管理器，各自的条目按路由器名称分组
+            return HostsManager.shared(hosts_file, self.config.get('hosts_overrides') or {})
         return None
     
+    def _init_resolver_outputs(self, hosts_manager: Optional[HostsManager]) -> ResolverOutputs:
+        """初始化解析器输出：hosts文件以及配置的dnsmasq、区域文件、JSON等输出"""
+        outputs = ResolverOutputs.from_config(self.config, hosts_manager, self.name)
+        for target in outputs.targets:
+            if target.format != 'hosts':
+                logging.info(f"{self._log_prefix()}已启用{target.format}输出: {target.path}")
+        return outputs
+    
     def _init_git_manager(self) -> Optional[GitManager]:
         """初始化Git管理器"""
         if self.config.get('git_enabled', False):
-            git_manager = GitManager()
+            # 舰队模式下各路由器共用同一个仓库的管理器，仓库初始化和用户配置只执行一次
+            git_manager = GitManager.shared()
             
             # 初始化Git仓库（如果需要）
             if not git_manager.is_git_repo():
@@ -77,92 +183,342 @@ class RouterMonitorService:
             logging.info("Git功能已禁用")
             return None
     
+    def _init_device_inventory(self) -> Optional[DeviceInventory]:
+        """初始化设备清单"""
+        if self.config.get('inventory_enabled', False):
+            logging.info("设备清单已启用")
+            return DeviceInventory(self._data_file('devices.json'))
+        return None
+    
+    def _restore_runtime_state(self):
+        """
+        从运行状态快照恢复上次的IP
+
+        快照与hosts文件中的IP一致时才采用，否则按首次启动处理（重新生成hosts文件并通知）
+        """
+        last_ip = self.runtime_state.last_ip
+        if not last_ip:
+            return
+        if self.hosts_manager:
+            hosts_ip = self.hosts_manager.get_current_ip_from_hosts(self.name or DEFAULT_GROUP)
+            if hosts_ip != last_ip:
+                logging.warning(f"{self._log_prefix()}运行状态快照中的IP({last_ip})与hosts文件"
+                                f"({hosts_ip})不一致，按首次启动处理")
+                return
+            self.hosts_manager.current_ip = hosts_ip
+        self.last_ip = last_ip
+        logging.info(f"{self._log_prefix()}已恢复运行状态: 上次IP {last_ip}，"
+                     f"序号 {self.runtime_state.sequence}")
+    
+    def _init_dns_responder(self) -> Optional[DnsResponder]:
+        """初始化内置DNS应答器"""
+        if self.config.get('dns_enabled', False):
+            return DnsResponder.from_config(self.config)
+        return None
+    
+    @staticmethod
+    def start_dns_responder(dns_responder: Optional[DnsResponder]) -> Optional[DnsResponder]:
+        """启动DNS应答器，端口无法监听时只记录错误，监控继续运行"""
+        if dns_responder is None:
+            return None
+        try:
+            dns_responder.start()
+            return dns_responder
+        except OSError as e:
+            logging.error(f"DNS应答器启动失败（{dns_responder.listen}:{dns_responder.port}）: {e}")
+            return None
+    
+    def _inventory_due(self) -> bool:
+        """是否需要在本次轮询中顺带获取主机表"""
+        if not self.device_inventory:
+            return False
+        if self.last_inventory_time is None:
+            return True
+        interval = self.config.get('inventory_interval', 300)
+        return time.monotonic() - self.last_inventory_time >= interval
+    
     def monitor_wan_status(self):
         """监控WAN状态的主函数"""
-        logging.info("开始监控WAN状态，每分钟获取一次数据...")
+        logging.info(f"开始监控WAN状态，每{self.scheduler.base_interval}秒获取一次数据...")
         
-        while True:
-            try:
-                self._check_wan_status()
-            except Exception as e:
-                logging.error(f"监控过程中发生错误: {e}")
-            
-            # 等待60秒
-            logging.info("等待60秒后进行下次获取...")
-            time.sleep(60)
+        # 后台在stok过期前主动刷新
+        self.session_manager.start()
+        self.scheduler.start()
+        self.dns_responder = self.start_dns_responder(self.dns_responder)
+        if self.name is None and self.config.get('config_hot_reload', True):
+            self.config_manager.watch(self.apply_config_changes,
+                                      self.config.get('config_watch_interval', 2))
+        try:
+            while True:
+                try:
+                    outcome = self._check_wan_status()
+                except Exception as e:
+                    logging.error(f"监控过程中发生错误: {e}")
+                    outcome = PollScheduler.FAILED
+                
+                # 等待到下一个截止时间
+                delay = self.scheduler.advance(outcome)
+                logging.info(f"等待{delay:.0f}秒后进行下次获取...")
+                time.sleep(delay)
+        finally:
+            self.config_manager.stop_watching()
+            if self.dns_responder:
+                self.dns_responder.stop()
+            self.session_manager.stop()
+            # 处理完已发布的事件后再退出
+            self.event_bus.stop()
+            self.data_manager.close()
     
-    def _check_wan_status(self):
-        """检查WAN状态"""
+    def apply_config_changes(self, changes):
+        """
+        应用热加载的配置：只重建受影响的组件
+
+        新组件全部创建成功后再替换，创建失败时保留原有组件；
+        消费者线程每次处理事件时读取属性，替换后下一个事件即使用新组件
+
+        Args:
+            changes: ConfigManager.reload_config 的返回值，
+                     或舰队模式下本路由器变化的配置项集合
+        """
+        if isinstance(changes, dict):
+            keys = set(changes['keys'])
+            if changes['routers_changed']:
+                logging.warning("路由器列表有增删，需要重启服务才能生效")
+        else:
+            keys = set(changes)
+        if not keys:
+            return
+
+        restart_keys = sorted(key for key in keys
+                              if key in RESTART_KEYS or key.startswith(RESTART_KEY_PREFIXES))
+        if restart_keys:
+            logging.warning(f"{self._log_prefix()}以下配置项需要重启服务才能生效: "
+                            f"{', '.join(restart_keys)}")
+
+        updates = {}
+        try:
+            if keys & {'feishu_webhook_url', 'feishu_secret'}:
+                updates['feishu_notifier'] = self._init_feishu_notifier()
+            if keys & {'hosts_file', 'hosts_overrides'}:
+                updates['hosts_manager'] = self._init_hosts_manager()
+            if keys & {'hosts_file', 'hosts_overrides', 'resolver_outputs'}:
+                updates['resolver_outputs'] = self._init_resolver_outputs(
+                    updates.get('hosts_manager', self.hosts_manager))
+            if keys & {'git_enabled', 'git_name', 'git_email', 'hosts_file'}:
+                updates['git_manager'] = self._init_git_manager()
+            if 'inventory_enabled' in keys:
+                updates['device_inventory'] = self._init_device_inventory()
+            if any(key.startswith('poll_') for key in keys):
+                scheduler = PollScheduler.from_config(self.config)
+                # 沿用当前的截止时间，不打乱正在进行的等待
+                scheduler.next_deadline = self.scheduler.next_deadline
+                updates['scheduler'] = scheduler
+        except Exception as e:
+            logging.error(f"{self._log_prefix()}按新配置重建组件失败，继续使用原有组件: {e}")
+            return
+
+        for attr, component in updates.items():
+            setattr(self, attr, component)
+        if 'stok_refresh_margin' in keys:
+            self.session_manager.refresh_margin = self.config.get('stok_refresh_margin', 0.8)
+        if 'stok_lifetime' in keys:
+            self.session_manager.default_lifetime = self.config.get('stok_lifetime')
+        if updates:
+            logging.info(f"{self._log_prefix()}已按新配置重建: {', '.join(updates)}")
+
+        if keys & {'domains', 'hosts_file', 'hosts_overrides', 'resolver_outputs'} and self.last_ip:
+            # 域名列表或输出文件变化后按当前IP重新生成
+            self.event_bus.publish(HostsRefresh(self.last_ip, self))
+
+    def _check_wan_status(self) -> str:
+        """
+        检查WAN状态
+        
+        Returns:
+            str: 轮询结果，PollScheduler.OK / CHANGED / FAILED
+        """
         logging.info("正在获取WAN状态...")
-        wan_data = self.router.get_wan_status_with_auth(self.config)
+        query = self.router.wan_status_query()
+        inventory_due = self._inventory_due()
+        if inventory_due:
+            # 主机表与WAN状态合并为一次请求
+            query.table('hosts_info', 'host_info')
+        
+        # 本轮所有路由器请求（含登录重试）共用同一个时间预算
+        deadline = Deadline(self.config.get('cycle_budget', 20))
+        query_start = time.monotonic()
+        try:
+            result = self.session_manager.query(query, deadline)
+            if inventory_due and result and not result.ok:
+                # 主机表出错时整个合并请求失败，单独查询WAN状态，不丢失本轮采样；
+                # 主机表等下一个清单周期再试
+                logging.warning(f"{self._log_prefix()}合并主机表的查询失败"
+                                f"(error_code={result.error_code})，单独查询WAN状态")
+                self.last_inventory_time = time.monotonic()
+                inventory_due = False
+                result = self.session_manager.query(self.router.wan_status_query(), deadline)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            # 路由器不可用，不重新登录，等下一轮再试
+            logging.warning(f"{self._log_prefix()}本轮跳过查询: {e}")
+            result = None
+        latency_ms = (time.monotonic() - query_start) * 1000
+        wan_data = result.body if result else None
+        
+        if inventory_due and result and result.ok:
+            self._update_device_inventory(result.host_table)
+            wan_data = {key: value for key, value in result.body.items()
+                        if key != 'hosts_info'}
         
         if wan_data:
-            # 保存数据到文件
-            self.data_manager.save_wan_data(wan_data)
-            
-            # 提取当前IP地址
-            current_ip = self.router.extract_wan_ip(wan_data)
+            # 响应只解析一次，存储后端不需要时不保留原始数据
+            sample = WanSample.from_payload(wan_data, latency_ms,
+                                            keep_payload=self.data_manager.keeps_payload)
+            # 保存数据和配置由storage消费者完成
+            self.event_bus.publish(WanSampled(sample, self))
             
+            current_ip = sample.ip_address
             if current_ip:
-                self._handle_ip_status(current_ip)
-                
-                # 更新配置文件（保存最新的stok等信息）
-                self.config_manager.save_config(self.config)
+                changed = self._handle_ip_status(current_ip)
+                outcome = PollScheduler.CHANGED if changed else PollScheduler.OK
             else:
                 logging.warning("无法提取WAN口IP地址")
+                outcome = PollScheduler.FAILED
             
             # 记录关键信息
-            self._log_wan_status(wan_data)
+            self._log_wan_status(sample)
         else:
             logging.error("获取WAN状态失败")
-    
-    def _handle_ip_status(self, current_ip: str):
-        """处理IP状态变化"""
-        logging.info(f"当前WAN口IP: {current_ip}")
+            outcome = PollScheduler.FAILED
         
-        # 发送启动通知（仅第一次）
-        if not self.startup_notification_sent and self.feishu_notifier:
-            self.feishu_notifier.send_startup_notification(current_ip)
-            self.startup_notification_sent = True
+        stats = self.router.get_session_stats()
+        logging.debug(f"HTTP连接复用: 请求{stats['requests']}次, "
+                      f"新建连接{stats['connections']}个, "
+                      f"复用率{stats['reuse_ratio']:.1%}")
+        breaker_stats = self.router.breaker.get_stats()
+        if breaker_stats['state'] != CircuitBreaker.CLOSED:
+            logging.warning(f"{self._log_prefix()}路由器熔断中: 已拒绝{breaker_stats['rejected']}次请求")
+        stok_stats = self.session_manager.get_stats()
+        logging.debug(f"stok复用: 查询{stok_stats['queries']}次, "
+                      f"复用率{stok_stats['reuse_ratio']:.1%}, "
+                      f"登录{stok_stats['logins']}次"
+                      f"(主动刷新{stok_stats['proactive_refreshes']}次)")
+        for consumer, consumer_stats in self.event_bus.get_stats().items():
+            logging.debug(f"事件消费者 {consumer}: 队列深度{consumer_stats['depth']}, "
+                          f"延迟{consumer_stats['last_lag']:.3f}秒, "
+                          f"丢弃{consumer_stats['dropped']}个")
+        return outcome
+    
+    def _save_config(self):
+        """保存完整配置文件（舰队模式下保存包含所有路由器的根配置）"""
+        self.config_manager.save_config(self.config_manager.get_config())
+    
+    def _log_prefix(self) -> str:
+        """日志前缀，舰队模式下标明路由器名称"""
+        return f"[{self.name}] " if self.name else ""
+    
+    def _update_device_inventory(self, host_table: list):
+        """更新设备清单并记录增量变化"""
+        self.last_inventory_time = time.monotonic()
+        changes = self.device_inventory.update(host_table)
+        for change in changes:
+            logging.info(f"{self._log_prefix()}{change.describe()}")
+        if changes:
+            logging.info(f"{self._log_prefix()}设备清单有 {len(changes)} 项变化，"
+                         f"当前设备数: {len(self.device_inventory.devices)}")
+    
+    def _handle_ip_status(self, current_ip: str) -> bool:
+        """
+        处理IP状态变化
         
-        # 检查IP是否发生变化
-        if self.last_ip is not None and self.last_ip != current_ip:
-            logging.info(f"检测到IP变化: {self.last_ip} -> {current_ip}")
-            self._handle_ip_change(self.last_ip, current_ip)
+        Returns:
+            bool: IP是否发生了变化
+        """
+        logging.info(f"{self._log_prefix()}当前WAN口IP: {current_ip}")
         
-        # 更新hosts文件
-        if self.hosts_manager:
-            domain_list = self.config.get('domains', [])
-            if self.hosts_manager.update_hosts_file(current_ip, domain_list):
-                logging.info("hosts文件已更新")
-                self._handle_git_commit(current_ip)
+        first = not self.startup_notification_sent
+        self.startup_notification_sent = True
+        # 检查IP是否发生变化（重启后与快照中恢复的IP比较）
+        changed = self.last_ip is not None and self.last_ip != current_ip
+        # 先更新快照序号，消费者处理事件时按最新序号记录
+        self.runtime_state.observe(current_ip)
+        if changed:
+            logging.info(f"{self._log_prefix()}检测到IP变化: {self.last_ip} -> {current_ip}")
+            self.event_bus.publish(IpChanged(self.last_ip, current_ip, self))
+        elif first:
+            # 启动后首次获取到IP（仅第一次）；已处理过该IP的组件不会重复产生副作用
+            self.event_bus.publish(StartupObserved(current_ip, self))
         
         # 更新上次IP
         self.last_ip = current_ip
+        return changed
     
-    def _handle_ip_change(self, old_ip: str, new_ip: str):
-        """处理IP变化"""
-        # 发送飞书通知
-        if self.feishu_notifier:
-            self.feishu_notifier.send_ip_change_notification(old_ip, new_ip)
+    def _on_notify_event(self, event):
+        """notifier消费者：发送启动通知和IP变化通知"""
+        if not self.feishu_notifier:
+            return
+        if isinstance(event, StartupObserved):
+            if self.runtime_state.is_current('notifier', event.ip):
+                logging.info(f"{self._log_prefix()}IP未变化({event.ip})，重启后不重复发送通知")
+                return
+            sent = self.feishu_notifier.send_startup_notification(event.ip, self.name)
+            current_ip = event.ip
+        else:
+            sent = self.feishu_notifier.send_ip_change_notification(
+                event.old_ip, event.new_ip, self.name)
+            current_ip = event.new_ip
+        if sent:
+            self.runtime_state.mark('notifier', current_ip)
+    
+    def _on_hosts_event(self, event):
+        """hosts消费者：更新hosts文件等解析器输出并提交推送"""
+        current_ip = event.new_ip if isinstance(event, IpChanged) else event.ip
+        # 内容没有变化的输出（如HostsRefresh时域名列表未变）不会写文件
+        domain_list = self.config.get('domains', [])
+        written = self.resolver_outputs.update(current_ip, domain_list)
+        hosts_manager = self.hosts_manager
+        if (hosts_manager is None or
+                hosts_manager.get_current_ip_from_hosts(self.name or DEFAULT_GROUP) == current_ip):
+            self.runtime_state.mark('hosts', current_ip)
+        if written:
+            logging.info(f"解析器输出已更新: {len(written)} 个文件")
+            self._handle_git_commit(current_ip, written)
+        elif self.git_manager and not self.runtime_state.is_current('git', current_ip):
+            # 上次写入后没有完成提交推送（推送失败或进程退出），重新提交推送
+            paths = [target.path for target in self.resolver_outputs.targets]
+            if paths:
+                logging.info(f"{self._log_prefix()}解析器输出尚未推送({current_ip})，重新提交推送")
+                self._handle_git_commit(current_ip, paths)
+    
+    def _on_dns_event(self, event):
+        """dns消费者：更新内置DNS应答器中的记录"""
+        if self.dns_responder:
+            current_ip = event.new_ip if isinstance(event, IpChanged) else event.ip
+            self.dns_responder.update_records(self.name or 'default', current_ip,
+                                              self.config.get('domains', []))
     
-    def _handle_git_commit(self, current_ip: str):
+    def _on_storage_event(self, event):
+        """storage消费者：保存WAN数据、IP变化事件和最新的stok等信息"""
+        if isinstance(event, IpChanged):
+            self.data_manager.record_ip_change(event.old_ip, event.new_ip, event.timestamp)
+            return
+        self.data_manager.save_wan_sample(event.sample)
+        self._save_config()
+    
+    def _handle_git_commit(self, current_ip: str, paths):
         """处理Git提交"""
         if self.git_manager:
-            hosts_file = self.config.get('hosts_file', 'hosts')
             commit_message = f"Update hosts file with new WAN IP: {current_ip}"
             
-            if self.git_manager.add_and_commit(hosts_file, commit_message):
+            if self.git_manager.add_and_commit(paths, commit_message):
                 # 推送到远程仓库
                 remote = self.config.get('git_remote', 'origin')
                 branch = self.config.get('git_branch', 'main')
-                self.git_manager.push_to_remote(remote, branch)
+                if self.git_manager.push_to_remote(remote, branch):
+                    self.runtime_state.mark('git', current_ip)
     
-    def _log_wan_status(self, wan_data: dict):
+    def _log_wan_status(self, sample: WanSample):
         """记录WAN状态信息"""
-        if wan_data.get('network') and wan_data['network'].get('wan_status'):
-            wan_status = wan_data['network']['wan_status']
-            proto = wan_status.get('proto', 'unknown')
-            logging.info(f"WAN状态: {proto}")
+        if sample.proto or sample.ip:
+            logging.info(f"{self._log_prefix()}WAN状态: {sample.proto or 'unknown'}")
         else:
             logging.warning("WAN状态数据格式异常")
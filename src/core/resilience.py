@@ -0,0 +1,135 @@
+# -*- coding:utf8 -*-
+"""
+请求预算与熔断模块
+为每轮轮询设置截止时间，并在路由器持续失败时熔断请求
+"""
+import threading
+import time
+from typing import Tuple
+
+
+class DeadlineExceeded(Exception):
+    """本轮轮询的时间预算已用完"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被拒绝"""
+
+
+class Deadline:
+    """单轮轮询的截止时间，所有路由器请求的超时都由它推导"""
+
+    def __init__(self, budget: float):
+        """
+        Args:
+            budget: 本轮允许的总耗时（秒）
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """剩余秒数"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeouts(self, connect_max: float, read_max: float) -> Tuple[float, float]:
+        """
+        根据剩余时间推导连接和读取超时
+
+        Returns:
+            tuple: (连接超时, 读取超时)
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"本轮轮询已超过 {self.budget} 秒预算")
+        return min(connect_max, remaining), min(read_max, remaining)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，打开期间直接拒绝请求；
+    冷却时间过后进入半开状态，由调用方做一次低成本探测决定是否恢复
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30,
+                 max_reset_timeout: float = 300):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 打开后多久允许探测（秒）
+            max_reset_timeout: 探测反复失败时冷却时间的上限（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.reset_timeout = reset_timeout
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before_request(self) -> str:
+        """
+        请求前检查
+
+        Returns:
+            str: CLOSED表示正常放行，HALF_OPEN表示调用方需先探测
+
+        Raises:
+            CircuitOpenError: 熔断器打开或已有探测在进行中
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if self.state == self.OPEN and \
+                    time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return self.HALF_OPEN
+            self.rejected += 1
+            raise CircuitOpenError(f"熔断器已打开，{self.reset_timeout:.0f}秒冷却中")
+
+    def record_success(self):
+        """记录一次成功，关闭熔断器"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        """记录一次失败"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                # 探测失败，延长冷却时间后重新打开
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == self.CLOSED and \
+                    self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.open_count += 1
+
+    def get_stats(self):
+        """获取熔断统计"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'open_count': self.open_count,
+                'rejected': self.rejected
+            }
@@ -1,13 +1,112 @@
 # -*- coding:utf8 -*-
 import requests
-import json
 import logging
+import socket
 from datetime import datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+from core.ds_query import DsQuery, DsResult
+from core.models import WanSample
+from core.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded
+from utils import json_codec
 
 
 class RouterMonitor:
-    def __init__(self, host="192.168.1.1"):
+    def __init__(self, host="192.168.1.1", pool_size=2, connect_timeout=3,
+                 read_timeout=10, breaker=None):
         self.host = host
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.request_count = 0
+        self.adapter = None
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """创建带连接池的keep-alive会话，所有路由器请求共用"""
+        session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1,
+                                   pool_maxsize=self.pool_size,
+                                   max_retries=0)
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        session.headers.update({
+            'Content-Type': 'application/json; charset=UTF-8',
+            'Connection': 'keep-alive'
+        })
+        return session
+
+    def _timeouts(self, deadline=None):
+        """连接和读取超时，有截止时间时不超过剩余预算"""
+        if deadline is None:
+            return self.connect_timeout, self.read_timeout
+        return deadline.timeouts(self.connect_timeout, self.read_timeout)
+
+    def _probe(self, deadline=None):
+        """熔断半开时的低成本探测：只尝试建立TCP连接"""
+        parts = urlsplit(f'http://{self.host}')
+        connect_timeout, _ = self._timeouts(deadline)
+        with socket.create_connection((parts.hostname, parts.port or 80),
+                                      timeout=connect_timeout):
+            pass
+
+    def _post(self, url, payload, deadline=None):
+        """
+        通过共享会话发送POST请求
+
+        所有请求都带有超时，并受熔断器保护
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            DeadlineExceeded: 本轮预算已用完
+        """
+        timeout = self._timeouts(deadline)
+        state = self.breaker.before_request()
+        if state == CircuitBreaker.HALF_OPEN:
+            try:
+                self._probe(deadline)
+            except OSError as e:
+                self.breaker.record_failure()
+                raise CircuitOpenError(f"熔断探测失败: {e}")
+            logging.info("熔断探测成功，恢复访问路由器")
+            self.breaker.record_success()
+
+        self.request_count += 1
+        try:
+            response = self.session.post(url, data=payload, timeout=timeout)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def get_session_stats(self):
+        """
+        获取连接复用统计
+
+        Returns:
+            dict: 请求数、新建连接数以及连接复用率
+        """
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        requests_sent = self.request_count
+        reused = max(requests_sent - connections, 0)
+        return {
+            'requests': requests_sent,
+            'connections': connections,
+            'reused': reused,
+            'reuse_ratio': reused / requests_sent if requests_sent else 0.0
+        }
+
+    def close(self):
+        """关闭会话，释放连接池"""
+        self.session.close()
 
     def encrypt_pwd(self, password):
         """加密提交后的密码"""
@@ -37,53 +136,95 @@ class RouterMonitor:
             output = output + chr(ord(dictionary[cl ^ cr]) % lenDict)
         return output
 
-    def login(self, password='', encrypt_password=None):
+    def login(self, password='', encrypt_password=None, deadline=None):
         """提交登录请求的方法"""
         if not encrypt_password:
             encrypt_password = self.encrypt_pwd(password)
 
         url = f'http://{self.host}/'
-        headers = {'Content-Type': 'application/json; charset=UTF-8'}
         payload = '{"method":"do","login":{"password":"%s"}}' % encrypt_password
-        response = requests.post(url, data=payload, headers=headers)
-        response_body = json.loads(response.text)
+        response = self._post(url, payload, deadline)
+        response_body = json_codec.loads(response.content)
         return response_body
 
-    def get_all_host(self, encrypt_password=None):
-        """获取所有主机信息"""
-        stok = self.login(encrypt_password=encrypt_password).get('stok')
-        payload = '{"hosts_info":{"table":"host_info"},"method":"get"}'
-        headers = {'Content-Type': 'application/json; charset=UTF-8'}
-        url = f'http://{self.host}/stok={stok}/ds'
-        response = requests.post(url, data=payload, headers=headers)
-        return response.text
+    def query(self):
+        """创建绑定到本路由器的ds批量查询构造器"""
+        return DsQuery(self)
 
-    def try_get_wan_status(self, stok):
-        """尝试使用给定的stok获取WAN状态"""
-        payload = '{"network":{"name":["wan_status"]},"method":"get"}'
-        headers = {'Content-Type': 'application/json; charset=UTF-8'}
-        url = f'http://{self.host}/stok={stok}/ds'
+    def wan_status_query(self):
+        """WAN状态查询"""
+        return self.query().name('network', 'wan_status')
+
+    def execute_query(self, query, stok, deadline=None):
+        """
+        执行ds批量查询，一次请求获取多个数据表
 
+        Args:
+            query (DsQuery): 查询构造器
+            stok (str): 登录token
+            deadline (Deadline): 本轮轮询的截止时间
+
+        Returns:
+            DsResult: 按表拆分的查询结果，请求失败返回None
+
+        Raises:
+            CircuitOpenError: 熔断器打开，请求没有发出
+            DeadlineExceeded: 本轮预算已用完
+        """
+        url = f'http://{self.host}/stok={stok}/ds'
         try:
-            response = requests.post(
-                url, data=payload, headers=headers, timeout=10)
-            response_data = json.loads(response.text)
-            return response_data
+            response = self._post(url, query.build_payload(), deadline)
+            return DsResult(json_codec.loads(response.content))
+        except (CircuitOpenError, DeadlineExceeded):
+            # 路由器不可用或没有时间了，与stok失效无关，调用方不应重新登录
+            raise
         except Exception as e:
-            logging.error(f"请求WAN状态失败: {e}")
+            logging.error(f"ds查询失败: {e}")
             return None
 
-    def get_wan_status_with_auth(self, config):
-        """获取WAN状态，带智能身份验证"""
+    def get_all_host(self, encrypt_password=None, stok=None, deadline=None):
+        """获取所有主机信息，提供有效stok时不再重新登录"""
+        if not stok:
+            stok = self.login(encrypt_password=encrypt_password,
+                              deadline=deadline).get('stok')
+        payload = self.query().table('hosts_info', 'host_info').build_payload()
+        url = f'http://{self.host}/stok={stok}/ds'
+        response = self._post(url, payload, deadline)
+        return response.text
+
+    def try_get_wan_status(self, stok, deadline=None):
+        """尝试使用给定的stok获取WAN状态"""
+        result = self.execute_query(self.wan_status_query(), stok, deadline)
+        if result is None:
+            logging.error("请求WAN状态失败")
+            return None
+        return result.body
+
+    def get_with_auth(self, config, query, deadline=None):
+        """
+        执行ds批量查询，带智能身份验证
+
+        Args:
+            config (dict): 配置，登录成功后会写回stok等信息
+            query (DsQuery): 查询构造器
+            deadline (Deadline): 本轮轮询的截止时间
+
+        Returns:
+            DsResult: 查询结果，失败返回None
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            DeadlineExceeded: 本轮预算已用完
+        """
 
         # 如果有保存的stok，先尝试使用
         if config.get('stok'):
-            logging.info("尝试使用保存的stok获取WAN状态")
-            response_data = self.try_get_wan_status(config['stok'])
+            logging.info("尝试使用保存的stok获取数据")
+            result = self.execute_query(query, config['stok'], deadline)
 
-            if response_data and response_data.get('error_code') != -40401:
+            if result and not result.stok_expired:
                 # stok有效，返回数据
-                return response_data
+                return result
             else:
                 logging.warning("保存的stok已失效，需要重新登录")
 
@@ -98,7 +239,7 @@ class RouterMonitor:
                     config['password'])
 
             login_response = self.login(
-                encrypt_password=config['encrypt_password'])
+                encrypt_password=config['encrypt_password'], deadline=deadline)
             if login_response and 'stok' in login_response:
                 new_stok = login_response['stok']
                 logging.info("重新登录成功")
@@ -107,19 +248,26 @@ class RouterMonitor:
                 config['stok'] = new_stok
                 config['last_login_time'] = datetime.now().isoformat()
 
-                # 使用新stok获取WAN状态
-                response_data = self.try_get_wan_status(new_stok)
-                return response_data
+                # 使用新stok执行查询
+                return self.execute_query(query, new_stok, deadline)
             else:
                 logging.error("登录失败")
                 return None
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
             logging.error(f"登录过程中发生错误: {e}")
             return None
 
+    def get_wan_status_with_auth(self, config, deadline=None):
+        """获取WAN状态，带智能身份验证"""
+        try:
+            result = self.get_with_auth(config, self.wan_status_query(), deadline)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            logging.warning(f"获取WAN状态跳过: {e}")
+            return None
+        return result.body if result else None
+
     def extract_wan_ip(self, wan_data):
         """从WAN状态数据中提取IP地址"""
-        if wan_data and wan_data.get('network') and wan_data['network'].get('wan_status'):
-            wan_status = wan_data['network']['wan_status']
-            return wan_status.get('ipaddr', None)
-        return None
+        return WanSample.from_payload(wan_data).ip_address
@@ -0,0 +1,111 @@
+# -*- coding:utf8 -*-
+"""
+轮询调度模块
+基于单调时钟截止时间的自适应轮询间隔，避免周期漂移
+"""
+import random
+import time
+from typing import Any, Dict
+
+
+class PollScheduler:
+    """自适应、无漂移的轮询调度器"""
+
+    # 轮询结果
+    OK = 'ok'
+    CHANGED = 'changed'
+    FAILED = 'failed'
+
+    def __init__(self, base_interval: float = 60, jitter: float = 0.0,
+                 backoff_factor: float = 2.0, max_interval: float = 600,
+                 burst_count: int = 3, burst_interval: float = 10):
+        """
+        Args:
+            base_interval: 正常轮询间隔（秒）
+            jitter: 间隔随机抖动比例，如0.1表示±10%
+            backoff_factor: 连续失败时的指数退避因子
+            max_interval: 退避后的最大间隔（秒）
+            burst_count: IP变化或失败后快速轮询的次数
+            burst_interval: 快速轮询间隔（秒）
+        """
+        self.base_interval = base_interval
+        self.jitter = jitter
+        self.backoff_factor = backoff_factor
+        self.max_interval = max(max_interval, base_interval)
+        self.burst_count = burst_count
+        self.burst_interval = min(burst_interval, base_interval)
+
+        self.consecutive_failures = 0
+        self.burst_remaining = 0
+        self.next_deadline = None
+        self.missed_deadlines = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'PollScheduler':
+        """根据配置创建调度器"""
+        return cls(base_interval=config.get('poll_interval', 60),
+                   jitter=config.get('poll_jitter', 0.0),
+                   backoff_factor=config.get('poll_backoff_factor', 2.0),
+                   max_interval=config.get('poll_max_interval', 600),
+                   burst_count=config.get('poll_burst_count', 3),
+                   burst_interval=config.get('poll_burst_interval', 10))
+
+    def start(self):
+        """以当前时刻作为第一个截止时间"""
+        self.next_deadline = time.monotonic()
+
+    def next_interval(self, outcome: str) -> float:
+        """根据本次轮询结果计算下次间隔"""
+        if outcome == self.FAILED:
+            self.consecutive_failures += 1
+            if self.consecutive_failures <= self.burst_count:
+                # 失败后先快速重试几次
+                interval = self.burst_interval
+            else:
+                # 路由器持续不可达时指数退避
+                exponent = self.consecutive_failures - self.burst_count
+                interval = min(self.base_interval * self.backoff_factor ** exponent,
+                               self.max_interval)
+        else:
+            self.consecutive_failures = 0
+            if outcome == self.CHANGED:
+                # IP刚变化时短时间内加快轮询，尽快发现后续变化
+                self.burst_remaining = self.burst_count
+            if self.burst_remaining > 0:
+                self.burst_remaining -= 1
+                interval = self.burst_interval
+            else:
+                interval = self.base_interval
+
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(interval, 0.0)
+
+    def advance(self, outcome: str) -> float:
+        """
+        根据本次轮询结果推进截止时间
+
+        截止时间按上一个截止时间累加，而不是按本次轮询结束时间，
+        因此轮询耗时不会累积成周期漂移
+
+        Returns:
+            float: 距离下一个截止时间的秒数
+        """
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now
+
+        self.next_deadline += self.next_interval(outcome)
+        if self.next_deadline < now:
+            # 本次轮询超过了整个间隔，跳过错过的截止时间
+            self.missed_deadlines += 1
+            self.next_deadline = now
+        return self.next_deadline - now
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        return {
+            'consecutive_failures': self.consecutive_failures,
+            'burst_remaining': self.burst_remaining,
+            'missed_deadlines': self.missed_deadlines
+        }
@@ -0,0 +1,255 @@
+# -*- coding:utf8 -*-
+"""
+stok会话管理模块
+学习stok的有效期并在过期前后台重新登录，使轮询尽量不走登录路径
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from core.ds_query import DsQuery, DsResult
+from core.resilience import CircuitOpenError, DeadlineExceeded
+
+
+class StokSessionManager:
+    """stok会话生命周期管理器"""
+
+    def __init__(self, router, config, refresh_margin: float = 0.8,
+                 default_lifetime: Optional[float] = None,
+                 min_lifetime: float = 60, login_listener=None, clock=time.time):
+        """
+        Args:
+            router: RouterMonitor实例
+            config: 配置（stok、encrypt_password、last_login_time会写回其中）
+            refresh_margin: 在估计有效期的该比例处提前刷新
+            default_lifetime: 尚未观测到过期时使用的有效期（秒），None表示不主动刷新
+            min_lifetime: 小于该值的过期观测视为被其他登录挤掉，不参与学习
+            login_listener: 每次登录后调用 login_listener(success, reason)，用于记录登录事件
+            clock: 返回当前时间戳的函数，与保存的登录时间比较，需为墙上时间
+        """
+        self.router = router
+        self.config = config
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self.min_lifetime = min_lifetime
+        self.login_listener = login_listener
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.login_at = self._parse_login_time(config.get('last_login_time'))
+        self.last_success_at = None
+        self.lifetime_samples = deque(maxlen=10)
+
+        self.stats = {
+            'queries': 0,
+            'stok_reused': 0,
+            'logins': 0,
+            'login_failures': 0,
+            'proactive_refreshes': 0,
+            'expiries': 0
+        }
+
+    @staticmethod
+    def _parse_login_time(value) -> Optional[float]:
+        """将配置中的ISO格式登录时间转换为时间戳"""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+
+    def estimated_lifetime(self) -> Optional[float]:
+        """估计的stok有效期（秒），取最近观测值中最保守的一个"""
+        if self.lifetime_samples:
+            return min(self.lifetime_samples)
+        return self.default_lifetime
+
+    def seconds_until_refresh(self) -> Optional[float]:
+        """距离下次主动刷新的秒数，无法估计时返回None"""
+        lifetime = self.estimated_lifetime()
+        if lifetime is None or self.login_at is None or not self.config.get('stok'):
+            return None
+        refresh_at = self.login_at + lifetime * self.refresh_margin
+        return max(refresh_at - self.clock(), 0.0)
+
+    def login(self, reason: str = '', deadline=None) -> Optional[str]:
+        """
+        登录并写回新的stok
+
+        Raises:
+            CircuitOpenError: 熔断器打开，没有尝试登录，不记为登录失败
+            DeadlineExceeded: 本轮预算已用完
+        """
+        with self._lock:
+            if not self.config.get('encrypt_password') and not self.config.get('password'):
+                logging.error("配置中没有 WIFI 密码，无法登录")
+                return None
+
+            try:
+                if not self.config.get('encrypt_password'):
+                    self.config['encrypt_password'] = self.router.encrypt_pwd(
+                        self.config['password'])
+                login_response = self.router.login(
+                    encrypt_password=self.config['encrypt_password'],
+                    deadline=deadline)
+            except (CircuitOpenError, DeadlineExceeded):
+                raise
+            except Exception as e:
+                logging.error(f"登录过程中发生错误: {e}")
+                login_response = None
+
+            if not login_response or 'stok' not in login_response:
+                self.stats['login_failures'] += 1
+                logging.error("登录失败")
+                self._notify_login(False, reason)
+                return None
+
+            self.stats['logins'] += 1
+            self.login_at = self.clock()
+            self.last_success_at = None
+            self.config['stok'] = login_response['stok']
+            self.config['last_login_time'] = datetime.fromtimestamp(
+                self.login_at).isoformat()
+            logging.info(f"登录成功{f'（{reason}）' if reason else ''}")
+            self._notify_login(True, reason)
+            return self.config['stok']
+
+    def _notify_login(self, success: bool, reason: str):
+        if self.login_listener is None:
+            return
+        try:
+            self.login_listener(success, reason)
+        except Exception as e:
+            logging.error(f"记录登录事件失败: {e}")
+
+    def _report_expired(self, stok: str, deadline=None) -> Optional[str]:
+        """
+        记录一次stok过期并重新登录
+
+        Returns:
+            str: 当前可用的stok
+        """
+        with self._lock:
+            # 其他线程已经刷新过stok，直接使用新的
+            if stok != self.config.get('stok'):
+                return self.config.get('stok')
+
+            self.stats['expiries'] += 1
+            if self.login_at is not None:
+                # 最后一次成功使用时stok仍然有效，以此作为有效期的保守估计
+                alive_until = self.last_success_at or self.clock()
+                lifetime = alive_until - self.login_at
+                if lifetime >= self.min_lifetime:
+                    self.lifetime_samples.append(lifetime)
+                    logging.info(f"观测到stok有效期约 {lifetime:.0f} 秒")
+            logging.warning("保存的stok已失效，需要重新登录")
+            return self.login('stok过期', deadline)
+
+    def query(self, query: DsQuery, deadline=None) -> Optional[DsResult]:
+        """
+        使用当前stok执行ds查询，stok失效时重新登录后重试一次
+
+        Args:
+            query: 查询构造器
+            deadline: 本轮轮询的截止时间，登录和重试共用同一预算
+
+        Returns:
+            DsResult: 查询结果，失败返回None
+
+        Raises:
+            CircuitOpenError: 熔断器打开，不会因此重新登录
+            DeadlineExceeded: 本轮预算已用完
+        """
+        with self._lock:
+            self.stats['queries'] += 1
+            stok = self.config.get('stok')
+        reused = bool(stok)
+        if not stok:
+            stok = self.login('无可用stok', deadline)
+            if not stok:
+                return None
+
+        result = self.router.execute_query(query, stok, deadline)
+        if result is not None and result.stok_expired:
+            reused = False
+            stok = self._report_expired(stok, deadline)
+            if not stok:
+                return None
+            result = self.router.execute_query(query, stok, deadline)
+
+        if result is not None and result.ok:
+            with self._lock:
+                if stok == self.config.get('stok'):
+                    self.last_success_at = self.clock()
+                if reused:
+                    self.stats['stok_reused'] += 1
+        return result
+
+    def maybe_refresh(self) -> bool:
+        """到达刷新时间时主动重新登录"""
+        remaining = self.seconds_until_refresh()
+        if remaining is None or remaining > 0:
+            return False
+        with self._lock:
+            # 加锁后再检查一次，避免重复刷新
+            remaining = self.seconds_until_refresh()
+            if remaining is None or remaining > 0:
+                return False
+            if self.login('主动刷新'):
+                self.stats['proactive_refreshes'] += 1
+                return True
+            return False
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop,
+                                        name='stok-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _refresh_loop(self):
+        """后台刷新循环"""
+        while not self._stop_event.is_set():
+            remaining = self.seconds_until_refresh()
+            # 尚无有效期估计时定期检查是否已学习到
+            wait = 30.0 if remaining is None else min(remaining, 30.0)
+            if wait > 0:
+                self._stop_event.wait(wait)
+                continue
+            try:
+                refreshed = self.maybe_refresh()
+            except Exception as e:
+                logging.error(f"后台刷新stok失败: {e}")
+                refreshed = False
+            if not refreshed:
+                # 刷新失败时稍后再试，避免反复请求路由器
+                self._stop_event.wait(30.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取会话统计
+
+        Returns:
+            dict: 查询数、stok复用率、登录次数等
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        queries = stats['queries']
+        stats['reuse_ratio'] = stats['stok_reused'] / queries if queries else 0.0
+        stats['estimated_lifetime'] = self.estimated_lifetime()
+        return stats
@@ -0,0 +1,149 @@
+# -*- coding:utf8 -*-
+"""
+WAN口历史数据分析程序
+流式读取DataManager保存的历史，统计IP租期、变化频率、可用率、登录频率和轮询延迟
+"""
+import sys
+import os
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import json_codec
+from utils.config_manager import ConfigManager
+from utils.data_manager import DataManager
+from utils.history_analytics import DEFAULT_GAP_THRESHOLD, HistoryAnalyzer
+
+
+def _format_duration(seconds) -> str:
+    """秒数转为易读的时长"""
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f'{days}天{hours}小时{minutes}分'
+    if hours:
+        return f'{hours}小时{minutes}分'
+    return f'{minutes}分{seconds}秒'
+
+
+def _format_number(value, digits: int = 2) -> str:
+    return '-' if value is None else f'{value:.{digits}f}'
+
+
+def _site_config(config, router_name):
+    """舰队模式下取单台路由器的配置（未填写的项沿用顶层配置），未填写名称的路由器按host匹配"""
+    if not router_name:
+        return config
+    for router in config.get('routers', []):
+        if (router.get('name') or router.get('host')) == router_name:
+            site_config = dict(config)
+            site_config.update(router)
+            return site_config
+    raise SystemExit(f"配置中没有名为 {router_name} 的路由器")
+
+
+def analyze(data_manager: DataManager, start=None, end=None,
+            gap_threshold: float = DEFAULT_GAP_THRESHOLD):
+    """单次遍历历史数据并返回统计结果"""
+    analyzer = HistoryAnalyzer(gap_threshold)
+    for record in data_manager.iter_wan_history(start, end):
+        analyzer.add_record(record)
+
+    logins = data_manager.iter_login_events(start, end)
+    for login in logins or ():
+        analyzer.add_login(login['success'])
+    return analyzer.report(include_logins=logins is not None)
+
+
+def print_report(report):
+    """打印文本报告"""
+    print("=" * 60)
+    print("WAN口历史数据分析")
+    print("=" * 60)
+    if not report['samples']:
+        print("没有历史数据")
+        return
+
+    availability = report['availability']
+    ip = report['ip']
+    leases = ip['leases_seconds']
+    latency = report['latency_ms']
+    print(f"时间范围: {report['start']} ~ {report['end']}，共 {report['samples']} 条采样")
+    print(f"WAN可用率: {_format_number(availability['percent'], 3)}% "
+          f"(在线 {_format_duration(availability['up_seconds'])}，"
+          f"离线 {_format_duration(availability['down_seconds'])}，"
+          f"无数据 {_format_duration(availability['gap_seconds'])})")
+    print(f"断线次数: {availability['outages']}，"
+          f"最长断线: {_format_duration(availability['longest_outage_seconds'])}")
+    print(f"当前IP: {ip['current']}，已持续 {_format_duration(ip['current_lease_seconds'])}")
+    print(f"IP变化: {ip['changes']} 次，平均每天 {_format_number(ip['changes_per_day'])} 次")
+    print(f"IP租期: 完整租期 {leases['count']} 个，"
+          f"中位数 {_format_duration(leases['median'])}，"
+          f"平均 {_format_duration(leases['mean'])}，"
+          f"最短 {_format_duration(leases['min'])}，最长 {_format_duration(leases['max'])}")
+    logins = report['logins']
+    if logins is None:
+        print("登录频率: 当前存储后端不记录登录事件（使用 sqlite 后端可统计）")
+    else:
+        print(f"登录: {logins['count']} 次（失败 {logins['failures']} 次），"
+              f"平均每天 {_format_number(logins['per_day'])} 次")
+    if latency['count']:
+        print(f"轮询延迟(ms): p50={_format_number(latency['p50'])} "
+              f"p90={_format_number(latency['p90'])} "
+              f"p99={_format_number(latency['p99'])} "
+              f"max={_format_number(latency['max'])}（{latency['count']} 个样本）")
+    else:
+        print("轮询延迟: 历史中没有延迟数据")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='WAN口历史数据分析')
+    parser.add_argument('--config', help='配置文件路径，默认使用 router_config.json')
+    parser.add_argument('--router', help='舰队模式下要分析的路由器名称（未填写名称时为host）')
+    parser.add_argument('--days', type=float, help='只分析最近若干天')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='开始时间（ISO格式）')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='结束时间（ISO格式）')
+    parser.add_argument('--gap', type=float, default=DEFAULT_GAP_THRESHOLD,
+                        help='采样间隔超过该秒数时视为数据缺失')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config_manager = ConfigManager(args.config) if args.config else ConfigManager()
+    config = config_manager.load_config()
+    if not config:
+        raise SystemExit("无法加载配置文件")
+
+    start = args.since
+    if args.days is not None:
+        start = datetime.now() - timedelta(days=args.days)
+
+    # 只读分析：不预加载缓存、不启动后台写入线程，也不创建或修改任何数据文件
+    try:
+        data_manager = DataManager.from_config(_site_config(config, args.router), args.router,
+                                               cache_size=0, flush_interval=0, read_only=True)
+    except FileNotFoundError as e:
+        raise SystemExit(str(e))
+    try:
+        report = analyze(data_manager, start, args.until, args.gap)
+    finally:
+        data_manager.close()
+
+    if args.json:
+        print(json_codec.dumps(report, pretty=True))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,15 @@ TP-LINK 路由器监控系统主程序
 """
 import sys
 import os
+import signal
 import logging
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from core.monitor_service import RouterMonitorService
+from core.fleet_service import FleetMonitorService
+from utils.config_manager import ConfigManager
 from utils.path_utils import get_absolute_path, ensure_dir_exists
 
 # 配置日志
@@ -26,14 +29,27 @@ logging.basicConfig(
     ]
 )
 
+def _handle_sigterm(signum, frame):
+    """systemd等发送SIGTERM时按Ctrl+C处理，保证缓存的数据写入磁盘后再退出"""
+    raise KeyboardInterrupt
+
+
 def main():
     """主函数"""
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     try:
-        # 创建监控服务
-        monitor_service = RouterMonitorService()
+        config_manager = ConfigManager()
+        config = config_manager.load_config()
         
-        # 开始监控
-        monitor_service.monitor_wan_status()
+        if config and config.get('routers'):
+            # 配置了routers列表时进入舰队模式
+            FleetMonitorService(config_manager).run()
+        else:
+            # 创建监控服务
+            monitor_service = RouterMonitorService(config_manager)
+            
+            # 开始监控
+            monitor_service.monitor_wan_status()
         
     except KeyboardInterrupt:
         logging.info("程序被用户中断")
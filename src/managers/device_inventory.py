@@ -0,0 +1,151 @@
+# -*- coding:utf8 -*-
+"""
+客户端设备清单模块
+以MAC为索引维护路由器下的设备，只输出增量变化
+"""
+import os
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+from utils import json_codec
+from utils.file_utils import atomic_write
+from utils.path_utils import get_absolute_path
+
+
+class DeviceChange:
+    """设备变化记录"""
+
+    JOINED = 'joined'
+    LEFT = 'left'
+    IP_CHANGED = 'ip_changed'
+    NAME_CHANGED = 'name_changed'
+
+    __slots__ = ('kind', 'mac', 'old', 'new')
+
+    def __init__(self, kind: str, mac: str, old: Optional[str] = None,
+                 new: Optional[str] = None):
+        self.kind = kind
+        self.mac = mac
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        return f"DeviceChange({self.kind}, {self.mac}, {self.old} -> {self.new})"
+
+    def describe(self) -> str:
+        """可读的变化描述"""
+        if self.kind == self.JOINED:
+            return f"设备上线: {self.mac} {self.new}"
+        if self.kind == self.LEFT:
+            return f"设备离线: {self.mac} {self.old}"
+        if self.kind == self.IP_CHANGED:
+            return f"设备IP变化: {self.mac} {self.old} -> {self.new}"
+        return f"设备名称变化: {self.mac} {self.old} -> {self.new}"
+
+
+class DeviceInventory:
+    """客户端设备清单"""
+
+    def __init__(self, data_file: str = 'data/devices.json'):
+        self.data_file = get_absolute_path(data_file)
+        # mac -> {'ip', 'name', 'first_seen', 'last_seen'}
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self._fingerprint = None
+        self.load()
+
+    @staticmethod
+    def normalize_row(row: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """将路由器返回的主机表行规范为 mac/ip/name"""
+        mac = row.get('mac')
+        if not mac:
+            return None
+        return {
+            'mac': mac.lower().replace('-', ':'),
+            'ip': row.get('ip', ''),
+            # 路由器返回的主机名经过URL编码
+            'name': unquote(row.get('hostname', '') or '')
+        }
+
+    def update(self, rows: List[Dict[str, Any]]) -> List[DeviceChange]:
+        """
+        用最新的主机表更新清单
+
+        Args:
+            rows: 主机表行，如 DsResult.host_table
+
+        Returns:
+            list: 本次发生的设备变化，无变化时为空列表
+        """
+        current = {}
+        for row in rows:
+            device = self.normalize_row(row)
+            if device:
+                current[device['mac']] = device
+
+        now = int(time.time())
+
+        # 主机表与上次完全相同时跳过逐项比较
+        fingerprint = hash(frozenset((mac, d['ip'], d['name']) for mac, d in current.items()))
+        if fingerprint == self._fingerprint:
+            for mac in current:
+                self.devices[mac]['last_seen'] = now
+            return []
+        self._fingerprint = fingerprint
+
+        changes = []
+        for mac, device in current.items():
+            known = self.devices.get(mac)
+            if known is None:
+                self.devices[mac] = {
+                    'ip': device['ip'],
+                    'name': device['name'],
+                    'first_seen': now,
+                    'last_seen': now
+                }
+                changes.append(DeviceChange(DeviceChange.JOINED, mac, new=device['ip']))
+                continue
+
+            if known['ip'] != device['ip']:
+                changes.append(DeviceChange(DeviceChange.IP_CHANGED, mac,
+                                            known['ip'], device['ip']))
+                known['ip'] = device['ip']
+            if device['name'] and known['name'] != device['name']:
+                changes.append(DeviceChange(DeviceChange.NAME_CHANGED, mac,
+                                            known['name'], device['name']))
+                known['name'] = device['name']
+            known['last_seen'] = now
+
+        for mac in [mac for mac in self.devices if mac not in current]:
+            known = self.devices.pop(mac)
+            changes.append(DeviceChange(DeviceChange.LEFT, mac, old=known['ip']))
+
+        if changes:
+            self.save()
+        return changes
+
+    def get_device(self, mac: str) -> Optional[Dict[str, Any]]:
+        """按MAC查询设备"""
+        return self.devices.get(mac.lower().replace('-', ':'))
+
+    def load(self) -> bool:
+        """从文件加载设备清单"""
+        try:
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'rb') as f:
+                    self.devices = json_codec.load(f)
+            return True
+        except Exception as e:
+            logging.error(f"加载设备清单失败: {e}")
+            return False
+
+    def save(self) -> bool:
+        """以紧凑格式保存设备清单（仅在有变化时调用）"""
+        try:
+            # 原子替换，写入中断时不会留下损坏的清单
+            atomic_write(self.data_file, json_codec.dumps_bytes(self.devices))
+            return True
+        except Exception as e:
+            logging.error(f"保存设备清单失败: {e}")
+            return False
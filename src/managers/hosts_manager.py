@@ -1,22 +1,94 @@
 # -*- coding:utf8 -*-
+import hashlib
 import os
 import logging
 import subprocess
+import threading
 from datetime import datetime
-from utils.path_utils import get_absolute_path, ensure_dir_exists
+from managers.hosts_table import DEFAULT_GROUP, STATIC_GROUP, HostsTable
+from utils.file_utils import atomic_write
+from utils.path_utils import get_absolute_path
+
+# 舰队模式下多个路由器共享同一个Git仓库，Git操作需要串行执行
+_git_lock = threading.Lock()
+
+# 动态IP部分的起始标记，之前的内容（静态前缀）原样保留
+DYNAMIC_MARKER = "# Dynamic WAN IP entries (auto-updated)\n"
+_UPDATED_AT_PREFIX = "# Updated at: "
+
+DEFAULT_DOMAINS = [
+    "example.com",
+    "www.example.com",
+    "api.example.com",
+    "app.example.com"
+]
+
+
+def _entries_digest(entries: str) -> str:
+    """动态部分条目的摘要（不含更新时间）"""
+    return hashlib.sha256(entries.encode('utf-8')).hexdigest()
+
+
+# 舰队模式下多个路由器写同一个hosts文件时共用一个管理器
+_shared_managers = {}
+_shared_git_managers = {}
+_shared_lock = threading.Lock()
 
 
 class HostsManager:
-    def __init__(self, hosts_file_path='hosts'):
+    def __init__(self, hosts_file_path='hosts', overrides=None):
         """
         初始化hosts文件管理器
         
         Args:
             hosts_file_path (str): hosts文件路径，默认为项目根目录下的hosts文件
+            overrides (dict): 静态覆盖的 域名 -> IP，优先于WAN口IP
         """
         self.hosts_file_path = get_absolute_path(hosts_file_path)
         self.current_ip = None
+        self.overrides = dict(overrides or {})
+        # 动态部分的条目，按域名和IP索引
+        self.table = HostsTable()
+        # 静态前缀（含动态部分标记）、动态条目摘要和写入后文件的 (mtime, size)，
+        # 文件未被外部修改时更新不需要重新读取文件
+        self._static_prefix = None
+        self._entries_digest = None
+        self._file_signature = None
+        self._lock = threading.RLock()
         
+    @classmethod
+    def shared(cls, hosts_file_path='hosts', overrides=None):
+        """按文件路径共用的管理器，多个组（路由器）写同一个hosts文件时使用"""
+        path = get_absolute_path(hosts_file_path)
+        with _shared_lock:
+            manager = _shared_managers.get(path)
+            if manager is None:
+                manager = _shared_managers[path] = cls(hosts_file_path, overrides)
+            elif overrides is not None:
+                manager.set_overrides(overrides)
+            return manager
+    
+    def set_overrides(self, overrides):
+        """设置静态覆盖，下次更新hosts文件时写入"""
+        with self._lock:
+            self.overrides = dict(overrides or {})
+            self._apply_overrides()
+    
+    def _apply_overrides(self):
+        if self.overrides:
+            self.table.set_group_entries(STATIC_GROUP, self.overrides)
+        elif STATIC_GROUP in self.table.groups:
+            self.table.remove_group(STATIC_GROUP)
+        
+    @staticmethod
+    def _default_prefix():
+        """新建hosts文件时的静态前缀"""
+        return ("# Auto-generated hosts file\n"
+                f"# Created at: {datetime.now().isoformat()}\n"
+                "# This file is automatically updated by router monitor\n\n"
+                "127.0.0.1    localhost\n"
+                "::1          localhost\n\n" + DYNAMIC_MARKER)
+    
     def create_hosts_file(self, domain_list=None):
         """
         创建初始hosts文件
@@ -25,30 +97,17 @@ class HostsManager:
             domain_list (list): 需要绑定的域名列表，默认为一些常用域名
         """
         if domain_list is None:
-            domain_list = [
-                "example.com",
-                "www.example.com",
-                "api.example.com",
-                "app.example.com"
-            ]
+            domain_list = DEFAULT_DOMAINS
         
         try:
-            # 确保文件所在目录存在
-            ensure_dir_exists(self.hosts_file_path)
-            
-            with open(self.hosts_file_path, 'w', encoding='utf-8') as f:
-                f.write("# Auto-generated hosts file\n")
-                f.write(f"# Created at: {datetime.now().isoformat()}\n")
-                f.write("# This file is automatically updated by router monitor\n\n")
-                
-                # 添加默认的localhost条目
-                f.write("127.0.0.1    localhost\n")
-                f.write("::1          localhost\n\n")
-                
-                # 添加注释说明动态IP部分
-                f.write("# Dynamic WAN IP entries (auto-updated)\n")
-                for domain in domain_list:
-                    f.write(f"# {domain}\n")
+            prefix = self._default_prefix()
+            # 添加注释说明动态IP部分
+            content = prefix + ''.join(f"# {domain}\n" for domain in domain_list)
+            with self._lock:
+                atomic_write(self.hosts_file_path, content.encode('utf-8'))
+                self.table = HostsTable()
+                self._apply_overrides()
+                self._remember(prefix, None)
                 
             logging.info(f"hosts文件已创建: {self.hosts_file_path}")
             return True
@@ -57,102 +116,132 @@ class HostsManager:
             logging.error(f"创建hosts文件失败: {e}")
             return False
     
-    def update_hosts_file(self, new_ip, domain_list=None):
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.hosts_file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _remember(self, prefix, digest):
+        """记录刚写入或读取的文件状态"""
+        self._static_prefix = prefix
+        self._entries_digest = digest
+        self._file_signature = self._stat_signature()
+    
+    def _load_file_state(self):
+        """
+        文件不存在或被外部修改时重新解析：静态前缀和动态条目摘要
+        
+        Returns:
+            bool: 文件是否存在
+        """
+        signature = self._stat_signature()
+        if signature is None:
+            if self._file_signature is not None or self._static_prefix is None:
+                # 文件被删除：之前的条目已不在文件中
+                self.table = HostsTable()
+                self._apply_overrides()
+            self._static_prefix = None
+            self._entries_digest = None
+            self._file_signature = None
+            return False
+        if signature == self._file_signature and self._static_prefix is not None:
+            return True
+        
+        with open(self.hosts_file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        position = content.find(DYNAMIC_MARKER)
+        if position < 0:
+            # 没有动态部分时在末尾添加
+            if content and not content.endswith('\n'):
+                content += '\n'
+            self.table = HostsTable()
+            self._apply_overrides()
+            self._remember(content + '\n' + DYNAMIC_MARKER, None)
+            return True
+        
+        split = position + len(DYNAMIC_MARKER)
+        entries = ''.join(line for line in content[split:].splitlines(True)
+                          if not line.startswith(_UPDATED_AT_PREFIX))
+        # 文件中其他组（路由器）的条目保留，由各自的更新替换
+        self.table = HostsTable.parse(entries)
+        self._apply_overrides()
+        self._remember(content[:split], _entries_digest(entries))
+        return True
+    
+    def lookup(self, domain):
+        """域名在hosts文件中指向的IP"""
+        with self._lock:
+            self._load_file_state()
+            return self.table.lookup(domain)
+    
+    def domains_for(self, ip):
+        """hosts文件中指向某个IP的所有域名"""
+        with self._lock:
+            self._load_file_state()
+            return self.table.domains_for(ip)
+    
+    def update_hosts_file(self, new_ip, domain_list=None, group=DEFAULT_GROUP):
         """
         更新hosts文件中的IP地址
         
+        只有动态部分的条目变化时才写文件，写入时先写临时文件再原子替换，
+        读者不会看到写了一半的hosts文件
+        
         Args:
             new_ip (str): 新的IP地址
             domain_list (list): 需要更新的域名列表
+            group (str): 条目所属的组，舰队模式下多个路由器共用一个文件时为路由器名称
             
         Returns:
             bool: 是否有实际更新
         """
         if domain_list is None:
-            domain_list = [
-                "example.com",
-                "www.example.com", 
-                "api.example.com",
-                "app.example.com"
-            ]
-        
-        # 如果IP没有变化，不需要更新
-        if self.current_ip == new_ip:
-            logging.info(f"IP地址未变化({new_ip})，跳过更新hosts文件")
-            return False
+            domain_list = DEFAULT_DOMAINS
             
         try:
-            # 如果文件不存在，先创建
-            if not os.path.exists(self.hosts_file_path):
-                self.create_hosts_file(domain_list)
-            
-            # 读取现有内容
-            with open(self.hosts_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 更新内容
-            updated_content = []
-            in_dynamic_section = False
-            
-            for line in lines:
-                # 标记动态IP部分的开始
-                if "# Dynamic WAN IP entries" in line:
-                    in_dynamic_section = True
-                    updated_content.append(line)
-                    # 找到动态部分后，清空该部分的旧内容，直接跳出循环
-                    break
+            with self._lock:
+                if not self._load_file_state():
+                    self._static_prefix = self._default_prefix()
+                    logging.info(f"hosts文件不存在，将创建: {self.hosts_file_path}")
                 
-                updated_content.append(line)
-            
-            # 如果没有找到动态部分，添加它
-            if not in_dynamic_section:
-                updated_content.extend([
-                    "\n# Dynamic WAN IP entries (auto-updated)\n"
-                ])
-            
-            # 添加新的更新时间和IP条目
-            updated_content.append(f"# Updated at: {datetime.now().isoformat()}\n")
-            for domain in domain_list:
-                updated_content.append(f"{new_ip}    {domain}\n")
-            
-            # 写入更新后的内容
-            with open(self.hosts_file_path, 'w', encoding='utf-8') as f:
-                f.writelines(updated_content)
+                changed = self.table.set_group(group, new_ip, domain_list)
+                entries = self.table.render()
+                digest = _entries_digest(entries)
+                if digest == self._entries_digest:
+                    self.current_ip = new_ip
+                    logging.info(f"hosts条目未变化({new_ip})，跳过更新hosts文件")
+                    return False
+                
+                content = (self._static_prefix +
+                           f"{_UPDATED_AT_PREFIX}{datetime.now().isoformat()}\n" + entries)
+                atomic_write(self.hosts_file_path, content.encode('utf-8'))
+                self._remember(self._static_prefix, digest)
             
             self.current_ip = new_ip
-            logging.info(f"hosts文件已更新，新IP: {new_ip}")
+            logging.info(f"hosts文件已更新，新IP: {new_ip}（{len(changed)} 个域名变化）")
             return True
             
         except Exception as e:
             logging.error(f"更新hosts文件失败: {e}")
             return False
     
-    def get_current_ip_from_hosts(self):
+    def get_current_ip_from_hosts(self, group=DEFAULT_GROUP):
         """
         从hosts文件中获取当前设置的IP地址
         
+        Args:
+            group (str): 组名称，舰队模式下为路由器名称
+        
         Returns:
-            str: 当前IP地址，如果未找到返回None
+            str: 该组的IP地址，文件中没有该组时返回None（不使用其他路由器的IP）
         """
         try:
-            if not os.path.exists(self.hosts_file_path):
-                return None
-                
-            with open(self.hosts_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 查找最后一个有效的IP条目
-            for line in reversed(lines):
-                stripped_line = line.strip()
-                if stripped_line and not stripped_line.startswith('#'):
-                    parts = stripped_line.split()
-                    if len(parts) >= 2:
-                        # 简单验证是否为IP地址格式
-                        ip = parts[0]
-                        if ip.count('.') == 3 and ip != '127.0.0.1':
-                            return ip
-            
-            return None
+            with self._lock:
+                if not self._load_file_state():
+                    return None
+                return self.table.group_ip(group)
             
         except Exception as e:
             logging.error(f"读取hosts文件失败: {e}")
@@ -168,6 +257,18 @@ class GitManager:
             repo_path (str): Git仓库路径，默认为项目根目录
         """
         self.repo_path = get_absolute_path(repo_path)
+        # 已设置的 (用户名, 邮箱)，相同时不再执行git config
+        self._git_user = None
+    
+    @classmethod
+    def shared(cls, repo_path='.'):
+        """按仓库路径共用的管理器，舰队模式下各路由器只初始化和配置一次仓库"""
+        path = get_absolute_path(repo_path)
+        with _shared_lock:
+            manager = _shared_git_managers.get(path)
+            if manager is None:
+                manager = _shared_git_managers[path] = cls(repo_path)
+            return manager
     
     def is_git_repo(self):
         """检查是否为Git仓库"""
@@ -197,15 +298,21 @@ class GitManager:
         添加文件到Git并提交
         
         Args:
-            file_path (str): 要添加的文件路径
+            file_path (str or list): 要添加的文件路径，可以是多个
             commit_message (str): 提交信息
             
         Returns:
             bool: 是否成功
         """
+        with _git_lock:
+            return self._add_and_commit(file_path, commit_message)
+    
+    def _add_and_commit(self, file_path, commit_message):
+        """在持有Git锁的情况下执行添加和提交"""
         try:
             # 添加文件
-            result = subprocess.run(['git', 'add', file_path], 
+            paths = [file_path] if isinstance(file_path, str) else list(file_path)
+            result = subprocess.run(['git', 'add', *paths], 
                                   cwd=self.repo_path, 
                                   capture_output=True, 
                                   text=True)
@@ -252,10 +359,11 @@ class GitManager:
             bool: 是否成功
         """
         try:
-            result = subprocess.run(['git', 'push', remote, branch], 
-                                  cwd=self.repo_path, 
-                                  capture_output=True, 
-                                  text=True)
+            with _git_lock:
+                result = subprocess.run(['git', 'push', remote, branch], 
+                                      cwd=self.repo_path, 
+                                      capture_output=True, 
+                                      text=True)
             if result.returncode == 0:
                 logging.info(f"推送到远程仓库成功: {remote}/{branch}")
                 return True
@@ -275,6 +383,8 @@ class GitManager:
             name (str): 用户名
             email (str): 邮箱
         """
+        if self._git_user == (name, email):
+            return
         try:
             subprocess.run(['git', 'config', 'user.name', name], 
                           cwd=self.repo_path, 
@@ -284,6 +394,7 @@ class GitManager:
                           cwd=self.repo_path, 
                           capture_output=True, 
                           text=True)
+            self._git_user = (name, email)
             logging.info(f"Git配置已设置: {name} <{email}>")
         except Exception as e:
             logging.error(f"设置Git配置时发生错误: {e}")
@@ -0,0 +1,211 @@
+# -*- coding:utf8 -*-
+"""
+hosts条目模型模块
+按域名和按IP索引的内存hosts表，支持按组（路由器、静态覆盖）设置目标IP，只重新生成变化的组
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 单路由器模式的组，文件中不输出组标记，与旧版格式一致
+DEFAULT_GROUP = 'default'
+# 静态覆盖的组，优先于其他组
+STATIC_GROUP = 'static'
+
+GROUP_PREFIX = "# group: "
+# 被其他组覆盖的条目以注释输出，不生效，但解析时可以还原组的内容
+SHADOWED_PREFIX = "# shadowed: "
+
+
+class HostsTable:
+    """
+    内存中的hosts条目
+
+    每个组提供 域名 -> IP 的映射；同一域名出现在多个组中时，静态覆盖优先，其次是先加入的组。
+    按域名、按IP查询以及单个域名的更新都是O(1)
+    """
+
+    def __init__(self):
+        # 组 -> {域名: IP}，按加入顺序
+        self._groups: Dict[str, Dict[str, str]] = {}
+        # 组的主IP（set_group设置的IP）
+        self._group_ips: Dict[str, str] = {}
+        # 域名 -> 列出该域名的组（按加入顺序）
+        self._listed_in: Dict[str, Dict[str, None]] = {}
+        # 生效的条目：域名 -> (IP, 组)
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        # IP -> 指向该IP的域名
+        self._by_ip: Dict[str, Dict[str, None]] = {}
+        # 组 -> 已生成的条目文本，组内条目变化时失效
+        self._rendered: Dict[str, str] = {}
+
+    # ---- 查询 ----
+
+    def lookup(self, domain: str) -> Optional[str]:
+        """域名当前指向的IP"""
+        entry = self._entries.get(domain)
+        return entry[0] if entry else None
+
+    def owner(self, domain: str) -> Optional[str]:
+        """域名生效条目所属的组"""
+        entry = self._entries.get(domain)
+        return entry[1] if entry else None
+
+    def domains_for(self, ip: str) -> List[str]:
+        """指向某个IP的所有域名"""
+        return list(self._by_ip.get(ip, ()))
+
+    def group_ip(self, group: str) -> Optional[str]:
+        """组的主IP，未设置时为None"""
+        return self._group_ips.get(group)
+
+    @property
+    def groups(self) -> List[str]:
+        return list(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---- 更新 ----
+
+    def set_group(self, group: str, ip: str, domains: Iterable[str]) -> Set[str]:
+        """
+        把组内的所有域名指向同一个IP
+
+        Returns:
+            set: 生效IP发生变化的域名
+        """
+        self._group_ips[group] = ip
+        return self.set_group_entries(group, {domain: ip for domain in domains})
+
+    def set_group_entries(self, group: str, entries: Dict[str, str]) -> Set[str]:
+        """
+        替换组内的 域名 -> IP 映射，只处理有变化的域名
+
+        Returns:
+            set: 生效IP发生变化的域名
+        """
+        old = self._groups.get(group, {})
+        touched = [domain for domain, ip in old.items() if entries.get(domain) != ip]
+        touched.extend(domain for domain in entries if domain not in old)
+        if group not in self._groups or list(old) != list(entries):
+            # 组内顺序变化也需要重新生成
+            self._rendered.pop(group, None)
+        self._groups[group] = dict(entries)
+        if group != STATIC_GROUP and group not in self._group_ips and entries:
+            self._group_ips[group] = next(iter(entries.values()))
+
+        for domain in touched:
+            groups = self._listed_in.setdefault(domain, {})
+            if domain in entries:
+                groups[group] = None
+            else:
+                groups.pop(group, None)
+                if not groups:
+                    del self._listed_in[domain]
+        return {domain for domain in touched if self._refresh(domain)}
+
+    def set_entry(self, group: str, domain: str, ip: Optional[str]) -> bool:
+        """
+        设置组内单个域名的IP，ip为None时从组中删除
+
+        Returns:
+            bool: 生效IP是否变化
+        """
+        entries = self._groups.setdefault(group, {})
+        if entries.get(domain) == ip:
+            return False
+        if ip is None:
+            del entries[domain]
+            groups = self._listed_in[domain]
+            groups.pop(group, None)
+            if not groups:
+                del self._listed_in[domain]
+        else:
+            entries[domain] = ip
+            self._listed_in.setdefault(domain, {})[group] = None
+        self._rendered.pop(group, None)
+        return self._refresh(domain)
+
+    def remove_group(self, group: str) -> Set[str]:
+        """删除整个组"""
+        changed = self.set_group_entries(group, {})
+        del self._groups[group]
+        self._group_ips.pop(group, None)
+        self._rendered.pop(group, None)
+        return changed
+
+    def _refresh(self, domain: str) -> bool:
+        """重新计算域名的生效条目，返回是否变化"""
+        groups = self._listed_in.get(domain)
+        new = None
+        if groups:
+            group = STATIC_GROUP if STATIC_GROUP in groups else next(iter(groups))
+            new = (self._groups[group][domain], group)
+        old = self._entries.get(domain)
+        if new == old:
+            # 被其他组覆盖的条目不输出，不影响生成的文本
+            return False
+
+        if old:
+            self._by_ip[old[0]].pop(domain, None)
+            if not self._by_ip[old[0]]:
+                del self._by_ip[old[0]]
+            self._rendered.pop(old[1], None)
+        if new:
+            self._entries[domain] = new
+            self._by_ip.setdefault(new[0], {})[domain] = None
+            self._rendered.pop(new[1], None)
+        else:
+            del self._entries[domain]
+        return True
+
+    # ---- 文本格式 ----
+
+    def render(self) -> str:
+        """
+        生成动态部分的条目文本，只重新生成有变化的组
+
+        被其他组（如静态覆盖）覆盖的条目以注释输出，全部条目都被覆盖的组也保留组标记，
+        解析后组的IP和域名不会丢失
+        """
+        parts = []
+        # 默认组没有组标记，必须放在最前面，解析时才能归到默认组
+        order = sorted(self._groups, key=lambda group: group != DEFAULT_GROUP)
+        for group in order:
+            entries = self._groups[group]
+            text = self._rendered.get(group)
+            if text is None:
+                lines = [f"{ip}    {domain}\n" if self._entries[domain][1] == group
+                         else f"{SHADOWED_PREFIX}{ip}    {domain}\n"
+                         for domain, ip in entries.items()]
+                header = f"{GROUP_PREFIX}{group}\n" if group != DEFAULT_GROUP and lines else ''
+                text = self._rendered[group] = header + ''.join(lines)
+            parts.append(text)
+        return ''.join(parts)
+
+    @classmethod
+    def parse(cls, text: str) -> 'HostsTable':
+        """
+        解析动态部分的条目文本（render 的输出）
+
+        组标记之前的条目属于默认组；被覆盖的条目归到所在的组，其他注释行忽略
+        """
+        table = cls()
+        groups: Dict[str, Dict[str, str]] = {}
+        group = DEFAULT_GROUP
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith(GROUP_PREFIX.strip()):
+                group = stripped[len(GROUP_PREFIX.strip()):].strip() or DEFAULT_GROUP
+                continue
+            if stripped.startswith(SHADOWED_PREFIX.strip()):
+                stripped = stripped[len(SHADOWED_PREFIX.strip()):].strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            parts = stripped.split()
+            if len(parts) >= 2:
+                entries = groups.setdefault(group, {})
+                for domain in parts[1:]:
+                    entries.setdefault(domain, parts[0])
+        for group, entries in groups.items():
+            table.set_group_entries(group, entries)
+        return table
@@ -0,0 +1,288 @@
+# -*- coding:utf8 -*-
+"""
+解析器输出模块
+由当前WAN口IP、域名列表和静态覆盖生成hosts、dnsmasq、DNS区域文件和JSON等多种格式，输入不变时不重新生成
+"""
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from managers.hosts_manager import HostsManager
+from managers.hosts_table import DEFAULT_GROUP
+from utils import json_codec
+from utils.file_utils import atomic_write
+from utils.path_utils import get_absolute_path
+
+
+def _digest(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class OutputTarget:
+    """输出目标基类：生成内容，内容变化时原子写入文件"""
+
+    format = None
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 输出文件路径（相对于项目根目录）
+        """
+        self.path = get_absolute_path(path)
+        # 上次生成时的输入和写入文件的内容摘要
+        self._inputs = None
+        self._digest = None
+        self._loaded = False
+
+    def render(self, ip: str, records: Dict[str, str]) -> str:
+        """
+        生成不含时间戳、序列号等易变信息的内容，用于判断是否需要写文件
+
+        Args:
+            ip: 当前WAN口IP
+            records: 域名 -> IP（已合并静态覆盖）
+        """
+        raise NotImplementedError
+
+    def compose(self, body: str) -> str:
+        """生成最终写入文件的内容"""
+        return body
+
+    def existing_body(self, content: str) -> str:
+        """从已有文件内容中取出 render 对应的部分"""
+        return content
+
+    def _load_existing(self):
+        """首次更新前读取已有文件，重启后内容相同时不重写"""
+        self._loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._digest = _digest(self.existing_body(f.read()))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"读取已有输出文件失败，将重新生成: {self.path}: {e}")
+
+    def update(self, ip: str, domains: List[str], overrides: Optional[Dict[str, str]] = None) -> bool:
+        """
+        按新的IP和域名列表更新输出文件
+
+        Args:
+            ip: 当前WAN口IP
+            domains: 指向WAN口IP的域名
+            overrides: 静态覆盖的 域名 -> IP，优先于WAN口IP
+
+        Returns:
+            bool: 是否写入了文件
+        """
+        inputs = (ip, tuple(domains))
+        if inputs == self._inputs:
+            return False
+        if not self._loaded:
+            self._load_existing()
+
+        records = dict.fromkeys(domains, ip)
+        records.update(overrides or {})
+        body = self.render(ip, records)
+        digest = _digest(body)
+        if digest != self._digest:
+            atomic_write(self.path, self.compose(body).encode('utf-8'))
+            self._digest = digest
+            written = True
+        else:
+            written = False
+        self._inputs = inputs
+        return written
+
+
+class HostsTarget(OutputTarget):
+    """/etc/hosts 格式，由 HostsManager 维护静态前缀"""
+
+    format = 'hosts'
+
+    def __init__(self, path: str = 'hosts', hosts_manager: Optional[HostsManager] = None,
+                 group: str = DEFAULT_GROUP):
+        """
+        Args:
+            path: hosts文件路径
+            hosts_manager: 已有的hosts管理器，默认按路径新建
+            group: 条目所属的组，多个路由器共用一个hosts文件时为路由器名称
+        """
+        super().__init__(path)
+        self.hosts_manager = hosts_manager or HostsManager(path)
+        self.path = self.hosts_manager.hosts_file_path
+        self.group = group
+
+    def update(self, ip: str, domains: List[str], overrides: Optional[Dict[str, str]] = None) -> bool:
+        # 静态覆盖由 HostsManager 自身维护
+        return self.hosts_manager.update_hosts_file(ip, domains, self.group)
+
+
+class DnsmasqTarget(OutputTarget):
+    """dnsmasq 配置片段（address=/域名/IP）"""
+
+    format = 'dnsmasq'
+
+    _HEADER = "# Auto-generated by router monitor, do not edit\n"
+
+    def render(self, ip: str, records: Dict[str, str]) -> str:
+        return self._HEADER + ''.join(f"address=/{domain}/{address}\n"
+                                      for domain, address in records.items())
+
+
+class JsonTarget(OutputTarget):
+    """JSON格式（{'ip': ..., 'records': {域名: IP}}），供其他程序直接读取"""
+
+    format = 'json'
+
+    def render(self, ip: str, records: Dict[str, str]) -> str:
+        return json_codec.dumps({'ip': ip, 'records': records}, pretty=True) + '\n'
+
+
+class ZoneTarget(OutputTarget):
+    """BIND/CoreDNS 区域文件，内容变化时递增SOA序列号"""
+
+    format = 'zone'
+
+    # SOA记录之后为资源记录，序列号变化不影响内容摘要
+    _RECORDS_MARKER = "; records\n"
+    _SERIAL_PATTERN = re.compile(r'(\d+)\s*;\s*serial')
+
+    def __init__(self, path: str, origin: str, ttl: int = 60,
+                 nameserver: Optional[str] = None, hostmaster: Optional[str] = None,
+                 nameserver_ip: Optional[str] = None):
+        """
+        Args:
+            path: 区域文件路径
+            origin: 区域名称，如 example.com，只输出属于该区域的域名
+            ttl: 记录的TTL（秒），IP会变化，宜设置得较短
+            nameserver: SOA和NS记录中的域名服务器，默认为 ns.<origin>
+            hostmaster: SOA中的管理员邮箱（以.代替@），默认为 hostmaster.<origin>
+            nameserver_ip: 域名服务器在区域内时其A记录（glue）的地址，默认为当前WAN口IP
+        """
+        super().__init__(path)
+        self.origin = origin.rstrip('.')
+        self.ttl = ttl
+        self.nameserver = (nameserver or f'ns.{self.origin}').rstrip('.')
+        self.nameserver_ip = nameserver_ip
+        self.hostmaster = hostmaster or f'hostmaster.{self.origin}'
+        self.serial = 0
+
+    def _relative_name(self, domain: str) -> Optional[str]:
+        domain = domain.rstrip('.')
+        if domain == self.origin:
+            return '@'
+        if domain.endswith('.' + self.origin):
+            return domain[:-len(self.origin) - 1]
+        return None
+
+    def render(self, ip: str, records: Dict[str, str]) -> str:
+        lines = []
+        for domain, address in records.items():
+            name = self._relative_name(domain)
+            if name is None:
+                logging.debug(f"域名 {domain} 不属于区域 {self.origin}，不写入区域文件")
+                continue
+            lines.append(f"{name}\tIN\tA\t{address}\n")
+        # 区域内的NS必须有地址记录，否则 named-checkzone 报错、BIND 不加载该区域
+        nameserver = self._relative_name(self.nameserver)
+        if nameserver is not None and not any(
+                domain.rstrip('.') == self.nameserver for domain in records):
+            lines.append(f"{nameserver}\tIN\tA\t{self.nameserver_ip or ip}\n")
+        return ''.join(lines)
+
+    def existing_body(self, content: str) -> str:
+        match = self._SERIAL_PATTERN.search(content)
+        if match:
+            self.serial = int(match.group(1))
+        position = content.find(self._RECORDS_MARKER)
+        return content[position + len(self._RECORDS_MARKER):] if position >= 0 else content
+
+    def next_serial(self) -> int:
+        """日期格式的序列号（YYYYMMDDnn），同一天内递增"""
+        base = int(datetime.now().strftime('%Y%m%d')) * 100
+        return max(self.serial + 1, base)
+
+    def compose(self, body: str) -> str:
+        self.serial = self.next_serial()
+        return (f"; Auto-generated by router monitor, do not edit\n"
+                f"$ORIGIN {self.origin}.\n"
+                f"$TTL {self.ttl}\n"
+                f"@\tIN\tSOA\t{self.nameserver}. {self.hostmaster}. (\n"
+                f"\t\t{self.serial} ; serial\n"
+                f"\t\t3600 ; refresh\n"
+                f"\t\t600 ; retry\n"
+                f"\t\t86400 ; expire\n"
+                f"\t\t{self.ttl} ; minimum\n"
+                f"\t)\n"
+                f"@\tIN\tNS\t{self.nameserver}.\n"
+                f"{self._RECORDS_MARKER}{body}")
+
+
+TARGET_TYPES = {target.format: target
+                for target in (HostsTarget, DnsmasqTarget, JsonTarget, ZoneTarget)}
+
+
+class ResolverOutputs:
+    """一组输出目标，使用同一份输入依次更新"""
+
+    def __init__(self, targets: List[OutputTarget], overrides: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            targets: 输出目标
+            overrides: 静态覆盖的 域名 -> IP
+        """
+        self.targets = targets
+        self.overrides = dict(overrides or {})
+
+    @classmethod
+    def from_config(cls, config, hosts_manager: Optional[HostsManager] = None,
+                    name: Optional[str] = None) -> 'ResolverOutputs':
+        """
+        按配置创建输出目标
+
+        Args:
+            config: 配置（resolver_outputs 为 [{'format', 'path', ...}] 列表）
+            hosts_manager: 已有的hosts管理器，作为hosts_file对应的输出
+            name: 舰队模式下的路由器名称，输出文件名加上 _<name> 后缀，
+                  也是共用hosts文件时条目所属的组
+        """
+        targets = []
+        if hosts_manager is not None:
+            targets.append(HostsTarget(hosts_manager=hosts_manager, group=name or DEFAULT_GROUP))
+        for options in config.get('resolver_outputs') or []:
+            options = dict(options)
+            output_format = options.pop('format', None)
+            target_type = TARGET_TYPES.get(output_format)
+            if target_type is None:
+                raise ValueError(f"不支持的解析器输出格式: {output_format}")
+            if name:
+                stem, ext = os.path.splitext(options['path'])
+                options['path'] = f'{stem}_{name}{ext}'
+            if target_type is HostsTarget:
+                options['group'] = name or DEFAULT_GROUP
+                options['hosts_manager'] = HostsManager.shared(options['path'],
+                                                               config.get('hosts_overrides') or {})
+            targets.append(target_type(**options))
+        return cls(targets, config.get('hosts_overrides'))
+
+    def update(self, ip: str, domains: List[str]) -> List[str]:
+        """
+        更新所有输出，单个输出失败不影响其他输出
+
+        Returns:
+            list: 实际写入的文件路径
+        """
+        written = []
+        for target in self.targets:
+            try:
+                if target.update(ip, domains, self.overrides):
+                    written.append(target.path)
+                    if target.format != 'hosts':
+                        logging.info(f"已更新{target.format}输出: {target.path}")
+            except Exception as e:
+                logging.error(f"更新{target.format}输出失败: {target.path}: {e}")
+        return written
@@ -1,12 +1,13 @@
 # -*- coding:utf8 -*-
 import requests
-import json
 import time
 import logging
 import hmac
 import hashlib
 import base64
 
+from utils import json_codec
+
 
 class FeishuNotifier:
     def __init__(self, webhook_url, secret):
@@ -43,7 +44,7 @@ class FeishuNotifier:
 
             response = requests.post(
                 self.webhook_url,
-                data=json.dumps(payload),
+                data=json_codec.dumps_bytes(payload),
                 headers=headers,
                 timeout=10
             )
@@ -60,12 +61,16 @@ class FeishuNotifier:
             logging.error(f"发送飞书消息时发生错误: {e}")
             return False
 
-    def send_ip_change_notification(self, old_ip, new_ip):
+    def _router_line(self, router_name):
+        """舰队模式下在消息中标明路由器名称"""
+        return f"路由器: {router_name}\n" if router_name else ""
+
+    def send_ip_change_notification(self, old_ip, new_ip, router_name=None):
         """发送IP变化通知"""
-        message = f"路由器WAN口IP地址发生变化\n旧IP: {old_ip}\n新IP: {new_ip}\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
+        message = f"路由器WAN口IP地址发生变化\n{self._router_line(router_name)}旧IP: {old_ip}\n新IP: {new_ip}\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
         return self.send_message(message)
 
-    def send_startup_notification(self, current_ip):
+    def send_startup_notification(self, current_ip, router_name=None):
         """发送启动通知"""
-        message = f"路由器监控程序已启动\n当前WAN口IP: {current_ip}\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
+        message = f"路由器监控程序已启动\n{self._router_line(router_name)}当前WAN口IP: {current_ip}\n时间: {time.strftime('%Y-%m-%d %H:%M:%S')}"
         return self.send_message(message)
@@ -1,29 +1,79 @@
 # -*- coding:utf8 -*-
 """
 配置管理模块
-负责配置文件的加载、保存和验证
+负责配置文件的加载、保存、验证和热加载，stok等运行时状态单独保存到状态文件，内容没有变化时不写文件
 """
-import json
+import copy
+import hashlib
 import os
 import logging
-from typing import Dict, Any, Optional
-from utils.path_utils import get_absolute_path, ensure_dir_exists
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from utils import json_codec
+from utils.file_utils import atomic_write
+from utils.path_utils import get_absolute_path
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+# 运行时频繁变化的配置项，保存在状态文件中而不是配置文件中
+VOLATILE_KEYS = ('stok', 'encrypt_password', 'last_login_time')
+
+# 配置文件中没有该项（等待重启生效的值）
+_ABSENT = object()
+
+
+def _password_digest(password: str) -> str:
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()[:16]
 
 
 class ConfigManager:
     """配置管理器"""
     
-    def __init__(self, config_file: str = 'config/router_config.json'):
+    def __init__(self, config_file: str = 'config/router_config.json',
+                 state_file: Optional[str] = None):
+        """
+        Args:
+            config_file: 配置文件
+            state_file: 运行时状态文件，默认为配置文件同目录下的 <配置文件名>.state.json
+        """
         self.config_file = get_absolute_path(config_file)
+        if state_file:
+            self.state_file = get_absolute_path(state_file)
+        else:
+            self.state_file = os.path.splitext(self.config_file)[0] + '.state.json'
         self.config = {}
+        # 舰队模式下多个路由器会并发保存同一个配置文件
+        self._lock = threading.Lock()
+        # 最近一次从文件读取或写入文件的内容，用于判断是否需要写入
+        self._saved_config = None
+        self._saved_state = None
+        # 配置文件的 (mtime, size, inode)，用于区分外部修改和自身的写入
+        self._known_signature = None
+        # 需要重启才能生效的配置项（routers）在文件中的新值，保存时写回文件而不是用内存中的旧值
+        self._pending_file_values: Dict[str, Any] = {}
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
         
     def load_config(self) -> Optional[Dict[str, Any]]:
-        """加载配置文件"""
+        """加载配置文件，并合并状态文件中的stok等运行时状态"""
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
-                    return self.config
+                with open(self.config_file, 'rb') as f:
+                    config = json_codec.load(f)
+                state = self._load_state()
+                with self._lock:
+                    # 配置文件中原有的运行时状态（旧版本）在下次保存时移入状态文件
+                    self._saved_config = copy.deepcopy(config)
+                    self._pending_file_values = {}
+                    self._saved_state = copy.deepcopy(state)
+                    self._apply_state(config, state)
+                    self._known_signature = self._file_signature()
+                self.config = config
+                return self.config
             else:
                 logging.warning(f"配置文件不存在: {self.config_file}")
                 return None
@@ -31,21 +81,118 @@ class ConfigManager:
             logging.error(f"加载配置文件失败: {e}")
             return None
 
+    def _load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'rb') as f:
+                return json_codec.load(f)
+        except Exception as e:
+            logging.warning(f"状态文件无效，将重新登录: {e}")
+            return {}
+
+    @staticmethod
+    def _split_entry(entry: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """拆分单个配置（顶层或舰队中的一台路由器）为持久配置和运行时状态"""
+        persistent = {key: value for key, value in entry.items() if key not in VOLATILE_KEYS}
+        state = {key: entry[key] for key in VOLATILE_KEYS if key in entry}
+        if state.get('encrypt_password') and entry.get('password'):
+            # 记录加密密码对应的明文密码摘要，修改密码后不再使用旧的加密密码
+            state['password_digest'] = _password_digest(entry['password'])
+        return persistent, state
+
+    @staticmethod
+    def _router_key(router: Dict[str, Any]) -> Optional[str]:
+        """状态文件中路由器的键：名称，没有名称时为地址（与舰队服务的命名一致）"""
+        return router.get('name') or router.get('host')
+
+    @classmethod
+    def _split(cls, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """拆分为写入配置文件的内容和写入状态文件的内容"""
+        persistent, state = cls._split_entry(config)
+        routers = config.get('routers')
+        if isinstance(routers, list):
+            persistent['routers'] = []
+            router_states = {}
+            for router in routers:
+                router_config, router_state = cls._split_entry(router)
+                persistent['routers'].append(router_config)
+                key = cls._router_key(router)
+                if router_state and key:
+                    router_states[key] = router_state
+            if router_states:
+                state['routers'] = router_states
+        return persistent, state
+
+    @staticmethod
+    def _apply_entry_state(entry: Dict[str, Any], state: Dict[str, Any]):
+        for key in VOLATILE_KEYS:
+            if key in state:
+                entry[key] = state[key]
+        digest = state.get('password_digest')
+        if digest and entry.get('password') and digest != _password_digest(entry['password']):
+            logging.info("配置中的密码已修改，将重新计算加密密码")
+            entry['encrypt_password'] = ''
+            entry['stok'] = ''
+
+    @classmethod
+    def _apply_state(cls, config: Dict[str, Any], state: Dict[str, Any]):
+        """把状态文件中的运行时状态合并到配置中"""
+        cls._apply_entry_state(config, state)
+        router_states = state.get('routers') or {}
+        for router in config.get('routers') or []:
+            router_state = router_states.get(cls._router_key(router))
+            if router_state:
+                cls._apply_entry_state(router, router_state)
+
     def save_config(self, config: Dict[str, Any]) -> bool:
-        """保存配置到文件"""
+        """
+        保存配置：只有内容变化时才写文件
+
+        stok等运行时状态写入状态文件，其余配置写入配置文件，两者都以原子方式替换
+        """
         try:
-            # 确保配置目录存在
-            ensure_dir_exists(self.config_file)
-            
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            with self._lock:
+                persistent, state = self._split(config)
+                config_changed = persistent != self._saved_config
+                state_changed = state != self._saved_state
+                if config_changed:
+                    content = self._with_pending_values(persistent)
+                    atomic_write(self.config_file, json_codec.dumps_bytes(content, pretty=True))
+                    self._known_signature = self._file_signature()
+                    dirty_keys = self._dirty_keys(self._saved_config, persistent)
+                    self._saved_config = copy.deepcopy(persistent)
+                    logging.info(f"配置已保存到文件（变化的配置项: {', '.join(dirty_keys)}）")
+                if state_changed:
+                    atomic_write(self.state_file, json_codec.dumps_bytes(state))
+                    self._saved_state = copy.deepcopy(state)
+                    logging.debug("运行时状态已保存")
             
             self.config = config
-            logging.info("配置已保存到文件")
             return True
         except Exception as e:
             logging.error(f"保存配置文件失败: {e}")
             return False
+
+    def _with_pending_values(self, persistent: Dict[str, Any]) -> Dict[str, Any]:
+        """写入文件的内容：等待重启生效的配置项保留文件中的新值"""
+        if not self._pending_file_values:
+            return persistent
+        content = dict(persistent)
+        for key, value in self._pending_file_values.items():
+            if value is _ABSENT:
+                content.pop(key, None)
+            else:
+                content[key] = value
+        return content
+
+    @staticmethod
+    def _dirty_keys(old: Optional[Dict[str, Any]], new: Dict[str, Any]):
+        """与上次保存的内容相比发生变化的顶层配置项"""
+        old = old or {}
+        keys = [key for key in new if old.get(key) != new[key]]
+        keys.extend(key for key in old if key not in new)
+        return keys
     
     def get_config(self) -> Dict[str, Any]:
         """获取当前配置"""
@@ -59,11 +206,197 @@ class ConfigManager:
         """设置配置项"""
         self.config[key] = value
     
-    def validate_config(self) -> bool:
-        """验证配置完整性"""
+    def validate_config(self, config: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        验证配置完整性
+
+        Args:
+            config: 待验证的配置，默认验证当前配置
+        """
+        config = self.config if config is None else config
+        if not isinstance(config, dict):
+            logging.error("配置文件内容必须是JSON对象")
+            return False
+
+        routers = config.get('routers')
+        if routers is not None:
+            if not isinstance(routers, list) or not all(isinstance(r, dict) for r in routers):
+                logging.error("routers 必须是路由器配置对象的列表")
+                return False
+            entries = [dict(config, **router) for router in routers]
+        else:
+            entries = [config]
+
         required_keys = ['host', 'password']
-        for key in required_keys:
-            if key not in self.config:
-                logging.error(f"缺少必需的配置项: {key}")
+        for entry in entries:
+            for key in required_keys:
+                if key not in entry:
+                    logging.error(f"缺少必需的配置项: {key}")
+                    return False
+            domains = entry.get('domains', [])
+            if not isinstance(domains, list) or not all(isinstance(d, str) for d in domains):
+                logging.error("domains 必须是域名字符串列表")
                 return False
         return True
+
+    # ---- 热加载 ----
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    @staticmethod
+    def _update_entry(target, new: Dict[str, Any], skip=()) -> List[str]:
+        """把new中的配置原地更新到target中（保留运行时状态），返回变化的配置项"""
+        changed = []
+        for key, value in new.items():
+            if key in skip:
+                continue
+            if key not in target or target[key] != value:
+                target[key] = copy.deepcopy(value)
+                changed.append(key)
+        for key in list(target):
+            if key not in new and key not in VOLATILE_KEYS and key not in skip:
+                del target[key]
+                changed.append(key)
+        if 'password' in changed and target.get('encrypt_password'):
+            # 密码修改后需要重新计算加密密码，当前stok仍然可以继续使用
+            target['encrypt_password'] = ''
+        return changed
+
+    def reload_config(self) -> Optional[Dict[str, Any]]:
+        """
+        重新读取配置文件，验证通过后原地更新到当前配置中
+
+        当前配置对象被各个服务共享，原地更新后服务读取到的就是新值；stok等运行时状态保持不变
+
+        Returns:
+            dict: {'keys': 变化的顶层配置项, 'routers': {路由器名称: 变化的配置项},
+                   'routers_changed': 路由器列表是否增删}，读取或验证失败返回None
+        """
+        try:
+            with open(self.config_file, 'rb') as f:
+                raw = json_codec.load(f)
+        except Exception as e:
+            logging.error(f"重新加载配置文件失败，继续使用当前配置: {e}")
+            return None
+        if not self.validate_config(raw):
+            logging.error("新的配置文件未通过验证，继续使用当前配置")
+            return None
+
+        new_config, _ = self._split(raw)
+        with self._lock:
+            current = self.config
+            changes = {
+                'keys': set(self._update_entry(current, new_config, skip=('routers',))),
+                'routers': {},
+                'routers_changed': False
+            }
+            old_routers = current.get('routers')
+            new_routers = new_config.get('routers')
+            if isinstance(old_routers, list) and isinstance(new_routers, list):
+                # 与舰队服务一致：未填写名称时以host作为路由器名称
+                old_names = [self._router_key(router) for router in old_routers]
+                new_names = [self._router_key(router) for router in new_routers]
+                changes['routers_changed'] = old_names != new_names
+                new_by_name = dict(zip(new_names, new_routers))
+                for name, router in zip(old_names, old_routers):
+                    new_router = new_by_name.get(name)
+                    if new_router is not None:
+                        router_changes = self._update_entry(router, new_router)
+                        if router_changes:
+                            changes['routers'][name] = set(router_changes)
+            elif old_routers is not None or new_routers is not None:
+                changes['routers_changed'] = True
+
+            # 路由器列表的增删、排序以及单路由器/舰队模式的切换需要重启才能生效，
+            # 重启前内存中仍是原来的列表：按内存中的值记录已保存的内容，
+            # 避免下次保存stok时用旧列表覆盖文件中的修改
+            saved = copy.deepcopy(raw)
+            self._pending_file_values = {}
+            if changes['routers_changed']:
+                if old_routers is None:
+                    saved.pop('routers', None)
+                else:
+                    saved['routers'] = self._split(current)[0]['routers']
+                self._pending_file_values['routers'] = (
+                    copy.deepcopy(new_routers) if 'routers' in new_config else _ABSENT)
+            self._saved_config = saved
+
+        if changes['keys'] or changes['routers'] or changes['routers_changed']:
+            logging.info(f"配置文件已重新加载，变化的配置项: "
+                         f"{', '.join(sorted(changes['keys'])) or '无'}"
+                         f"{'，路由器配置有变化' if changes['routers'] else ''}")
+        return changes
+
+    def watch(self, callback: Callable[[Dict[str, Any]], None], interval: float = 2.0):
+        """
+        在后台监视配置文件，被外部修改时重新加载并调用 callback(changes)
+
+        安装了inotify_simple（Linux）时使用inotify，否则定期检查文件的修改时间
+
+        Args:
+            callback: 配置有变化时的回调，参数为 reload_config 的返回值
+            interval: 轮询间隔（秒），使用inotify时为检查停止信号的间隔
+        """
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(callback, interval),
+                                              name='config-watch', daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        """停止监视配置文件"""
+        self._watch_stop.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=5)
+
+    def _create_inotify(self):
+        if INotify is None:
+            return None
+        try:
+            inotify = INotify()
+            # 监视所在目录：原子替换会生成新的文件
+            inotify.add_watch(os.path.dirname(self.config_file),
+                              inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO |
+                              inotify_flags.CREATE)
+            return inotify
+        except OSError as e:
+            logging.warning(f"inotify不可用，改为定期检查配置文件: {e}")
+            return None
+
+    def _watch_loop(self, callback, interval: float):
+        inotify = self._create_inotify()
+        filename = os.path.basename(self.config_file)
+        logging.info(f"正在监视配置文件（{'inotify' if inotify else '定期检查'}）")
+        try:
+            while not self._watch_stop.is_set():
+                if inotify:
+                    events = inotify.read(timeout=int(interval * 1000))
+                    if not any(event.name == filename for event in events):
+                        continue
+                    # 等待编辑器写完
+                    time.sleep(0.2)
+                elif self._watch_stop.wait(interval):
+                    break
+                self._check_for_changes(callback)
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _check_for_changes(self, callback):
+        signature = self._file_signature()
+        with self._lock:
+            if signature is None or signature == self._known_signature:
+                return
+            self._known_signature = signature
+        changes = self.reload_config()
+        if changes and (changes['keys'] or changes['routers'] or changes['routers_changed']):
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.error(f"应用新配置失败: {e}")
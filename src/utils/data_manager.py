@@ -1,69 +1,375 @@
 # -*- coding:utf8 -*-
 """
 数据管理模块
-负责WAN口数据的存储和管理
+负责WAN口数据的存储和管理，最近的记录缓存在内存中，写入由后台线程批量完成
 """
-import json
 import os
 import logging
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, List
-from utils.path_utils import get_absolute_path, ensure_dir_exists
+from typing import Dict, Any, Iterator, List, Optional
+from utils import json_codec
+from utils.history_store import JsonlHistoryStore
+from utils.ring_store import MmapRingStore
+from utils.segment_store import SegmentedHistoryStore
+from utils.sqlite_store import SqliteHistoryStore
+from utils.path_utils import get_absolute_path
+
+
+class HistoryFlusher:
+    """
+    后台写入线程，写入间隔相同的数据管理器共用一个线程（舰队模式下不再每台路由器一个线程）
+
+    最后一个数据管理器注销时线程退出，之后再注册时重新启动
+    """
+
+    _shared: Dict[float, 'HistoryFlusher'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: 写入间隔（秒）
+        """
+        self.interval = interval
+        self._managers: List['DataManager'] = []
+        # 注册、注销与一轮写入互斥，注销返回后不会再写入该数据管理器
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = None
+        self._thread = None
+
+    @classmethod
+    def shared(cls, interval: float) -> 'HistoryFlusher':
+        """按写入间隔共用的后台写入线程"""
+        with cls._shared_lock:
+            flusher = cls._shared.get(interval)
+            if flusher is None:
+                flusher = cls._shared[interval] = cls(interval)
+            return flusher
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def register(self, manager: 'DataManager'):
+        with self._lock:
+            self._managers.append(manager)
+            if self._thread is None:
+                self._stop_event = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                                name='history-flush', daemon=True)
+                self._thread.start()
+
+    def unregister(self, manager: 'DataManager'):
+        """注销数据管理器，没有其他数据管理器时停止线程"""
+        thread = None
+        with self._lock:
+            if manager in self._managers:
+                self._managers.remove(manager)
+            if not self._managers and self._thread is not None:
+                thread, self._thread = self._thread, None
+                self._stop_event.set()
+        if thread is not None:
+            self._wake_event.set()
+            thread.join(timeout=10)
+
+    def wake(self):
+        """不等间隔到期，立即写入"""
+        self._wake_event.set()
+
+    def _run(self, stop_event: threading.Event):
+        """后台定期写入，待写入的记录较多时提前写入"""
+        while True:
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if stop_event.is_set():
+                return
+            with self._lock:
+                for manager in self._managers:
+                    try:
+                        manager.flush()
+                    except Exception as e:
+                        logging.error(f"后台写入WAN口数据失败: {e}")
 
 
 class DataManager:
     """数据管理器"""
-    
-    def __init__(self, data_file: str = 'data/wan_status_data.json'):
+
+    def __init__(self, data_file: str = 'data/wan_status_data.jsonl',
+                 max_records: int = 43200, backend: str = 'jsonl',
+                 router: str = 'default', keyframe_interval: int = 60,
+                 segment_options: Optional[Dict[str, Any]] = None,
+                 cache_size: int = 100, flush_interval: float = 5.0,
+                 flush_size: int = 100, read_only: bool = False):
+        """
+        Args:
+            data_file: 历史数据文件（jsonl后端为JSON Lines文件，sqlite后端为数据库文件，
+                ring后端为固定大小的环形文件，segments后端为分段文件目录）
+            max_records: 保留的记录数，默认约30天的每分钟数据（segments后端按保留策略清理，不使用该值）
+            backend: 存储后端，jsonl、sqlite、ring（只保存IP、协议、状态、延迟等关键字段）或 segments
+            router: 路由器名称，sqlite后端中多个路由器共用一个数据库时用于区分
+            keyframe_interval: jsonl后端每隔多少条写一次完整数据，其余只写变化的字段
+            segment_options: segments后端的分段周期和保留策略，见 SegmentedHistoryStore
+            cache_size: 内存中缓存的最新记录数，读取不超过该数量的记录时不访问磁盘
+            flush_interval: 后台写入的间隔（秒），0表示每次保存时同步写入
+            flush_size: 待写入的记录达到该数量时不等间隔到期，立即唤醒后台线程写入
+            read_only: 只读打开（供分析工具读取正在写入的历史），不创建、迁移或修改任何文件，
+                历史数据不存在时抛出 FileNotFoundError
+        """
         self.data_file = get_absolute_path(data_file)
-        
-    def save_wan_data(self, data: Dict[str, Any]) -> bool:
-        """保存WAN口数据到文件"""
-        try:
-            # 确保数据目录存在
-            ensure_dir_exists(self.data_file)
-            
-            # 读取现有数据
-            wan_history = []
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    wan_history = json.load(f)
-
-            # 添加时间戳
-            current_data = {
-                'timestamp': datetime.now().isoformat(),
-                'data': data
-            }
-            wan_history.append(current_data)
+        self.backend = backend
+        self.read_only = read_only
+        if read_only and not os.path.exists(self.data_file):
+            raise FileNotFoundError(f"历史数据不存在: {self.data_file}")
+        # ring后端只保存关键字段，采样不需要保留原始响应
+        self.keeps_payload = backend != 'ring'
+        if backend == 'sqlite':
+            self.store = SqliteHistoryStore(self.data_file, router, max_records,
+                                            read_only=read_only)
+        elif backend == 'segments':
+            self.store = SegmentedHistoryStore(self.data_file,
+                                               keyframe_interval=keyframe_interval,
+                                               read_only=read_only,
+                                               **(segment_options or {}))
+        elif backend == 'ring':
+            self.store = MmapRingStore(self.data_file, max_records, read_only=read_only)
+        elif backend == 'jsonl':
+            self.store = JsonlHistoryStore(self.data_file, max_records,
+                                           keyframe_interval=keyframe_interval)
+            if not read_only:
+                self._migrate_legacy_file()
+        else:
+            raise ValueError(f"不支持的历史存储后端: {backend}")
 
-            # 保留最近10条记录
-            if len(wan_history) > 10:
-                wan_history = wan_history[-10:]
+        self.flush_interval = flush_interval
+        self.flush_size = max(flush_size, 1)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        recent = self.store.tail(cache_size) if cache_size else []
+        self._cache = deque(recent, maxlen=cache_size)
+        # 缓存中是否包含全部历史
+        self._cache_complete = len(recent) < cache_size
 
-            # 保存到文件
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(wan_history, f, indent=4, ensure_ascii=False)
+        self._flusher = None
+        if flush_interval > 0 and not read_only:
+            self._flusher = HistoryFlusher.shared(flush_interval)
+            self._flusher.register(self)
 
-            logging.info(f"WAN口数据已保存，总记录数: {len(wan_history)}")
-            return True
+    @classmethod
+    def from_config(cls, config, name: Optional[str] = None, **overrides) -> 'DataManager':
+        """
+        按配置创建数据管理器，sqlite后端下所有路由器共用一个数据库
+
+        Args:
+            config: 配置（history_backend、data_dir、history_* 等）
+            name: 舰队模式下的路由器名称，用于区分数据文件
+            overrides: 覆盖按配置得到的构造参数
+        """
+        data_dir = config.get('data_dir', 'data')
+
+        def data_file(filename):
+            if name:
+                stem, ext = os.path.splitext(filename)
+                filename = f'{stem}_{name}{ext}'
+            return os.path.join(data_dir, filename)
+
+        backend = config.get('history_backend', 'jsonl')
+        options = {
+            'max_records': config.get('history_max_records', 43200),
+            'backend': backend,
+            'keyframe_interval': config.get('history_keyframe_interval', 60),
+            'cache_size': config.get('history_cache_size', 100),
+            'flush_interval': config.get('history_flush_interval', 5),
+            'flush_size': config.get('history_flush_size', 100)
+        }
+        if backend == 'sqlite':
+            path = os.path.join(data_dir, 'history.db')
+            options['router'] = name or 'default'
+        elif backend == 'segments':
+            path = data_file('wan_history')
+            max_total_mb = config.get('history_max_total_mb')
+            options['segment_options'] = {
+                'segment_period': config.get('history_segment_period', 'day'),
+                'max_age_days': config.get('history_max_age_days', 365),
+                'max_total_bytes': max_total_mb * 1024 * 1024 if max_total_mb else None,
+                'max_segments': config.get('history_max_segments')
+            }
+        elif backend == 'ring':
+            path = data_file('wan_status_data.ring')
+        else:
+            path = data_file('wan_status_data.jsonl')
+        options.update(overrides)
+        return cls(path, **options)
+
+    def _migrate_legacy_file(self):
+        """将旧版的JSON数组历史文件导入为JSON Lines格式（仅执行一次）"""
+        legacy_file = os.path.splitext(self.data_file)[0] + '.json'
+        if legacy_file == self.data_file or not os.path.exists(legacy_file):
+            return
+        if self.store.record_count:
+            return
+        try:
+            with open(legacy_file, 'rb') as f:
+                records = json_codec.load(f)
+            for record in records:
+                self.store.append(record)
+            os.replace(legacy_file, legacy_file + '.migrated')
+            logging.info(f"已导入旧版WAN口历史数据 {len(records)} 条")
         except Exception as e:
-            logging.error(f"保存WAN口数据失败: {e}")
+            logging.error(f"导入旧版WAN口历史数据失败: {e}")
+
+    def save_wan_data(self, data: Dict[str, Any], latency_ms: Optional[float] = None) -> bool:
+        """
+        保存WAN口数据（先写入内存缓存，由后台线程追加到文件）
+
+        Args:
+            data: WAN口数据
+            latency_ms: 本次轮询的耗时（毫秒）
+        """
+        current_data = {
+            'timestamp': datetime.now().isoformat(),
+            'data': data
+        }
+        if latency_ms is not None:
+            current_data['latency_ms'] = round(latency_ms, 2)
+        return self._enqueue(current_data)
+
+    def save_wan_sample(self, sample) -> bool:
+        """
+        保存已解析的WAN口采样（core.models.WanSample）
+
+        缓存和写入队列中直接保存采样对象，读取或写入存储时才转为历史记录格式
+        """
+        return self._enqueue(sample)
+
+    def _enqueue(self, item) -> bool:
+        if self.read_only:
+            logging.error("历史数据以只读方式打开，不能保存")
             return False
-    
-    def load_wan_history(self) -> List[Dict[str, Any]]:
-        """加载WAN口历史数据"""
+        with self._lock:
+            if len(self._cache) == self._cache.maxlen:
+                self._cache_complete = False
+            self._cache.append(item)
+            self._pending.append(item)
+            pending = len(self._pending)
+        if self._flusher is None:
+            return self.flush()
+        if pending >= self.flush_size:
+            self._flusher.wake()
+        return True
+
+    @staticmethod
+    def _as_record(item) -> Dict[str, Any]:
+        """缓存中的采样对象转为历史记录格式"""
+        return item if isinstance(item, dict) else item.to_record()
+
+    def flush(self) -> bool:
+        """把待写入的记录追加到存储"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            for position, record in enumerate(batch):
+                try:
+                    count = self.store.append(self._as_record(record))
+                except Exception as e:
+                    logging.error(f"保存WAN口数据失败: {e}")
+                    # 未写入的记录放回队列，下次再试
+                    with self._lock:
+                        self._pending = batch[position:] + self._pending
+                    return False
+            logging.info(f"WAN口数据已保存 {len(batch)} 条，总记录数: {count}")
+            return True
+
+    def load_wan_history(self, limit: Optional[int] = 10) -> List[Dict[str, Any]]:
+        """
+        加载WAN口历史数据，缓存足够时直接从内存返回
+
+        Args:
+            limit: 最新记录数，None表示全部
+        """
+        with self._lock:
+            cached = self._cache_complete or (limit is not None and limit <= len(self._cache))
+            if cached:
+                records = list(self._cache)
+        if cached:
+            if limit is not None:
+                records = records[len(records) - limit:] if limit else []
+            return [self._as_record(record) for record in records]
+
+        self.flush()
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return []
+            if limit is None:
+                return list(self.store)
+            return self.store.tail(limit)
         except Exception as e:
             logging.error(f"加载WAN口历史数据失败: {e}")
             return []
-    
+
+    def iter_wan_history(self, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间顺序流式读取WAN口历史数据
+
+        Args:
+            start: 开始时间（含），None表示不限
+            end: 结束时间（不含），None表示不限
+        """
+        self.flush()
+        if isinstance(self.store, SqliteHistoryStore):
+            # 由数据库按索引筛选时间范围
+            return self.store.samples_between(start, end)
+        if start is None and end is None:
+            return iter(self.store)
+        return self._filter_range(iter(self.store), start, end)
+
+    @staticmethod
+    def _filter_range(records, start, end) -> Iterator[Dict[str, Any]]:
+        for record in records:
+            timestamp = datetime.fromisoformat(record['timestamp'])
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                break
+            yield record
+
+    def iter_login_events(self, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> Optional[List[Dict[str, Any]]]:
+        """按时间范围读取登录事件，存储后端不保存登录事件时返回None"""
+        if isinstance(self.store, SqliteHistoryStore):
+            return self.store.logins_between(start, end)
+        return None
+
     def get_latest_wan_data(self) -> Dict[str, Any]:
         """获取最新的WAN口数据"""
-        history = self.load_wan_history()
+        with self._lock:
+            if self._cache:
+                return self._as_record(self._cache[-1])
+            if self._cache_complete:
+                return {}
+        history = self.load_wan_history(1)
         if history:
             return history[-1]
         return {}
+
+    def record_ip_change(self, old_ip: str, new_ip: str, timestamp=None):
+        """记录IP变化事件（仅sqlite后端保存，jsonl后端可从采样中推算）"""
+        if isinstance(self.store, SqliteHistoryStore):
+            self.store.record_ip_change(old_ip, new_ip, timestamp)
+
+    def record_login(self, success: bool, reason: str = ''):
+        """记录登录事件（仅sqlite后端保存）"""
+        if isinstance(self.store, SqliteHistoryStore):
+            self.store.record_login(success, reason)
+
+    def close(self):
+        """停止后台写入，写完剩余记录后关闭存储"""
+        if self._flusher:
+            self._flusher.unregister(self)
+        self.flush()
+        self.store.close()
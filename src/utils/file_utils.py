@@ -0,0 +1,52 @@
+# -*- coding:utf8 -*-
+"""
+文件工具模块
+提供原子写入等文件操作，避免写入过程中断导致文件内容不完整
+"""
+import os
+import tempfile
+
+from utils.path_utils import ensure_dir_exists
+
+
+def _read_umask() -> int:
+    # 只能通过设置来读取umask，启动时读取一次，避免多线程写文件时临时改变umask
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def atomic_write(file_path: str, data: bytes) -> None:
+    """
+    原子写入文件：先写同目录下的临时文件并同步到磁盘，再替换目标文件
+
+    读者只会看到旧内容或新内容，不会看到写了一半的文件
+
+    Args:
+        file_path: 目标文件的绝对路径
+        data: 文件内容
+    """
+    ensure_dir_exists(file_path)
+    directory = os.path.dirname(file_path)
+    fd, temp_file = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path),
+                                     suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(file_path):
+            # 保留原文件的权限（配置文件中有密码，通常不希望变成默认权限）
+            os.chmod(temp_file, os.stat(file_path).st_mode & 0o7777)
+        else:
+            # mkstemp创建的文件为0600，新文件按umask使用普通文件的默认权限，
+            # 以其他用户运行的dnsmasq、named等才能读取
+            os.chmod(temp_file, 0o666 & ~_UMASK)
+        os.replace(temp_file, file_path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
@@ -0,0 +1,264 @@
+# -*- coding:utf8 -*-
+"""
+历史数据分析模块
+单次遍历历史记录，用滚动计数和P²近似分位数统计IP租期、变化频率、可用率、登录频率和轮询延迟
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from utils.net_utils import NO_ADDRESS, wan_is_up
+
+# 相邻两条采样间隔超过该秒数时视为监控程序未运行，不计入在线或离线时长
+DEFAULT_GAP_THRESHOLD = 300
+
+
+class P2Quantile:
+    """
+    P²算法的流式分位数估计（Jain & Chlamtac, 1985）
+
+    只保存5个标记点，内存占用与数据量无关
+    """
+
+    def __init__(self, p: float):
+        """
+        Args:
+            p: 分位数，如0.5、0.99
+        """
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x: float):
+        """加入一个观测值"""
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._initial.sort()
+                self._heights = self._initial
+                self._positions = [0, 1, 2, 3, 4]
+                p = self.p
+                self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+
+        q = self._heights
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # 调整中间三个标记点的位置和高度
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q = self._heights
+        n = self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self) -> Optional[float]:
+        """当前的分位数估计，没有数据时返回None"""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        values = sorted(self._initial)
+        return values[round(self.p * (len(values) - 1))]
+
+
+class RunningStats:
+    """滚动的计数、均值、最小值和最大值"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, x: float):
+        self.count += 1
+        self.total += x
+        if self.minimum is None or x < self.minimum:
+            self.minimum = x
+        if self.maximum is None or x > self.maximum:
+            self.maximum = x
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.minimum,
+            'max': self.maximum
+        }
+
+
+def _sample_status(record: Dict[str, Any]):
+    """从历史记录中取出 (IP, 是否在线)"""
+    data = record.get('data') or {}
+    wan_status = (data.get('network') or {}).get('wan_status') or {}
+    ip = wan_status.get('ipaddr') or None
+    if ip in NO_ADDRESS:
+        ip = None
+    return ip, wan_is_up(wan_status)
+
+
+class HistoryAnalyzer:
+    """历史数据的单次遍历统计"""
+
+    def __init__(self, gap_threshold: float = DEFAULT_GAP_THRESHOLD):
+        """
+        Args:
+            gap_threshold: 采样间隔超过该秒数时视为数据缺失
+        """
+        self.gap_threshold = gap_threshold
+
+        self.samples = 0
+        self.up_samples = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.up_seconds = 0.0
+        self.down_seconds = 0.0
+        self.gap_seconds = 0.0
+        self.outages = 0
+        self.longest_outage = 0.0
+        self._prev_ts = None
+        self._prev_up = None
+        self._outage_start = None
+
+        self.ip_changes = 0
+        self.current_ip = None
+        self._lease_start = None
+        # 历史开始时的租期起点未知，不参与租期统计
+        self._lease_start_observed = False
+        self.leases = RunningStats()
+        self.lease_median = P2Quantile(0.5)
+
+        self.latency = RunningStats()
+        self.latency_quantiles = {p: P2Quantile(p) for p in (0.5, 0.9, 0.99)}
+
+        self.logins = 0
+        self.login_failures = 0
+
+    def add_record(self, record: Dict[str, Any]):
+        """加入一条WAN口历史记录（需按时间顺序）"""
+        ts = datetime.fromisoformat(record['timestamp']).timestamp()
+        ip, up = _sample_status(record)
+
+        self.samples += 1
+        if up:
+            self.up_samples += 1
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+
+        if self._prev_ts is not None:
+            elapsed = ts - self._prev_ts
+            if elapsed > self.gap_threshold:
+                self.gap_seconds += elapsed
+            elif self._prev_up:
+                self.up_seconds += elapsed
+            else:
+                self.down_seconds += elapsed
+        if not up and self._prev_up is not False:
+            self.outages += 1
+            self._outage_start = ts
+        elif up and self._prev_up is False and self._outage_start is not None:
+            self.longest_outage = max(self.longest_outage, ts - self._outage_start)
+            self._outage_start = None
+        self._prev_ts = ts
+        self._prev_up = up
+
+        if ip is not None and ip != self.current_ip:
+            if self.current_ip is not None:
+                self.ip_changes += 1
+                if self._lease_start_observed:
+                    duration = ts - self._lease_start
+                    self.leases.add(duration)
+                    self.lease_median.add(duration)
+                self._lease_start_observed = True
+            self.current_ip = ip
+            self._lease_start = ts
+
+        latency = record.get('latency_ms')
+        if latency is not None:
+            self.latency.add(latency)
+            for quantile in self.latency_quantiles.values():
+                quantile.add(latency)
+
+    def add_login(self, success: bool):
+        """加入一次登录事件"""
+        self.logins += 1
+        if not success:
+            self.login_failures += 1
+
+    def report(self, include_logins: bool = True) -> Dict[str, Any]:
+        """
+        生成统计结果
+
+        Args:
+            include_logins: 存储中是否有登录事件，没有时登录频率为None
+        """
+        span = (self.last_ts - self.first_ts) if self.samples else 0.0
+        span_days = span / 86400 if span else None
+        observed = self.up_seconds + self.down_seconds
+        longest_outage = self.longest_outage
+        if self._outage_start is not None:
+            # 历史结束时仍处于离线状态
+            longest_outage = max(longest_outage, self.last_ts - self._outage_start)
+
+        leases = self.leases.to_dict()
+        leases['median'] = self.lease_median.value()
+        latency = self.latency.to_dict()
+        for p, quantile in self.latency_quantiles.items():
+            latency[f'p{round(p * 100)}'] = quantile.value()
+
+        return {
+            'start': datetime.fromtimestamp(self.first_ts).isoformat() if self.samples else None,
+            'end': datetime.fromtimestamp(self.last_ts).isoformat() if self.samples else None,
+            'samples': self.samples,
+            'availability': {
+                'percent': self.up_seconds / observed * 100 if observed else None,
+                'sample_percent': self.up_samples / self.samples * 100 if self.samples else None,
+                'up_seconds': self.up_seconds,
+                'down_seconds': self.down_seconds,
+                'gap_seconds': self.gap_seconds,
+                'outages': self.outages,
+                'longest_outage_seconds': longest_outage
+            },
+            'ip': {
+                'current': self.current_ip,
+                'current_lease_seconds': (self.last_ts - self._lease_start)
+                if self._lease_start is not None else None,
+                'changes': self.ip_changes,
+                'changes_per_day': self.ip_changes / span_days if span_days else None,
+                'leases_seconds': leases
+            },
+            'logins': {
+                'count': self.logins,
+                'failures': self.login_failures,
+                'per_day': self.logins / span_days if span_days else None
+            } if include_logins else None,
+            'latency_ms': latency
+        }
@@ -0,0 +1,295 @@
+# -*- coding:utf8 -*-
+"""
+历史数据存储模块
+以追加写的JSON Lines文件保存WAN口历史，从文件尾部读取最新记录，后台压缩超出保留数量的旧记录
+相邻记录的数据通常几乎相同，每隔若干条写一次完整关键帧，其余只写与上一条相比变化的字段
+"""
+import os
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import json_codec
+from utils.path_utils import ensure_dir_exists
+
+
+def diff_payload(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    计算两份数据之间的差异
+
+    Returns:
+        dict: {'set': 与数据同结构的变化字段, 'del': [被删除字段的路径, ...]}，没有差异的部分省略
+    """
+    dels = []
+    changes = _diff(old, new, [], dels)
+    delta = {}
+    if changes:
+        delta['set'] = changes
+    if dels:
+        delta['del'] = dels
+    return delta
+
+
+def _diff(old, new, path, dels) -> Dict[str, Any]:
+    changes = {}
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+            continue
+        old_value = old[key]
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            nested = _diff(old_value, value, path + [key], dels)
+            if nested:
+                changes[key] = nested
+        elif type(value) is not type(old_value) or value != old_value:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            dels.append(path + [key])
+    return changes
+
+
+def apply_delta(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """在base上应用差异，返回新的数据（只复制被修改的部分，不改动base）"""
+    result = _merge(base, delta.get('set') or {})
+    for path in delta.get('del', ()):
+        node = result
+        for key in path[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                break
+            # 复制路径上的字典，避免改动base
+            child = dict(child)
+            node[key] = child
+            node = child
+        else:
+            node.pop(path[-1], None)
+    return result
+
+
+def _merge(base: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(base)
+    for key, value in changes.items():
+        old_value = result.get(key)
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            result[key] = _merge(old_value, value)
+        else:
+            result[key] = value
+    return result
+
+
+class JsonlHistoryStore:
+    """追加写的JSON Lines历史存储"""
+
+    # 尾部读取的块大小
+    _BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, data_file: str, max_records: Optional[int] = 43200,
+                 compact_slack: float = 0.1, keyframe_interval: int = 60):
+        """
+        Args:
+            data_file: 历史文件的绝对路径
+            max_records: 保留的记录数，None表示不限制（不压缩）
+            compact_slack: 超出保留数量该比例后触发后台压缩，避免每次追加都重写文件
+            keyframe_interval: 每隔多少条记录写一次完整数据，0表示每条都写完整数据
+        """
+        self.data_file = data_file
+        self.max_records = max_records
+        self.keyframe_interval = keyframe_interval
+        self.compact_threshold = None if max_records is None else \
+            max_records + max(int(max_records * compact_slack), 1)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._compacting = False
+        # 上一条记录的完整数据，重新打开文件后的第一条记录总是关键帧
+        self._last_data = None
+        self._since_keyframe = 0
+        self.record_count = self._count_records()
+
+    def _count_records(self) -> int:
+        """启动时统计一次现有记录数"""
+        if not os.path.exists(self.data_file):
+            return 0
+        count = 0
+        with open(self.data_file, 'rb') as f:
+            for block in iter(lambda: f.read(self._BLOCK_SIZE), b''):
+                count += block.count(b'\n')
+        return count
+
+    def _open(self):
+        if self._file is None:
+            ensure_dir_exists(self.data_file)
+            self._file = open(self.data_file, 'ab')
+        return self._file
+
+    def _encode(self, record: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """
+        关键帧原样保存，其余记录把data替换为与上一条的差异delta
+
+        Returns:
+            tuple: (要写入的记录, 写入后距上一个关键帧的记录数)
+        """
+        data = record.get('data')
+        last_data = self._last_data
+        if not isinstance(data, dict) or not isinstance(last_data, dict) or \
+                self._since_keyframe + 1 >= self.keyframe_interval:
+            return record, 0
+        encoded = {key: value for key, value in record.items() if key != 'data'}
+        encoded['delta'] = diff_payload(last_data, data)
+        return encoded, self._since_keyframe + 1
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        追加一条记录
+
+        Returns:
+            int: 当前记录数
+        """
+        with self._lock:
+            encoded, since_keyframe = self._encode(record)
+            line = json_codec.dumps_bytes(encoded) + b'\n'
+            f = self._open()
+            f.write(line)
+            f.flush()
+            # 写入成功后才更新差异的基准，写入失败重试时不会以未写入的数据为基准
+            self._last_data = record.get('data')
+            self._since_keyframe = since_keyframe
+            self.record_count += 1
+            count = self.record_count
+            need_compact = self.compact_threshold is not None and \
+                count > self.compact_threshold and not self._compacting
+            if need_compact:
+                self._compacting = True
+
+        if need_compact:
+            threading.Thread(target=self._compact, name='history-compact',
+                             daemon=True).start()
+        return count
+
+    def _read_tail_lines(self, limit: int, end: Optional[int] = None) -> List[bytes]:
+        """从文件尾部向前读取最多limit行"""
+        if not os.path.exists(self.data_file):
+            return []
+        with open(self.data_file, 'rb') as f:
+            if end is None:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+            position = end
+            data = b''
+            # 多读一行，保证最前面的一行是完整的
+            while position > 0 and data.count(b'\n') <= limit:
+                size = min(self._BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                data = f.read(size) + data
+        lines = [line for line in data.split(b'\n') if line]
+        if position > 0:
+            lines = lines[1:]
+        return lines[-limit:] if limit else []
+
+    @staticmethod
+    def _parse(lines) -> Iterator[Dict[str, Any]]:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json_codec.loads(line)
+            except ValueError:
+                logging.warning("跳过损坏的历史记录行")
+
+    @staticmethod
+    def _rebuild(raw_records) -> Iterator[Dict[str, Any]]:
+        """逐条把差异记录还原为完整记录"""
+        data = None
+        for raw in raw_records:
+            if 'delta' not in raw:
+                data = raw.get('data')
+                yield raw
+                continue
+            if data is None:
+                # 文件开头缺少关键帧，无法还原
+                continue
+            data = apply_delta(data, raw['delta'])
+            record = {key: value for key, value in raw.items() if key != 'delta'}
+            record['data'] = data
+            yield record
+
+    def _read_tail_records(self, limit: int, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """从文件尾部读取并还原最新的limit条记录，向前多读到最近的关键帧为止"""
+        if not limit:
+            return []
+        want = limit + max(self.keyframe_interval, 1)
+        while True:
+            lines = self._read_tail_lines(want, end)
+            raw_records = list(self._parse(lines))
+            # 最早需要返回的记录及其之前必须有关键帧
+            head = raw_records[:max(len(raw_records) - limit, 0) + 1]
+            has_keyframe = any('delta' not in raw for raw in head)
+            if has_keyframe or len(lines) < want:
+                break
+            want *= 2
+        return list(self._rebuild(raw_records))[-limit:]
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """读取最新的limit条记录（按时间顺序）"""
+        return self._read_tail_records(limit)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按时间顺序流式读取全部记录，差异记录在读取到时才还原"""
+        if not os.path.exists(self.data_file):
+            return
+        with open(self.data_file, 'rb') as f:
+            yield from self._rebuild(self._parse(f))
+
+    def _compact(self):
+        """后台压缩：只保留最新的max_records条记录"""
+        temp_file = self.data_file + '.compact'
+        try:
+            with self._lock:
+                if self._file:
+                    self._file.flush()
+                snapshot_size = os.path.getsize(self.data_file)
+
+            # 读取和写入临时文件时不持有锁，追加可以继续进行
+            lines = self._read_tail_lines(self.max_records, snapshot_size)
+            with open(temp_file, 'wb') as f:
+                if lines and 'delta' in json_codec.loads(lines[0]):
+                    # 保留部分的第一条必须是关键帧，后面的差异记录仍然以它为基础
+                    records = self._read_tail_records(len(lines), snapshot_size)
+                    lines = lines[len(lines) - len(records):]
+                    if lines:
+                        lines[0] = json_codec.dumps_bytes(records[0])
+                for line in lines:
+                    f.write(line + b'\n')
+
+                with self._lock:
+                    # 补上压缩期间新追加的记录后替换原文件
+                    if self._file:
+                        self._file.flush()
+                    with open(self.data_file, 'rb') as source:
+                        source.seek(snapshot_size)
+                        tail = source.read()
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    os.replace(temp_file, self.data_file)
+                    if self._file:
+                        self._file.close()
+                        self._file = None
+                    self.record_count = len(lines) + tail.count(b'\n')
+            logging.info(f"历史数据已压缩，保留 {self.record_count} 条记录")
+        except Exception as e:
+            logging.error(f"压缩历史数据失败: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        """关闭文件句柄"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,60 @@
+# -*- coding:utf8 -*-
+"""
+JSON编解码模块
+统一的JSON编解码入口，安装了orjson时自动使用，否则回退到标准库
+"""
+import json
+from typing import Any, BinaryIO, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 当前使用的后端名称
+BACKEND = 'orjson' if orjson else 'json'
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    解析JSON，可直接传入响应体或文件的原始字节，无需先解码为字符串
+    """
+    if orjson:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        # 标准库不接受memoryview
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """
+    序列化为UTF-8字节（非ASCII字符不转义）
+
+    Args:
+        obj: 待序列化对象
+        pretty: 是否缩进输出，用于需要人工查看的文件
+    """
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return dumps(obj, pretty).encode('utf-8')
+
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """序列化为字符串（非ASCII字符不转义）"""
+    if orjson:
+        return dumps_bytes(obj, pretty).decode('utf-8')
+    if pretty:
+        # 与orjson的OPT_INDENT_2输出一致
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def load(f: BinaryIO) -> Any:
+    """从以二进制模式打开的文件中解析JSON"""
+    return loads(f.read())
+
+
+def dump(obj: Any, f: BinaryIO, pretty: bool = False) -> None:
+    """写入以二进制模式打开的文件"""
+    f.write(dumps_bytes(obj, pretty))
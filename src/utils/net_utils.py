@@ -0,0 +1,42 @@
+# -*- coding:utf8 -*-
+"""
+网络工具模块
+IPv4地址与整数的转换，以及从路由器返回的WAN状态中判断在线状态，数据模型、各存储后端和分析使用同一规则
+"""
+import socket
+from typing import Any, Dict, Optional
+
+# 路由器在WAN口没有地址时返回的IP
+NO_ADDRESS = ('', '0.0.0.0')
+
+
+def ip_to_int(ip: Optional[str]) -> int:
+    """IPv4地址转为整数，无效地址返回0"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), 'big')
+    except (OSError, TypeError):
+        return 0
+
+
+def int_to_ip(value: int) -> Optional[str]:
+    """整数转为IPv4地址，0返回None"""
+    if not value:
+        return None
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+
+def wan_is_up(wan_status: Optional[Dict[str, Any]]) -> bool:
+    """
+    WAN口是否在线
+
+    真实路由器的WAN状态通常没有up字段（只有link_status、up_time等），
+    没有up字段时以WAN口是否有IP判断
+
+    Args:
+        wan_status: 路由器返回的 network/wan_status
+    """
+    wan_status = wan_status or {}
+    up = wan_status.get('up')
+    if up is not None:
+        return bool(up)
+    return (wan_status.get('ipaddr') or '') not in NO_ADDRESS
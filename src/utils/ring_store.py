@@ -0,0 +1,158 @@
+# -*- coding:utf8 -*-
+"""
+内存映射环形历史存储模块
+以定长二进制记录保存WAN口采样的关键字段，文件大小固定，读写都不需要解析JSON
+"""
+import mmap
+import os
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from utils.net_utils import int_to_ip, ip_to_int, wan_is_up
+from utils.path_utils import ensure_dir_exists
+
+# 文件头：魔数、版本、记录长度、容量、累计写入数
+_HEADER = struct.Struct('<4sHHIQ')
+_HEADER_SIZE = 32
+_MAGIC = b'WANR'
+_VERSION = 1
+
+# 记录：时间戳、IPv4整数、轮询延迟(ms)、错误码、协议编号、在线状态
+_RECORD = struct.Struct('<dIfiBB2x')
+
+# 协议编号，未知协议记为0
+PROTOCOLS = ('', 'dhcp', 'pppoe', 'static', 'l2tp', 'pptp', 'dslite', 'v6plus')
+_PROTOCOL_IDS = {name: index for index, name in enumerate(PROTOCOLS)}
+
+_UP_UNKNOWN = 255
+
+
+class MmapRingStore:
+    """内存映射的定长记录环形存储"""
+
+    def __init__(self, data_file: str, max_records: int = 43200, read_only: bool = False):
+        """
+        Args:
+            data_file: 环形文件的绝对路径
+            max_records: 环的容量，文件大小固定为 文件头 + 容量 x 记录长度
+            read_only: 只读打开，供其他进程读取正在写入的文件
+        """
+        self.data_file = data_file
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        if read_only:
+            self._file = open(data_file, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._check_header()
+        else:
+            ensure_dir_exists(data_file)
+            self._open_for_write(max_records)
+
+    def _open_for_write(self, max_records: int):
+        size = _HEADER_SIZE + max_records * _RECORD.size
+        exists = os.path.exists(self.data_file) and os.path.getsize(self.data_file) >= _HEADER_SIZE
+        self._file = open(self.data_file, 'r+b' if exists else 'w+b')
+        if exists:
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+            try:
+                self._check_header()
+                if self.capacity != max_records:
+                    logging.warning(f"环形历史文件容量为 {self.capacity}，"
+                                    f"与配置的 {max_records} 不一致，继续使用现有容量")
+                return
+            except ValueError as e:
+                logging.warning(f"环形历史文件无效，将重新创建: {e}")
+                self._mmap.close()
+
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, _VERSION, _RECORD.size, max_records, 0)
+        self.capacity = max_records
+
+    def _check_header(self):
+        magic, version, record_size, capacity, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION or record_size != _RECORD.size:
+            raise ValueError("文件头不匹配")
+        if len(self._mmap) < _HEADER_SIZE + capacity * record_size:
+            raise ValueError("文件长度不足")
+        self.capacity = capacity
+
+    @property
+    def written(self) -> int:
+        """累计写入的记录数"""
+        return _HEADER.unpack_from(self._mmap, 0)[4]
+
+    @property
+    def record_count(self) -> int:
+        """环中现有的记录数"""
+        return min(self.written, self.capacity)
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        追加一条采样（{'timestamp', 'data', 'latency_ms'}），只保存关键字段
+
+        Returns:
+            int: 环中现有的记录数
+        """
+        data = record.get('data') or {}
+        wan_status = (data.get('network') or {}).get('wan_status') or {}
+        timestamp = datetime.fromisoformat(record['timestamp']).timestamp()
+        latency = record.get('latency_ms')
+
+        with self._lock:
+            written = self.written
+            offset = _HEADER_SIZE + (written % self.capacity) * _RECORD.size
+            # 直接写入映射内存，先写记录再更新计数，读者不会看到未写完的最新记录
+            _RECORD.pack_into(self._mmap, offset,
+                              timestamp,
+                              ip_to_int(wan_status.get('ipaddr')),
+                              float('nan') if latency is None else latency,
+                              int(data.get('error_code', 0) or 0),
+                              _PROTOCOL_IDS.get(wan_status.get('proto'), 0),
+                              int(wan_is_up(wan_status)))
+            _HEADER.pack_into(self._mmap, 0, _MAGIC, _VERSION, _RECORD.size,
+                              self.capacity, written + 1)
+            return min(written + 1, self.capacity)
+
+    def _read(self, index: int) -> Dict[str, Any]:
+        """读取第index条记录（累计序号）并还原为历史记录格式"""
+        offset = _HEADER_SIZE + (index % self.capacity) * _RECORD.size
+        timestamp, ip, latency, error_code, proto, up = _RECORD.unpack_from(self._mmap, offset)
+        wan_status = {
+            'proto': PROTOCOLS[proto] if proto < len(PROTOCOLS) else '',
+            'ipaddr': int_to_ip(ip),
+            # 旧版本写入的未知状态按是否有IP判断
+            'up': bool(ip) if up == _UP_UNKNOWN else bool(up)
+        }
+        return {
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'data': {'network': {'wan_status': wan_status}, 'error_code': error_code},
+            'latency_ms': None if latency != latency else round(latency, 2)
+        }
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """读取最新的limit条记录（按时间顺序）"""
+        written = self.written
+        start = max(written - min(limit, self.capacity), 0)
+        return [self._read(index) for index in range(start, written)]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按时间顺序读取环中全部记录"""
+        written = self.written
+        for index in range(max(written - self.capacity, 0), written):
+            yield self._read(index)
+
+    def close(self):
+        """同步并关闭映射文件"""
+        with self._lock:
+            if self._mmap is None:
+                return
+            if not self.read_only:
+                self._mmap.flush()
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
@@ -0,0 +1,107 @@
+# -*- coding:utf8 -*-
+"""
+运行状态快照模块
+保存上次观测到的WAN口IP和各组件（通知、hosts、Git）已处理到的序号，重启后恢复，IP未变化时不重复产生副作用
+"""
+import copy
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from utils import json_codec
+from utils.file_utils import atomic_write
+from utils.path_utils import get_absolute_path
+
+
+class RuntimeState:
+    """
+    运行状态快照
+
+    每观测到一个与上次不同的IP，序号加一；组件完成对该IP的处理后记录当前序号。
+    组件记录的IP和序号都与最新的一致时，说明该组件的副作用已经完成，
+    IP在A -> B -> A变化时也能发现中间的变化没有处理完。
+    stok等登录状态由 ConfigManager 的状态文件保存，这里不重复保存
+    """
+
+    VERSION = 1
+
+    def __init__(self, state_file: str = 'data/runtime_state.json'):
+        self.state_file = get_absolute_path(state_file)
+        self.last_ip: Optional[str] = None
+        self.sequence = 0
+        # 组件 -> {'ip': 已处理的IP, 'seq': 处理时的序号}
+        self.components: Dict[str, Dict[str, Any]] = {}
+        # 轮询线程和各消费者线程都会更新快照
+        self._lock = threading.Lock()
+        self._saved = None
+        self.load()
+
+    def load(self) -> bool:
+        """从文件恢复快照，文件不存在或损坏时从空状态开始"""
+        try:
+            if not os.path.exists(self.state_file):
+                return False
+            with open(self.state_file, 'rb') as f:
+                data = json_codec.load(f)
+            if data.get('version') != self.VERSION:
+                logging.warning(f"运行状态快照版本不匹配，忽略: {self.state_file}")
+                return False
+            self.last_ip = data.get('last_ip')
+            self.sequence = int(data.get('sequence', 0))
+            self.components = dict(data.get('components') or {})
+            self._saved = copy.deepcopy(self._snapshot())
+            return True
+        except Exception as e:
+            logging.warning(f"加载运行状态快照失败，将按首次启动处理: {e}")
+            return False
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {'version': self.VERSION, 'last_ip': self.last_ip,
+                'sequence': self.sequence, 'components': self.components}
+
+    def _save(self):
+        """内容变化时原子写入（调用者持有锁）"""
+        snapshot = self._snapshot()
+        if snapshot == self._saved:
+            return
+        try:
+            atomic_write(self.state_file, json_codec.dumps_bytes(snapshot))
+            self._saved = copy.deepcopy(snapshot)
+        except Exception as e:
+            logging.error(f"保存运行状态快照失败: {e}")
+
+    def observe(self, ip: str) -> int:
+        """
+        记录轮询观测到的IP
+
+        Returns:
+            int: 当前序号，IP变化时递增
+        """
+        with self._lock:
+            if ip != self.last_ip:
+                self.last_ip = ip
+                self.sequence += 1
+                self._save()
+            return self.sequence
+
+    def mark(self, component: str, ip: str):
+        """记录组件已完成对该IP的处理；IP已不是最新的（之后还有事件）时不记录"""
+        with self._lock:
+            if ip != self.last_ip:
+                return
+            self.components[component] = {'ip': ip, 'seq': self.sequence}
+            self._save()
+
+    def is_current(self, component: str, ip: str) -> bool:
+        """组件是否已处理过最新一次观测到的IP"""
+        with self._lock:
+            record = self.components.get(component)
+            return (ip == self.last_ip and record is not None
+                    and record.get('ip') == ip and record.get('seq') == self.sequence)
+
+    def applied_ip(self, component: str) -> Optional[str]:
+        """组件上次处理的IP"""
+        with self._lock:
+            record = self.components.get(component)
+            return record.get('ip') if record else None
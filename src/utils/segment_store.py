@@ -0,0 +1,357 @@
+# -*- coding:utf8 -*-
+"""
+分段历史存储模块
+按时间把历史拆分为多个分段文件，已结束的分段在后台压缩，并按保留天数、总大小和分段数自动清理
+"""
+import gzip
+import io
+import os
+import re
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import json_codec
+from utils.file_utils import atomic_write
+from utils.history_store import JsonlHistoryStore
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 分段周期对应的文件名时间格式
+PERIODS = {
+    'hour': '%Y%m%d%H',
+    'day': '%Y%m%d',
+    'month': '%Y%m'
+}
+# 文件名长度 -> 时间格式，修改分段周期后仍能识别旧周期的分段
+_FORMATS_BY_LENGTH = {len(datetime(2000, 1, 1).strftime(time_format)): time_format
+                      for time_format in PERIODS.values()}
+
+_SEGMENT_PATTERN = re.compile(r'^(\d+)\.jsonl(\.gz|\.zst)?$')
+_INDEX_FILE = 'index.json'
+_COPY_SIZE = 64 * 1024
+
+
+class SegmentedHistoryStore:
+    """按时间分段的历史存储"""
+
+    def __init__(self, data_dir: str, segment_period: str = 'day',
+                 max_age_days: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None,
+                 max_segments: Optional[int] = None,
+                 keyframe_interval: int = 60, read_only: bool = False):
+        """
+        Args:
+            data_dir: 分段文件所在目录的绝对路径
+            segment_period: 分段周期，hour、day 或 month
+            max_age_days: 删除结束时间早于该天数的分段，None表示不限制
+            max_total_bytes: 全部分段的总大小上限，超出时从最旧的分段开始删除
+            max_segments: 分段数上限
+            keyframe_interval: 分段内每隔多少条写一次完整数据
+            read_only: 只读打开，不创建目录、不写索引
+        """
+        if segment_period not in PERIODS:
+            raise ValueError(f"不支持的分段周期: {segment_period}")
+        self.data_dir = data_dir
+        self.segment_period = segment_period
+        self.time_format = PERIODS[segment_period]
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+        self.max_segments = max_segments
+        self.keyframe_interval = keyframe_interval
+        # 有zstd时优先使用
+        self.compressed_suffix = '.zst' if zstandard else '.gz'
+
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(data_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._active_key = None
+        self._active = None
+        # 未压缩的已结束分段的读取器，tail不需要每次重新统计整个文件
+        self._readers: Dict[str, JsonlHistoryStore] = {}
+        self._maintaining = False
+        self._maintain_again = False
+
+        # 已压缩分段的记录数，避免启动时解压统计
+        self._index = self._load_index()
+        self.record_count = sum(self._segment_records(path) for _, path in self._segments())
+        if not read_only:
+            self._save_index()
+
+    # ---- 分段文件 ----
+
+    def _segments(self) -> List[Tuple[str, str]]:
+        """按时间顺序列出全部分段 (key, 路径)，同一时段的已压缩分段排在未压缩分段之前"""
+        entries = []
+        for filename in os.listdir(self.data_dir):
+            match = _SEGMENT_PATTERN.match(filename)
+            if match:
+                key, suffix = match.groups()
+                entries.append((key, 0 if suffix else 1, os.path.join(self.data_dir, filename)))
+        entries.sort()
+        return [(key, path) for key, _, path in entries]
+
+    @staticmethod
+    def _is_compressed(path: str) -> bool:
+        return path.endswith('.gz') or path.endswith('.zst')
+
+    def _open_segment(self, path: str):
+        """以二进制方式打开分段，压缩分段透明解压"""
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        if path.endswith('.zst'):
+            if not zstandard:
+                raise RuntimeError("读取 .zst 分段需要安装 zstandard")
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                open(path, 'rb'), read_across_frames=True, closefd=True)
+            return io.BufferedReader(reader)
+        return open(path, 'rb')
+
+    def _count_lines(self, path: str) -> int:
+        count = 0
+        with self._open_segment(path) as f:
+            for block in iter(lambda: f.read(_COPY_SIZE), b''):
+                count += block.count(b'\n')
+        return count
+
+    def _segment_records(self, path: str) -> int:
+        """分段的记录数，已压缩分段从索引读取"""
+        name = os.path.basename(path)
+        if not self._is_compressed(path):
+            return self._count_lines(path)
+        if name not in self._index:
+            try:
+                self._index[name] = self._count_lines(path)
+            except Exception as e:
+                logging.error(f"读取历史分段 {name} 失败: {e}")
+                self._index[name] = 0
+        return self._index[name]
+
+    def _load_index(self) -> Dict[str, int]:
+        index_file = os.path.join(self.data_dir, _INDEX_FILE)
+        if not os.path.exists(index_file):
+            return {}
+        try:
+            with open(index_file, 'rb') as f:
+                return json_codec.load(f)
+        except Exception as e:
+            logging.warning(f"历史分段索引无效，将重新统计: {e}")
+            return {}
+
+    def _save_index(self):
+        atomic_write(os.path.join(self.data_dir, _INDEX_FILE), json_codec.dumps_bytes(self._index))
+
+    # ---- 写入 ----
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        追加一条记录，进入新时段时切换到新分段
+
+        Returns:
+            int: 全部分段的记录数
+        """
+        key = datetime.fromisoformat(record['timestamp']).strftime(self.time_format)
+        with self._lock:
+            # 时钟回拨时继续写当前分段，保证分段内时间有序
+            if self._active_key is None or key > self._active_key:
+                self._rotate(key)
+            self._active.append(record)
+            self.record_count += 1
+            return self.record_count
+
+    def _rotate(self, key: str):
+        """切换到新分段，旧分段交给后台压缩"""
+        if self._active:
+            self._active.close()
+            logging.info(f"历史分段 {self._active_key} 已结束")
+        self._active_key = key
+        self._active = JsonlHistoryStore(os.path.join(self.data_dir, f'{key}.jsonl'),
+                                         None, keyframe_interval=self.keyframe_interval)
+        self._schedule_maintenance()
+
+    # ---- 后台压缩和清理 ----
+
+    def _schedule_maintenance(self):
+        """启动后台维护线程（调用时持有锁），运行中再次触发时在结束后重跑一轮"""
+        if self._maintaining:
+            self._maintain_again = True
+            return
+        self._maintaining = True
+        threading.Thread(target=self._maintain, name='history-maintain', daemon=True).start()
+
+    def _maintain(self):
+        while True:
+            try:
+                self._compress_closed()
+                self._enforce_retention()
+            except Exception as e:
+                logging.error(f"历史分段维护失败: {e}")
+            with self._lock:
+                if not self._maintain_again:
+                    self._maintaining = False
+                    return
+                self._maintain_again = False
+
+    def _closed_segments(self) -> List[Tuple[str, str]]:
+        """除当前写入分段以外的全部分段"""
+        with self._lock:
+            active_path = self._active.data_file if self._active else None
+            return [(key, path) for key, path in self._segments() if path != active_path]
+
+    def _compress_closed(self):
+        for key, path in self._closed_segments():
+            if not self._is_compressed(path):
+                self._compress(path)
+
+    def _compress(self, path: str):
+        """压缩一个已结束的分段，写完并同步到磁盘后再删除原文件"""
+        target = path + self.compressed_suffix
+        temp_file = target + '.tmp'
+        records = 0
+        try:
+            with open(path, 'rb') as source, open(temp_file, 'wb') as raw:
+                if zstandard:
+                    writer = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+                else:
+                    writer = gzip.GzipFile(fileobj=raw, mode='wb')
+                with writer:
+                    for block in iter(lambda: source.read(_COPY_SIZE), b''):
+                        records += block.count(b'\n')
+                        writer.write(block)
+                raw.flush()
+                os.fsync(raw.fileno())
+
+            with self._lock:
+                name = os.path.basename(target)
+                if os.path.exists(target):
+                    # 同一时段已有压缩分段（时钟回拨后重启），gzip和zstd都支持多段拼接
+                    with open(target, 'ab') as f, open(temp_file, 'rb') as compressed:
+                        shutil.copyfileobj(compressed, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.remove(temp_file)
+                else:
+                    os.replace(temp_file, target)
+                os.remove(path)
+                self._index[name] = self._index.get(name, 0) + records
+                self._save_index()
+            logging.info(f"历史分段已压缩: {name}")
+        except Exception as e:
+            logging.error(f"压缩历史分段 {os.path.basename(path)} 失败: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def _segment_start(self, key: str) -> Optional[datetime]:
+        """分段的开始时间，按文件名长度识别分段周期，无法识别时返回None"""
+        time_format = _FORMATS_BY_LENGTH.get(len(key))
+        try:
+            return datetime.strptime(key, time_format) if time_format else None
+        except ValueError:
+            return None
+
+    def _enforce_retention(self):
+        """按保留天数、总大小和分段数删除最旧的已结束分段"""
+        if self.max_age_days is None and self.max_total_bytes is None and self.max_segments is None:
+            return
+        with self._lock:
+            segments = self._segments()
+            active_path = self._active.data_file if self._active else None
+        sizes = [os.path.getsize(path) for _, path in segments]
+        total_bytes = sum(sizes)
+        remaining = len(segments)
+        cutoff = None
+        if self.max_age_days is not None:
+            cutoff = datetime.now() - timedelta(days=self.max_age_days)
+
+        for position, (key, path) in enumerate(segments):
+            if path == active_path:
+                break
+            # 分段的结束时间取下一个分段的开始时间
+            next_key = segments[position + 1][0] if position + 1 < len(segments) else None
+            end = self._segment_start(next_key) if next_key else None
+            expired = cutoff is not None and end is not None and end <= cutoff
+            too_many = self.max_segments is not None and remaining > self.max_segments
+            too_large = self.max_total_bytes is not None and total_bytes > self.max_total_bytes
+            if not (expired or too_many or too_large):
+                if cutoff is not None and next_key and end is None:
+                    # 无法识别时间的分段不阻止清理之后的分段
+                    logging.warning(f"无法识别历史分段 {next_key} 的时间，"
+                                    f"按保留天数清理时跳过 {os.path.basename(path)}")
+                    continue
+                break
+
+            with self._lock:
+                records = self._segment_records(path)
+                os.remove(path)
+                self._index.pop(os.path.basename(path), None)
+                self._save_index()
+                self.record_count -= records
+            total_bytes -= sizes[position]
+            remaining -= 1
+            logging.info(f"已清理历史分段: {os.path.basename(path)}")
+
+    # ---- 读取 ----
+
+    def _read_segment(self, path: str) -> Iterator[Dict[str, Any]]:
+        """流式读取一个分段，读取期间被压缩或删除时改读压缩后的文件或跳过"""
+        candidates = [path] if self._is_compressed(path) else \
+            [path, path + '.zst', path + '.gz']
+        for candidate in candidates:
+            try:
+                f = self._open_segment(candidate)
+            except FileNotFoundError:
+                continue
+            with f:
+                yield from JsonlHistoryStore._rebuild(JsonlHistoryStore._parse(f))
+            return
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按时间顺序流式读取全部分段"""
+        with self._lock:
+            segments = self._segments()
+        for _, path in segments:
+            yield from self._read_segment(path)
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """读取最新的limit条记录（按时间顺序），从最新的分段向前读取"""
+        if not limit:
+            return []
+        with self._lock:
+            segments = self._segments()
+        records = []
+        for _, path in reversed(segments):
+            need = limit - len(records)
+            if self._is_compressed(path):
+                segment_records = list(self._read_segment(path))[-need:]
+            else:
+                segment_records = self._reader(path).tail(need)
+            records = segment_records + records
+            if len(records) >= limit:
+                break
+        return records[-limit:]
+
+    def _reader(self, path: str) -> JsonlHistoryStore:
+        """未压缩分段的读取器：当前分段直接使用写入的存储，其他分段的读取器缓存复用"""
+        with self._lock:
+            if self._active and self._active.data_file == path:
+                return self._active
+            reader = self._readers.get(path)
+            if reader is None:
+                # 已压缩或删除的分段不再需要读取器
+                self._readers = {cached: store for cached, store in self._readers.items()
+                                 if os.path.exists(cached)}
+                reader = self._readers[path] = JsonlHistoryStore(
+                    path, None, keyframe_interval=self.keyframe_interval)
+            return reader
+
+    def close(self):
+        """关闭当前分段"""
+        with self._lock:
+            if self._active:
+                self._active.close()
@@ -0,0 +1,328 @@
+# -*- coding:utf8 -*-
+"""
+SQLite历史存储模块
+以带索引的时间序列表保存WAN口采样、IP变化和登录事件，支持按时间范围查询和聚合
+"""
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils import json_codec
+from utils.net_utils import wan_is_up
+from utils.path_utils import ensure_dir_exists
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    router TEXT NOT NULL,
+    ip TEXT,
+    proto TEXT,
+    up INTEGER,
+    latency_ms REAL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_samples_router_ts ON samples (router, ts);
+
+CREATE TABLE IF NOT EXISTS ip_changes (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    router TEXT NOT NULL,
+    old_ip TEXT,
+    new_ip TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ip_changes_router_ts ON ip_changes (router, ts);
+
+CREATE TABLE IF NOT EXISTS logins (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    router TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_logins_router_ts ON logins (router, ts);
+'''
+
+# 旧版本写入的up可能为NULL，与 wan_is_up 一致按是否有IP判断
+_UP_EXPR = "COALESCE(up, ip IS NOT NULL AND ip NOT IN ('', '0.0.0.0'))"
+
+
+def _to_timestamp(value) -> float:
+    """ISO时间字符串或datetime转为时间戳"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class SqliteHistoryStore:
+    """SQLite时间序列历史存储"""
+
+    def __init__(self, db_file: str, router: str = 'default',
+                 max_records: int = 43200, batch_size: int = 20,
+                 flush_interval: float = 30, read_only: bool = False):
+        """
+        Args:
+            db_file: 数据库文件的绝对路径，多个路由器可以共用
+            router: 路由器名称，所有读写都限定在该路由器
+            max_records: 每个路由器保留的采样数
+            batch_size: 累积多少条写入后在一个事务中批量提交
+            flush_interval: 距上次提交超过该秒数时也会提交
+            read_only: 以只读模式打开已有的数据库，不建表、不迁移
+        """
+        self.db_file = db_file
+        self.router = router
+        self.max_records = max_records
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(self._read_only_uri(), uri=True, check_same_thread=False)
+        else:
+            ensure_dir_exists(db_file)
+            self._conn = sqlite3.connect(db_file, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+        self._pending_samples = []
+        self._pending_ip_changes = []
+        self._pending_logins = []
+        self._last_flush = time.monotonic()
+        self._appends_since_prune = 0
+        self.record_count = self._conn.execute(
+            'SELECT COUNT(*) FROM samples WHERE router = ?', (router,)).fetchone()[0]
+
+    def _read_only_uri(self) -> str:
+        return Path(self.db_file).as_uri() + '?mode=ro'
+
+    def _migrate(self):
+        """为旧版数据库补充新增的列"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(samples)')}
+        if 'latency_ms' not in columns:
+            with self._conn:
+                self._conn.execute('ALTER TABLE samples ADD COLUMN latency_ms REAL')
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        追加一条采样（{'timestamp', 'data'}），按批提交
+
+        Returns:
+            int: 当前采样数
+        """
+        data = record.get('data') or {}
+        wan_status = (data.get('network') or {}).get('wan_status') or {}
+        row = (_to_timestamp(record['timestamp']), self.router,
+               wan_status.get('ipaddr'), wan_status.get('proto'),
+               int(wan_is_up(wan_status)),
+               record.get('latency_ms'),
+               json_codec.dumps(data))
+        with self._lock:
+            self._pending_samples.append(row)
+            self.record_count += 1
+            self._appends_since_prune += 1
+            self._maybe_flush()
+            return self.record_count
+
+    def record_ip_change(self, old_ip: str, new_ip: str, timestamp=None):
+        """记录一次IP变化事件"""
+        with self._lock:
+            self._pending_ip_changes.append(
+                (_to_timestamp(timestamp or time.time()), self.router, old_ip, new_ip))
+            self._maybe_flush()
+
+    def record_login(self, success: bool, reason: str = '', timestamp=None):
+        """记录一次登录事件"""
+        with self._lock:
+            self._pending_logins.append(
+                (_to_timestamp(timestamp or time.time()), self.router, int(success), reason))
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = len(self._pending_samples) + len(self._pending_ip_changes) + \
+            len(self._pending_logins)
+        if pending >= self.batch_size or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """
+        在一个事务中提交所有待写入的数据
+
+        提交失败（如数据库被锁定）时事务回滚，数据保留在待写入列表中，下次提交时重试
+        """
+        if not (self._pending_samples or self._pending_ip_changes or self._pending_logins):
+            self._last_flush = time.monotonic()
+            return
+        try:
+            with self._conn:
+                if self._pending_samples:
+                    self._conn.executemany(
+                        'INSERT INTO samples (ts, router, ip, proto, up, latency_ms, payload) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)', self._pending_samples)
+                if self._pending_ip_changes:
+                    self._conn.executemany(
+                        'INSERT INTO ip_changes (ts, router, old_ip, new_ip) '
+                        'VALUES (?, ?, ?, ?)', self._pending_ip_changes)
+                if self._pending_logins:
+                    self._conn.executemany(
+                        'INSERT INTO logins (ts, router, success, reason) '
+                        'VALUES (?, ?, ?, ?)', self._pending_logins)
+                if self._appends_since_prune >= max(self.max_records // 10, 1):
+                    self._prune_locked()
+        except sqlite3.Error as e:
+            logging.error(f"写入SQLite历史数据失败，{len(self._pending_samples)} 条采样稍后重试: {e}")
+        else:
+            self._pending_samples = []
+            self._pending_ip_changes = []
+            self._pending_logins = []
+        finally:
+            self._last_flush = time.monotonic()
+
+    def _prune_locked(self):
+        """删除超出保留数量的旧采样"""
+        self._conn.execute(
+            'DELETE FROM samples WHERE router = ? AND id <= ('
+            'SELECT id FROM samples WHERE router = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+            (self.router, self.router, self.max_records))
+        self.record_count = self._conn.execute(
+            'SELECT COUNT(*) FROM samples WHERE router = ?', (self.router,)).fetchone()[0]
+        self._appends_since_prune = 0
+
+    def flush(self):
+        """立即提交待写入的数据"""
+        with self._lock:
+            self._flush_locked()
+
+    @staticmethod
+    def _row_to_record(ts: float, latency_ms: Optional[float], payload: str) -> Dict[str, Any]:
+        record = {
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'data': json_codec.loads(payload)
+        }
+        if latency_ms is not None:
+            record['latency_ms'] = latency_ms
+        return record
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """读取最新的limit条采样（按时间顺序）"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT ts, latency_ms, payload FROM samples WHERE router = ? '
+                'ORDER BY ts DESC LIMIT ?', (self.router, limit)).fetchall()
+        return [self._row_to_record(*row) for row in reversed(rows)]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按时间顺序流式读取全部采样"""
+        return self.samples_between()
+
+    def samples_between(self, start=None, end=None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间范围流式读取采样
+
+        Args:
+            start: 开始时间（含），ISO字符串、datetime或时间戳，None表示不限
+            end: 结束时间（不含），None表示不限
+        """
+        self.flush()
+        start_ts, end_ts = self._range(start, end)
+        # 使用独立的只读连接流式读取，避免长时间占用写连接
+        conn = sqlite3.connect(self._read_only_uri(), uri=True)
+        try:
+            cursor = conn.execute(
+                'SELECT ts, latency_ms, payload FROM samples '
+                'WHERE router = ? AND ts >= ? AND ts < ? ORDER BY ts',
+                (self.router, start_ts, end_ts))
+            for row in cursor:
+                yield self._row_to_record(*row)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _range(start, end):
+        start_ts = _to_timestamp(start) if start is not None else float('-inf')
+        end_ts = _to_timestamp(end) if end is not None else float('inf')
+        return start_ts, end_ts
+
+    def _query(self, sql: str, params) -> List[tuple]:
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def ip_changes_between(self, start=None, end=None) -> List[Dict[str, Any]]:
+        """按时间范围查询IP变化事件"""
+        start_ts, end_ts = self._range(start, end)
+        rows = self._query(
+            'SELECT ts, old_ip, new_ip FROM ip_changes WHERE router = ? AND ts >= ? AND ts < ? '
+            'ORDER BY ts', (self.router, start_ts, end_ts))
+        return [{'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                 'old_ip': old_ip, 'new_ip': new_ip} for ts, old_ip, new_ip in rows]
+
+    def logins_between(self, start=None, end=None) -> List[Dict[str, Any]]:
+        """按时间范围查询登录事件"""
+        start_ts, end_ts = self._range(start, end)
+        rows = self._query(
+            'SELECT ts, success, reason FROM logins WHERE router = ? AND ts >= ? AND ts < ? '
+            'ORDER BY ts', (self.router, start_ts, end_ts))
+        return [{'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                 'success': bool(success), 'reason': reason} for ts, success, reason in rows]
+
+    def last_ip_change(self) -> Optional[Dict[str, Any]]:
+        """最近一次IP变化"""
+        changes = self._query(
+            'SELECT ts, old_ip, new_ip FROM ip_changes WHERE router = ? '
+            'ORDER BY ts DESC LIMIT 1', (self.router,))
+        if not changes:
+            return None
+        ts, old_ip, new_ip = changes[0]
+        return {'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                'old_ip': old_ip, 'new_ip': new_ip}
+
+    def summary(self, start=None, end=None) -> Dict[str, Any]:
+        """
+        时间范围内的聚合统计，全部在SQLite中完成
+
+        Returns:
+            dict: 采样数、在线采样数、可用率、WAN断开总时长（秒）、IP变化次数、登录次数
+        """
+        start_ts, end_ts = self._range(start, end)
+        params = (self.router, start_ts, end_ts)
+        samples, up_samples = self._query(
+            f'SELECT COUNT(*), COALESCE(SUM({_UP_EXPR}), 0) FROM samples '
+            'WHERE router = ? AND ts >= ? AND ts < ?', params)[0]
+        # 断开时长：每个离线采样持续到下一次采样为止
+        downtime = self._query(
+            'SELECT COALESCE(SUM(next_ts - ts), 0) FROM ('
+            f'  SELECT ts, {_UP_EXPR} AS up, LEAD(ts) OVER (ORDER BY ts) AS next_ts '
+            '  FROM samples'
+            '  WHERE router = ? AND ts >= ? AND ts < ?'
+            ') WHERE up = 0 AND next_ts IS NOT NULL', params)[0][0]
+        ip_changes = self._query(
+            'SELECT COUNT(*) FROM ip_changes WHERE router = ? AND ts >= ? AND ts < ?',
+            params)[0][0]
+        logins = self._query(
+            'SELECT COUNT(*) FROM logins WHERE router = ? AND ts >= ? AND ts < ?',
+            params)[0][0]
+        return {
+            'samples': samples,
+            'up_samples': up_samples,
+            'availability': up_samples / samples if samples else None,
+            'downtime_seconds': downtime,
+            'ip_changes': ip_changes,
+            'logins': logins
+        }
+
+    def close(self):
+        """提交剩余数据并关闭数据库"""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+内置DNS应答器压力测试
+在本地启动 DnsResponder，用异步的桩解析器并发发送查询，校验应答并统计吞吐量和延迟分位数
+"""
+import sys
+import os
+import time
+import random
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_monitor import percentile
+from core.dns_responder import (DnsResponder, RCODE_NOERROR, RCODE_REFUSED,
+                                build_query, parse_response)
+
+
+class StubResolver(asyncio.DatagramProtocol):
+    """按查询ID匹配应答的UDP桩解析器"""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id = struct.unpack_from('!H', data)[0]
+        future = self.pending.pop(query_id, None)
+        if future and not future.done():
+            future.set_result(data)
+
+    async def query(self, name, query_id, timeout):
+        future = asyncio.get_running_loop().create_future()
+        self.pending[query_id] = future
+        self.transport.sendto(build_query(name, query_id=query_id))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(query_id, None)
+
+
+async def run_clients(port, names, expected, queries, concurrency, timeout):
+    """并发运行若干个桩解析器，返回 (每个查询的延迟, 错误数, 超时数)"""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    errors = 0
+    timeouts = 0
+    remaining = [queries]
+
+    async def client(index):
+        nonlocal errors, timeouts
+        transport, stub = await loop.create_datagram_endpoint(
+            StubResolver, remote_addr=('127.0.0.1', port))
+        query_id = index * 4096
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                query_id = (query_id + 1) & 0xFFFF
+                name = random.choice(names)
+                started = time.perf_counter()
+                try:
+                    reply = await stub.query(name, query_id, timeout)
+                except asyncio.TimeoutError:
+                    timeouts += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                reply_id, rcode, addresses = parse_response(reply)
+                want = expected.get(name.lower())
+                if reply_id != query_id:
+                    errors += 1
+                elif want is None and rcode != RCODE_REFUSED:
+                    errors += 1
+                elif want is not None and (rcode != RCODE_NOERROR or addresses != [want]):
+                    errors += 1
+        finally:
+            transport.close()
+
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return latencies, errors, timeouts
+
+
+def check_tcp(port, name, expected_ip):
+    """通过TCP发送一次查询，校验TCP监听"""
+    query = build_query(name, query_id=1)
+    with socket.create_connection(('127.0.0.1', port), timeout=2) as sock:
+        sock.sendall(struct.pack('!H', len(query)) + query)
+        length = struct.unpack('!H', sock.recv(2))[0]
+        reply = b''
+        while len(reply) < length:
+            reply += sock.recv(length - len(reply))
+    _, rcode, addresses = parse_response(reply)
+    return rcode == RCODE_NOERROR and addresses == [expected_ip]
+
+
+def run_benchmark(domain_count, queries, concurrency, miss_ratio, timeout):
+    """运行压力测试并打印报告"""
+    domains = [f'host{index}.example.com' for index in range(domain_count)]
+    responder = DnsResponder('127.0.0.1', 0, ttl=30)
+    responder.update_records('default', '203.0.113.7', domains)
+    responder.start()
+
+    # 部分查询为未配置的域名，应被拒绝；混入大写字母检查大小写不敏感
+    misses = [f'unknown{index}.example.org' for index in range(max(int(domain_count * miss_ratio), 1))]
+    names = [name.upper() if index % 7 == 0 else name
+             for index, name in enumerate(domains + (misses if miss_ratio else []))]
+    expected = {name: '203.0.113.7' for name in domains}
+
+    try:
+        tcp_ok = check_tcp(responder.port, domains[0], '203.0.113.7')
+        started = time.perf_counter()
+        latencies, errors, timeouts = asyncio.run(
+            run_clients(responder.port, names, expected, queries, concurrency, timeout))
+        elapsed = time.perf_counter() - started
+
+        # IP变化后新查询立即得到新IP
+        changed_at = time.perf_counter()
+        responder.update_records('default', '203.0.113.8', domains)
+        propagated = responder.lookup(domains[0]) == '203.0.113.8'
+        propagation_ms = (time.perf_counter() - changed_at) * 1000
+    finally:
+        responder.stop()
+
+    latencies.sort()
+    print("=" * 60)
+    print("内置DNS应答器压力测试")
+    print("=" * 60)
+    print(f"域名数: {domain_count}，查询数: {queries}，并发: {concurrency}，"
+          f"未配置域名比例: {miss_ratio:.0%}")
+    print(f"总耗时: {elapsed:.2f}s，吞吐量: {len(latencies) / elapsed:.0f} 查询/秒")
+    if latencies:
+        print(f"查询延迟(ms): p50={percentile(latencies, 0.5):.3f} "
+              f"p90={percentile(latencies, 0.9):.3f} "
+              f"p99={percentile(latencies, 0.99):.3f} "
+              f"max={latencies[-1]:.3f}")
+    print(f"错误应答: {errors}，超时: {timeouts}，TCP查询: {'正常' if tcp_ok else '失败'}")
+    print(f"IP更新生效: {'是' if propagated else '否'}（{propagation_ms:.3f}ms）")
+    print(f"应答器统计: {responder.stats}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='内置DNS应答器压力测试')
+    parser.add_argument('--domains', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--miss-ratio', type=float, default=0.1,
+                        help='未配置域名的查询比例（相对域名数）')
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    run_benchmark(args.domains, args.queries, args.concurrency, args.miss_ratio, args.timeout)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+监控服务端到端延迟基准测试
+使用本地路由器模拟器驱动 RouterMonitorService，统计每轮轮询的延迟分位数和吞吐量
+"""
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from router_simulator import RouterSimulator
+from core.monitor_service import RouterMonitorService
+from utils.config_manager import ConfigManager
+
+
+def percentile(sorted_values, fraction):
+    """已排序数据的分位数（线性插值）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def run_benchmark(cycles, latency, error_rate, stok_lifetime, ip_change_every,
+                  inventory, host_count, history_backend='jsonl'):
+    """运行基准测试并打印报告"""
+    simulator = RouterSimulator(latency=latency, error_rate=error_rate,
+                                stok_lifetime=stok_lifetime,
+                                ip_change_every=ip_change_every,
+                                host_count=host_count).start()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        config = {
+            'host': simulator.address,
+            'password': 'admin123',
+            'data_dir': os.path.join(work_dir, 'data'),
+            'hosts_file': os.path.join(work_dir, 'hosts'),
+            'domains': ['example.com', 'www.example.com'],
+            'inventory_enabled': inventory,
+            'inventory_interval': 0,
+            'history_backend': history_backend,
+            'git_enabled': False
+        }
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+        service = RouterMonitorService(ConfigManager(config_file))
+
+        outcomes = {}
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(cycles):
+            cycle_start = time.perf_counter()
+            outcome = service._check_wan_status()
+            latencies.append((time.perf_counter() - cycle_start) * 1000)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        elapsed = time.perf_counter() - started
+
+        # 等待事件消费者处理完副作用
+        service.event_bus.stop()
+        bus_stats = service.event_bus.get_stats()
+        http_stats = service.router.get_session_stats()
+        stok_stats = service.session_manager.get_stats()
+        service.router.close()
+        service.data_manager.close()
+
+    simulator.stop()
+    latencies.sort()
+
+    print("=" * 60)
+    print("监控服务端到端基准测试")
+    print("=" * 60)
+    print(f"轮询次数: {cycles}，注入延迟: {latency * 1000:.1f}ms，错误率: {error_rate:.1%}")
+    print(f"总耗时: {elapsed:.2f}s，吞吐量: {cycles / elapsed:.1f} 轮/秒")
+    print(f"每轮延迟(ms): p50={percentile(latencies, 0.5):.2f} "
+          f"p90={percentile(latencies, 0.9):.2f} "
+          f"p99={percentile(latencies, 0.99):.2f} "
+          f"max={latencies[-1]:.2f}")
+    print(f"轮询结果: {outcomes}")
+    print(f"HTTP: 请求{http_stats['requests']}次，新建连接{http_stats['connections']}个，"
+          f"复用率{http_stats['reuse_ratio']:.1%}")
+    print(f"stok: 复用率{stok_stats['reuse_ratio']:.1%}，登录{stok_stats['logins']}次")
+    print(f"模拟器: {simulator.stats}")
+    for name, stats in bus_stats.items():
+        print(f"事件消费者 {name}: 处理{stats['processed']}个，丢弃{stats['dropped']}个，"
+              f"错误{stats['errors']}个")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='监控服务端到端延迟基准测试')
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='模拟器每个请求注入的延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--stok-lifetime', type=float, default=None)
+    parser.add_argument('--ip-change-every', type=int, default=0)
+    parser.add_argument('--inventory', action='store_true',
+                        help='每轮同时获取主机表')
+    parser.add_argument('--host-count', type=int, default=20)
+    parser.add_argument('--history-backend', choices=['jsonl', 'sqlite', 'ring', 'segments'], default='jsonl')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    run_benchmark(args.cycles, args.latency, args.error_rate, args.stok_lifetime,
+                  args.ip_change_every, args.inventory, args.host_count,
+                  args.history_backend)
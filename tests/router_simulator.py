@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+TP-LINK 路由器模拟器
+在本地实现 RouterMonitor 使用的登录和 /stok=.../ds 协议，用于离线测试和性能测量
+"""
+import sys
+import os
+import json
+import random
+import threading
+import time
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.router_monitor import RouterMonitor
+
+# 错误码
+ERROR_OK = 0
+ERROR_STOK_EXPIRED = -40401
+ERROR_BAD_PASSWORD = -40321
+ERROR_INTERNAL = -40101
+
+
+class RouterSimulator:
+    """模拟的TP-LINK路由器"""
+
+    def __init__(self, password='admin123', ip='10.0.0.100', port=0,
+                 stok_lifetime=None, latency=0.0, error_rate=0.0,
+                 ip_change_every=0, host_count=20, hosts_error=False):
+        """
+        Args:
+            password (str): 管理密码，登录时校验 encrypt_pwd 的结果
+            ip (str): 初始WAN口IP
+            port (int): 监听端口，0表示随机端口
+            stok_lifetime (float): stok有效期（秒），None表示永不过期
+            latency (float): 每个请求注入的延迟（秒）
+            error_rate (float): 以该概率返回内部错误
+            ip_change_every (int): 每多少次WAN状态查询变化一次IP，0表示不变
+            host_count (int): 主机表中的设备数
+            hosts_error (bool): 查询主机表时返回错误（模拟主机表出错的固件）
+        """
+        self.encrypt_password = RouterMonitor().encrypt_pwd(password)
+        self.ip = ip
+        self.stok_lifetime = stok_lifetime
+        self.latency = latency
+        self.error_rate = error_rate
+        self.ip_change_every = ip_change_every
+        self.host_count = host_count
+        self.hosts_error = hosts_error
+
+        self.stok = None
+        self.stok_issued_at = 0.0
+        self.stats = {'logins': 0, 'bad_logins': 0, 'queries': 0,
+                      'expired': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """供 RouterMonitor 使用的 host:port"""
+        return f'127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        """在后台线程中启动"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"路由器模拟器已启动: {self.address}")
+        return self
+
+    def stop(self):
+        """停止模拟器"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def set_ip(self, ip):
+        """手动修改WAN口IP"""
+        with self._lock:
+            self.ip = ip
+
+    def expire_stok(self):
+        """立即让当前stok失效"""
+        with self._lock:
+            self.stok = None
+
+    def _next_ip(self):
+        parts = self.ip.split('.')
+        parts[-1] = str(int(parts[-1]) % 254 + 1)
+        return '.'.join(parts)
+
+    def _handle(self, path, body):
+        """处理一个请求，返回响应体"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return {'error_code': ERROR_INTERNAL}
+
+            if path == '/':
+                password = body.get('login', {}).get('password')
+                if body.get('method') != 'do' or password != self.encrypt_password:
+                    self.stats['bad_logins'] += 1
+                    return {'error_code': ERROR_BAD_PASSWORD}
+                self.stats['logins'] += 1
+                self.stok = '%032x' % random.getrandbits(128)
+                self.stok_issued_at = time.monotonic()
+                return {'stok': self.stok, 'error_code': ERROR_OK}
+
+            expired = self.stok is None or path != f'/stok={self.stok}/ds' or (
+                self.stok_lifetime is not None and
+                time.monotonic() - self.stok_issued_at > self.stok_lifetime)
+            if expired:
+                self.stats['expired'] += 1
+                return {'error_code': ERROR_STOK_EXPIRED}
+
+            self.stats['queries'] += 1
+            if self.hosts_error and 'hosts_info' in body:
+                self.stats['errors'] += 1
+                return {'error_code': ERROR_INTERNAL}
+            response = {'error_code': ERROR_OK}
+            if 'network' in body:
+                if self.ip_change_every and self.stats['queries'] % self.ip_change_every == 0:
+                    self.ip = self._next_ip()
+                response['network'] = {'wan_status': self._wan_status()}
+            if 'hosts_info' in body:
+                response['hosts_info'] = {'host_info': self._host_table()}
+            return response
+
+    def _wan_status(self):
+        prefix = self.ip.rsplit('.', 1)[0]
+        return {
+            'proto': 'dhcp',
+            'ipaddr': self.ip,
+            'netmask': '255.255.252.0',
+            'gateway': f'{prefix}.1',
+            'pri_dns': '114.114.114.114',
+            'snd_dns': '8.8.8.8',
+            'up': True,
+            'up_time': int(time.monotonic()),
+            'link_status': 1
+        }
+
+    def _host_table(self):
+        return [
+            {f'host_info_{index}': {
+                'mac': '02-00-00-00-%02x-%02x' % (index // 256, index % 256),
+                'ip': f'192.168.1.{index % 250 + 2}',
+                'hostname': f'device-{index}'
+            }}
+            for index in range(1, self.host_count + 1)
+        ]
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，关闭Nagle避免keep-alive连接上的延迟确认等待
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    body = {}
+                data = json.dumps(simulator._handle(self.path, body)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='TP-LINK 路由器模拟器')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--stok-lifetime', type=float, default=None)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--ip-change-every', type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = RouterSimulator(password=args.password, port=args.port,
+                                stok_lifetime=args.stok_lifetime,
+                                latency=args.latency, error_rate=args.error_rate,
+                                ip_change_every=args.ip_change_every)
+    print(f"模拟器监听于 {simulator.address}，按 Ctrl+C 停止")
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        simulator.stop()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+配置保存与热加载测试
+验证stok等运行时状态拆分到状态文件、热加载原地更新，以及保存时不会覆盖文件中需要重启才能生效的修改
+"""
+import sys
+import os
+import json
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.config_manager import ConfigManager
+
+
+def _write(path, config):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _fleet_config():
+    return {
+        'password': 'admin123',
+        'domains': ['example.com'],
+        'routers': [
+            {'name': 'a', 'host': '192.168.1.1'},
+            {'name': 'b', 'host': '192.168.2.1'}
+        ]
+    }
+
+
+def test_volatile_keys_saved_to_state_file():
+    """stok等运行时状态只写入状态文件，内容未变化时不写文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123', 'stok': 'old'})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+
+        config['stok'] = 'new'
+        assert manager.save_config(config)
+        assert 'stok' not in _read(config_file)
+        assert _read(manager.state_file)['stok'] == 'new'
+
+        mtime = os.stat(config_file).st_mtime_ns
+        state_mtime = os.stat(manager.state_file).st_mtime_ns
+        assert manager.save_config(config)
+        assert os.stat(config_file).st_mtime_ns == mtime
+        assert os.stat(manager.state_file).st_mtime_ns == state_mtime
+
+        # 重新加载后合并状态文件
+        assert ConfigManager(config_file).load_config()['stok'] == 'new'
+
+
+def test_unnamed_fleet_router_state_survives_restart():
+    """舰队中没有名称的路由器按地址保存stok，重启后不需要重新登录"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'password': 'admin123', 'routers': [
+            {'host': '192.168.1.1'}, {'name': 'b', 'host': '192.168.2.1'}]})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+        config['routers'][0]['stok'] = 'stok-a'
+        config['routers'][0]['encrypt_password'] = 'encrypted-a'
+        config['routers'][1]['stok'] = 'stok-b'
+        assert manager.save_config(config)
+        assert 'stok' not in _read(config_file)['routers'][0]
+        assert set(_read(manager.state_file)['routers']) == {'192.168.1.1', 'b'}
+
+        routers = ConfigManager(config_file).load_config()['routers']
+        assert routers[0]['stok'] == 'stok-a'
+        assert routers[0]['encrypt_password'] == 'encrypted-a'
+        assert routers[1]['stok'] == 'stok-b'
+
+
+def test_password_change_invalidates_encrypted_password():
+    """密码修改后不再使用旧的加密密码"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123'})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+        config.update(stok='s', encrypt_password='enc')
+        manager.save_config(config)
+
+        config = _read(config_file)
+        config['password'] = 'changed'
+        _write(config_file, config)
+        reloaded = ConfigManager(config_file).load_config()
+        assert reloaded['encrypt_password'] == ''
+        assert reloaded['stok'] == ''
+
+
+def test_reload_updates_in_place():
+    """热加载原地更新当前配置并返回变化的配置项，保留运行时状态"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123',
+                             'domains': ['example.com']})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+        config['stok'] = 'live'
+
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123',
+                             'domains': ['example.com', 'www.example.com']})
+        changes = manager.reload_config()
+        assert changes['keys'] == {'domains'}
+        assert not changes['routers_changed']
+        assert manager.get_config() is config
+        assert config['domains'] == ['example.com', 'www.example.com']
+        assert config['stok'] == 'live'
+
+
+def test_reload_rejects_invalid_config():
+    """新配置无效时继续使用当前配置"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123'})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+
+        _write(config_file, {'host': '192.168.1.1'})
+        assert manager.reload_config() is None
+        assert config['password'] == 'admin123'
+
+
+def test_router_removal_survives_save():
+    """删除路由器需要重启生效，重启前保存stok不能把删除的路由器写回文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, _fleet_config())
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+
+        edited = _fleet_config()
+        del edited['routers'][1]
+        _write(config_file, edited)
+        changes = manager.reload_config()
+        assert changes['routers_changed']
+        # 内存中仍是原来的路由器列表
+        assert [router['name'] for router in config['routers']] == ['a', 'b']
+
+        config['routers'][1]['stok'] = 'b-stok'
+        assert manager.save_config(config)
+        assert [router['name'] for router in _read(config_file)['routers']] == ['a']
+
+        # 其他配置项变化需要写文件时同样保留文件中的路由器列表
+        config['domains'] = ['example.org']
+        assert manager.save_config(config)
+        saved = _read(config_file)
+        assert [router['name'] for router in saved['routers']] == ['a']
+        assert saved['domains'] == ['example.org']
+
+
+def test_switch_to_fleet_mode_survives_save():
+    """单路由器配置中添加routers需要重启生效，重启前保存不能删除routers"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, {'host': '192.168.1.1', 'password': 'admin123'})
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+
+        edited = {'host': '192.168.1.1', 'password': 'admin123',
+                  'routers': [{'name': 'a', 'host': '192.168.1.1'}]}
+        _write(config_file, edited)
+        changes = manager.reload_config()
+        assert changes['routers_changed']
+        assert 'routers' not in config
+
+        config['stok'] = 'new'
+        assert manager.save_config(config)
+        assert _read(config_file)['routers'] == edited['routers']
+
+        # 重启后按文件中的配置运行
+        assert ConfigManager(config_file).load_config()['routers'] == edited['routers']
+
+
+def test_router_settings_reload_in_place():
+    """路由器列表不变时，单台路由器的配置原地更新"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_file = os.path.join(work_dir, 'router_config.json')
+        _write(config_file, _fleet_config())
+        manager = ConfigManager(config_file)
+        config = manager.load_config()
+        router = config['routers'][1]
+
+        edited = _fleet_config()
+        edited['routers'][1]['domains'] = ['b.example.com']
+        _write(config_file, edited)
+        changes = manager.reload_config()
+        assert not changes['routers_changed']
+        assert changes['routers'] == {'b': {'domains'}}
+        assert config['routers'][1] is router
+        assert router['domains'] == ['b.example.com']
+
+        mtime = os.stat(config_file).st_mtime_ns
+        manager.save_config(config)
+        assert os.stat(config_file).st_mtime_ns == mtime
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
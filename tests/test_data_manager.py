@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+数据管理器写入缓存测试
+验证按间隔和按数量的后台写入、写入失败后按原顺序重试、读取缓存、关闭时写完剩余记录以及共用后台线程
+"""
+import sys
+import os
+import time
+import threading
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.data_manager import DataManager
+
+
+def _data(index):
+    return {'network': {'wan_status': {'ipaddr': f'10.0.0.{index}', 'up_time': index}},
+            'error_code': 0}
+
+
+def _ips(records):
+    return [record['data']['network']['wan_status']['ipaddr'] for record in records]
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_flush_on_interval():
+    """记录先进入缓存，后台线程按间隔写入"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = DataManager(os.path.join(work_dir, 'history.jsonl'),
+                              flush_interval=0.1, flush_size=100)
+        for index in range(3):
+            manager.save_wan_data(_data(index))
+        assert _ips(manager.load_wan_history(3)) == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+        assert _wait_for(lambda: manager.store.record_count == 3)
+        manager.close()
+
+
+def test_flush_on_size():
+    """待写入的记录达到flush_size时不等间隔到期就写入"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = DataManager(os.path.join(work_dir, 'history.jsonl'),
+                              flush_interval=60, flush_size=5)
+        for index in range(4):
+            manager.save_wan_data(_data(index))
+        time.sleep(0.1)
+        assert manager.store.record_count == 0
+        manager.save_wan_data(_data(4))
+        assert _wait_for(lambda: manager.store.record_count == 5)
+        manager.close()
+
+
+def test_failed_write_is_retried_in_order():
+    """写入失败的记录放回队列，下次按原顺序写在新记录之前"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = DataManager(os.path.join(work_dir, 'history.jsonl'), flush_interval=60)
+        store_append = manager.store.append
+        calls = []
+
+        def failing_append(record):
+            calls.append(record)
+            if len(calls) == 3:
+                raise OSError('disk full')
+            return store_append(record)
+
+        manager.store.append = failing_append
+        for index in range(4):
+            manager.save_wan_data(_data(index))
+        assert not manager.flush()
+        assert manager.store.record_count == 2
+        assert len(manager._pending) == 2
+
+        manager.save_wan_data(_data(4))
+        assert manager.flush()
+        assert _ips(manager.store) == [f'10.0.0.{index}' for index in range(5)]
+        manager.close()
+
+
+def test_close_drains_pending_records():
+    """关闭时写完缓存中的记录，重新打开后可以读到"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'history.jsonl')
+        manager = DataManager(data_file, flush_interval=60)
+        for index in range(3):
+            manager.save_wan_data(_data(index), latency_ms=1.234)
+        assert manager.store.record_count == 0
+        manager.close()
+        assert not manager._flusher.running
+
+        reopened = DataManager(data_file, flush_interval=0)
+        history = reopened.load_wan_history(None)
+        assert _ips(history) == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+        assert history[0]['latency_ms'] == 1.23
+        reopened.close()
+
+
+def test_managers_share_flush_thread():
+    """多个数据管理器共用一个后台线程，关闭其中一个不影响其他的写入，全部关闭后线程退出"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        managers = [DataManager(os.path.join(work_dir, f'history_{index}.jsonl'),
+                                flush_interval=0.05, flush_size=100)
+                    for index in range(3)]
+        flusher = managers[0]._flusher
+        assert all(manager._flusher is flusher for manager in managers)
+        assert [thread.name for thread in threading.enumerate()].count('history-flush') == 1
+
+        managers[0].save_wan_data(_data(0))
+        managers[0].close()
+        assert managers[0].store.record_count == 1
+        assert flusher.running
+        for index, manager in enumerate(managers[1:]):
+            manager.save_wan_data(_data(index))
+        assert _wait_for(lambda: all(manager.store.record_count == 1 for manager in managers))
+
+        for manager in managers[1:]:
+            manager.close()
+        assert not flusher.running
+        assert 'history-flush' not in [thread.name for thread in threading.enumerate()]
+
+
+def test_synchronous_mode():
+    """flush_interval为0时每次保存都同步写入"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = DataManager(os.path.join(work_dir, 'history.jsonl'), flush_interval=0)
+        assert manager._flusher is None
+        assert manager.save_wan_data(_data(1))
+        assert manager.store.record_count == 1
+        manager.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+设备清单测试
+验证增量变化、原子保存，以及主机表查询出错时不丢失WAN采样
+"""
+import sys
+import os
+import json
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.monitor_service import RouterMonitorService
+from core.scheduler import PollScheduler
+from managers.device_inventory import DeviceChange, DeviceInventory
+from utils.config_manager import ConfigManager
+from router_simulator import RouterSimulator
+
+
+def test_changes_and_atomic_save():
+    """只输出增量变化，保存后不留下临时文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'devices.json')
+        inventory = DeviceInventory(data_file)
+        rows = [{'mac': 'AA-BB-CC-00-00-01', 'ip': '192.168.1.2', 'hostname': 'phone%20a'}]
+        changes = inventory.update(rows)
+        assert [c.kind for c in changes] == [DeviceChange.JOINED]
+        assert inventory.get_device('aa:bb:cc:00:00:01')['name'] == 'phone a'
+        assert inventory.update(rows) == []
+
+        rows[0]['ip'] = '192.168.1.3'
+        assert [c.kind for c in inventory.update(rows)] == [DeviceChange.IP_CHANGED]
+        assert [c.kind for c in inventory.update([])] == [DeviceChange.LEFT]
+
+        inventory.update(rows)
+        assert os.listdir(work_dir) == ['devices.json']
+        assert DeviceInventory(data_file).get_device('aa:bb:cc:00:00:01')['ip'] == '192.168.1.3'
+
+
+def test_host_table_error_keeps_wan_sample():
+    """主机表查询出错时仍然获取本轮WAN状态，并推迟下一次主机表查询"""
+    simulator = RouterSimulator(hosts_error=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            config_file = os.path.join(work_dir, 'router_config.json')
+            with open(config_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'host': simulator.address,
+                    'password': 'admin123',
+                    'data_dir': os.path.join(work_dir, 'data'),
+                    'hosts_file': os.path.join(work_dir, 'hosts'),
+                    'domains': ['example.com'],
+                    'inventory_enabled': True,
+                    'inventory_interval': 300,
+                    'git_enabled': False
+                }, f)
+            service = RouterMonitorService(ConfigManager(config_file))
+            try:
+                assert service._check_wan_status() == PollScheduler.OK
+                assert service.last_ip == simulator.ip
+                assert simulator.stats['errors'] == 1
+
+                # 清单周期未到，下一轮不再合并主机表
+                assert service._check_wan_status() == PollScheduler.OK
+                assert simulator.stats['errors'] == 1
+            finally:
+                service.event_bus.stop()
+                service.router.close()
+                service.data_manager.close()
+    finally:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
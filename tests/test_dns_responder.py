@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+内置DNS应答器测试
+验证本地应答、转发的客户端限制、TCP查询通过TCP转发、同时转发数上限以及舰队模式下域名冲突的优先顺序
+"""
+import sys
+import os
+import socket
+import struct
+import asyncio
+import logging
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.dns_responder import (DnsResponder, RCODE_NOERROR, RCODE_REFUSED, RCODE_SERVFAIL,
+                                build_query, parse_response)
+
+
+def _udp_query(port, name, query_id=1):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(3)
+        sock.sendto(build_query(name, query_id=query_id), ('127.0.0.1', port))
+        return parse_response(sock.recv(512))
+
+
+def _tcp_query(port, name, query_id=1):
+    query = build_query(name, query_id=query_id)
+    with socket.create_connection(('127.0.0.1', port), timeout=3) as sock:
+        sock.sendall(struct.pack('!H', len(query)) + query)
+        length = struct.unpack('!H', sock.recv(2))[0]
+        reply = b''
+        while len(reply) < length:
+            reply += sock.recv(length - len(reply))
+    return parse_response(reply)
+
+
+def test_defaults_listen_on_loopback():
+    """默认只监听本机，不使用mDNS端口"""
+    responder = DnsResponder.from_config({})
+    assert responder.listen == '127.0.0.1'
+    assert responder.port != 5353
+
+
+def test_local_answer_and_refuse():
+    """配置域名直接应答，未配置上游时其他域名拒绝"""
+    responder = DnsResponder('127.0.0.1', 0)
+    responder.update_records('default', '203.0.113.7', ['example.com'])
+    responder.start()
+    try:
+        assert _udp_query(responder.port, 'Example.COM') == (1, RCODE_NOERROR, ['203.0.113.7'])
+        assert _tcp_query(responder.port, 'example.com') == (1, RCODE_NOERROR, ['203.0.113.7'])
+        assert _udp_query(responder.port, 'other.org')[1] == RCODE_REFUSED
+    finally:
+        responder.stop()
+
+
+def test_forward_restricted_to_allowed_clients():
+    """不在允许列表中的客户端不能转发查询，但可以查询配置的域名"""
+    responder = DnsResponder('127.0.0.1', 0, upstream='127.0.0.1:53')
+    responder.update_records('default', '203.0.113.7', ['example.com'])
+
+    assert responder.resolve_local(build_query('other.org'), '192.168.1.20') == (None, True)
+    reply, forward = responder.resolve_local(build_query('other.org'), '8.8.8.8')
+    assert not forward and parse_response(reply)[1] == RCODE_REFUSED
+    reply, forward = responder.resolve_local(build_query('example.com'), '8.8.8.8')
+    assert not forward and parse_response(reply)[2] == ['203.0.113.7']
+    assert responder.may_forward('::ffff:10.0.0.5')
+
+
+def test_forward_udp_and_tcp():
+    """UDP查询通过UDP转发，TCP查询通过TCP转发"""
+    upstream = DnsResponder('127.0.0.1', 0)
+    upstream.update_records('default', '198.51.100.1', ['upstream.example.org'])
+    upstream.start()
+    responder = DnsResponder('127.0.0.1', 0, upstream=f'127.0.0.1:{upstream.port}')
+    responder.start()
+    try:
+        assert _udp_query(responder.port, 'upstream.example.org')[2] == ['198.51.100.1']
+        assert _tcp_query(responder.port, 'upstream.example.org')[2] == ['198.51.100.1']
+        assert responder.stats['forwarded'] == 2
+        # 上游收到的一个查询来自TCP连接
+        assert upstream.stats['queries'] == 2
+    finally:
+        responder.stop()
+        upstream.stop()
+
+
+def test_forward_limit():
+    """同时转发的查询达到上限后直接返回SERVFAIL"""
+    # 不应答的上游
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(('127.0.0.1', 0))
+    responder = DnsResponder('127.0.0.1', 0, upstream=f'127.0.0.1:{silent.getsockname()[1]}',
+                             forward_timeout=0.5, max_forwards=2)
+
+    async def run():
+        queries = [responder.handle(build_query('slow.example.org', query_id=index))
+                   for index in range(5)]
+        return await asyncio.gather(*queries)
+
+    try:
+        replies = asyncio.run(run())
+    finally:
+        silent.close()
+    assert all(parse_response(reply)[1] == RCODE_SERVFAIL for reply in replies)
+    assert responder.stats['forwarded'] == 2
+    assert responder.stats['overloaded'] == 3
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_fleet_precedence_independent_of_update_order():
+    """同一域名由多个路由器提供时按配置顺序决定，与更新先后无关，冲突变化时记录一次警告"""
+    handler = _Records()
+    logging.getLogger().addHandler(handler)
+    try:
+        for updates in (['home', 'office', 'lab'], ['lab', 'office', 'home']):
+            responder = DnsResponder('127.0.0.1', 0, source_order=['home', 'office'])
+            addresses = {'home': '10.0.0.1', 'office': '10.0.1.1', 'lab': '10.0.2.1'}
+            for source in updates:
+                responder.update_records(source, addresses[source], ['shared.com', f'{source}.com'])
+            assert responder.lookup('shared.com') == '10.0.0.1'
+            assert responder.lookup('lab.com') == '10.0.2.1'
+
+        handler.messages.clear()
+        responder.update_records('home', '10.0.0.2', ['shared.com'])
+        assert handler.messages == []
+        responder.update_records('home', '10.0.0.2', [])
+        assert responder.lookup('shared.com') == '10.0.1.1'
+        assert len(handler.messages) == 1 and 'office, lab' in handler.messages[0]
+        # 未列出的来源按名称排序
+        responder.update_records('alpha', '10.0.3.1', ['lab.com'])
+        assert responder.lookup('lab.com') == '10.0.3.1'
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
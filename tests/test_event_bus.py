@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+事件总线测试
+验证队列满时的丢弃策略、不可丢弃的事件类型以及处理函数卡住时的停止超时
+"""
+import sys
+import os
+import threading
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.event_bus import EventBus, IpChanged, WanSampled
+
+
+def _blocked_bus(keep=()):
+    """处理函数卡住的总线，返回 (总线, 放行事件, 已处理的事件)"""
+    release = threading.Event()
+    started = threading.Event()
+    handled = []
+
+    def handler(event):
+        started.set()
+        release.wait()
+        handled.append(event)
+
+    bus = EventBus(default_maxsize=3)
+    bus.subscribe('storage', handler, (WanSampled, IpChanged), keep=keep)
+    # 第一个事件被工作线程取走后卡住，队列保持为空
+    bus.publish(WanSampled(0))
+    assert started.wait(1)
+    return bus, release, handled
+
+
+def test_drop_oldest_when_full():
+    """队列满时丢弃最旧的事件"""
+    bus, release, handled = _blocked_bus()
+    for index in range(1, 6):
+        bus.publish(WanSampled(index))
+    assert bus.get_stats()['storage']['dropped'] == 2
+    release.set()
+    bus.stop(timeout=1)
+    assert [event.sample for event in handled] == [0, 3, 4, 5]
+
+
+def test_kept_events_are_not_dropped():
+    """IP变化事件不会被后续的采样事件挤掉"""
+    bus, release, handled = _blocked_bus(keep=(IpChanged,))
+    bus.publish(IpChanged('10.0.0.1', '10.0.0.2'))
+    for index in range(1, 10):
+        bus.publish(WanSampled(index))
+    release.set()
+    bus.stop(timeout=1)
+    assert any(isinstance(event, IpChanged) for event in handled)
+    assert [event.sample for event in handled if isinstance(event, WanSampled)] == [0, 8, 9]
+
+
+def test_stop_does_not_hang_when_handler_stuck():
+    """处理函数卡住且队列已满时，stop在超时后返回"""
+    bus, release, _ = _blocked_bus()
+    for index in range(1, 4):
+        bus.publish(WanSampled(index))
+    started = time.monotonic()
+    bus.stop(timeout=0.2)
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+文件工具测试
+验证原子写入的内容、新文件的默认权限以及保留已有文件的权限
+"""
+import sys
+import os
+import stat
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.file_utils import atomic_write
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def test_new_file_uses_default_mode():
+    """新文件按umask使用普通文件的默认权限，而不是临时文件的0600"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        target = os.path.join(work_dir, 'sub', 'hosts')
+        atomic_write(target, b'127.0.0.1 localhost\n')
+        with open(target, 'rb') as f:
+            assert f.read() == b'127.0.0.1 localhost\n'
+        assert stat.S_IMODE(os.stat(target).st_mode) == 0o666 & ~_umask()
+        assert os.listdir(os.path.dirname(target)) == ['hosts']
+
+
+def test_existing_file_keeps_mode():
+    """替换已有文件时保留原文件的权限"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        target = os.path.join(work_dir, 'router_config.json')
+        atomic_write(target, b'{}')
+        os.chmod(target, 0o640)
+        atomic_write(target, b'{"password": "secret"}')
+        assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+        with open(target, 'rb') as f:
+            assert f.read() == b'{"password": "secret"}'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+舰队监控服务测试
+验证轮询线程池被占满时stok刷新仍在单独的线程池中按时执行，以及各路由器共用后台写入线程和Git管理器
+"""
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.fleet_service import FleetMonitorService
+from core.scheduler import PollScheduler
+from managers import hosts_manager
+from utils.config_manager import ConfigManager
+
+
+def _fleet(work_dir, **options):
+    config = {
+        'password': 'admin123',
+        'poll_interval': 0.1,
+        'hosts_enabled': False,
+        'data_dir': os.path.join(work_dir, 'data'),
+        'routers': [
+            {'name': 'a', 'host': '127.0.0.1:9'},
+            {'name': 'b', 'host': '127.0.0.1:9'}
+        ]
+    }
+    config.update(options)
+    config_file = os.path.join(work_dir, 'router_config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return FleetMonitorService(ConfigManager(config_file))
+
+
+def _close(fleet):
+    fleet.executor.shutdown(wait=True)
+    fleet.refresh_executor.shutdown(wait=True)
+    fleet.event_bus.stop()
+    for site in fleet.sites:
+        site.data_manager.close()
+        site.router.close()
+
+
+def test_refresh_not_blocked_by_polling():
+    """轮询占满线程池时两台路由器的stok仍在刷新线程池中刷新，之后轮询继续并发进行"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        fleet = _fleet(work_dir, fleet_workers=1)
+        refreshed = {}
+        polls = []
+        all_refreshed = threading.Event()
+        lock = threading.Lock()
+
+        def make_poll(site):
+            def poll():
+                with lock:
+                    polls.append((site.name, threading.current_thread().name))
+                if site.name == 'a' and len(polls) == 1:
+                    # 第一次轮询卡住，占用唯一的轮询线程
+                    all_refreshed.wait(5)
+                return PollScheduler.OK
+            return poll
+
+        def make_refresh(site):
+            def maybe_refresh():
+                with lock:
+                    refreshed[site.name] = (threading.current_thread().name, len(polls))
+                    if len(refreshed) == len(fleet.sites):
+                        all_refreshed.set()
+                return True
+            return maybe_refresh
+
+        for site in fleet.sites:
+            site._check_wan_status = make_poll(site)
+            site.session_manager.maybe_refresh = make_refresh(site)
+            # a的第一次轮询开始后到达刷新时间
+            site.session_manager.seconds_until_refresh = (
+                lambda name=site.name: None if name in refreshed else 0.0 if polls else 0.02)
+            site.scheduler.advance = lambda outcome: 0.01
+
+        async def run():
+            try:
+                await asyncio.wait_for(fleet._run(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            asyncio.run(run())
+        finally:
+            all_refreshed.set()
+            _close(fleet)
+
+        assert sorted(refreshed) == ['a', 'b']
+        # 刷新时只有a的第一次轮询在执行（仍卡住），b的轮询还在排队
+        assert all(thread.startswith('fleet-refresh') and poll_count == 1
+                   for thread, poll_count in refreshed.values())
+        assert all(thread.startswith('fleet_') for _, thread in polls)
+        names = [name for name, _ in polls]
+        assert names.count('a') > 1 and names.count('b') > 1
+
+
+class _Subprocess:
+    """记录执行的git命令，不实际执行"""
+
+    def __init__(self):
+        self.commands = []
+
+    def run(self, command, **kwargs):
+        self.commands.append(command)
+        return SimpleNamespace(returncode=0, stdout='', stderr='')
+
+
+def test_sites_share_process_resources():
+    """各路由器共用一个后台写入线程和Git管理器，git config只执行一次"""
+    recorder = _Subprocess()
+    original = hosts_manager.subprocess
+    shared = dict(hosts_manager._shared_git_managers)
+    hosts_manager.subprocess = recorder
+    hosts_manager._shared_git_managers.clear()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            fleet = _fleet(work_dir, git_enabled=True, fleet_workers=2)
+            try:
+                first, second = fleet.sites
+                assert first.data_manager._flusher is second.data_manager._flusher
+                assert [thread.name for thread in threading.enumerate()].count('history-flush') == 1
+                assert first.git_manager is second.git_manager
+                assert [command[1:3] for command in recorder.commands if command[1] == 'config'] == \
+                    [['config', 'user.name'], ['config', 'user.email']]
+                assert fleet.refresh_executor is not fleet.executor
+            finally:
+                _close(fleet)
+    finally:
+        hosts_manager.subprocess = original
+        hosts_manager._shared_git_managers.clear()
+        hosts_manager._shared_git_managers.update(shared)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+历史数据分析测试
+验证P²分位数估计的精度、可用率和IP租期统计，以及分析命令只读打开历史数据
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.data_manager import DataManager
+from utils.history_analytics import HistoryAnalyzer, P2Quantile
+
+
+def _exact(values, p):
+    values = sorted(values)
+    return values[round(p * (len(values) - 1))]
+
+
+def test_p2_close_to_exact_percentiles():
+    """P²估计与精确分位数的相对误差在几个百分点以内"""
+    rng = random.Random(42)
+    for values in ([rng.uniform(0, 100) for _ in range(20000)],
+                   [rng.expovariate(1 / 30) for _ in range(20000)]):
+        for p in (0.5, 0.9, 0.99):
+            quantile = P2Quantile(p)
+            for value in values:
+                quantile.add(value)
+            exact = _exact(values, p)
+            assert abs(quantile.value() - exact) / exact < 0.03, (p, quantile.value(), exact)
+
+
+def test_p2_small_counts():
+    """少于5个观测值时取精确分位数"""
+    quantile = P2Quantile(0.5)
+    assert quantile.value() is None
+    for value in (5, 1, 3):
+        quantile.add(value)
+    assert quantile.value() == 3
+
+
+def _record(ts, ip, up=True, latency=10.0):
+    return {'timestamp': ts.isoformat(), 'latency_ms': latency,
+            'data': {'network': {'wan_status': {'ipaddr': ip, 'up': up}}}}
+
+
+def test_availability_and_leases():
+    """按时长统计可用率，跳过数据缺失的间隔；历史开始时的租期不参与统计"""
+    start = datetime(2024, 1, 1)
+    minute = timedelta(minutes=1)
+    records = [_record(start + minute * index, '10.0.0.1') for index in range(10)]
+    # 离线2分钟
+    records += [_record(start + minute * index, '0.0.0.0', up=False) for index in (10, 11)]
+    records += [_record(start + minute * index, '10.0.0.2') for index in range(12, 20)]
+    # 程序停止运行约1小时
+    records += [_record(start + minute * (80 + index), '10.0.0.3') for index in range(5)]
+
+    analyzer = HistoryAnalyzer(gap_threshold=300)
+    for record in records:
+        analyzer.add_record(record)
+    report = analyzer.report(include_logins=False)
+
+    availability = report['availability']
+    assert availability['outages'] == 1
+    assert availability['longest_outage_seconds'] == 120
+    assert availability['down_seconds'] == 120
+    assert availability['gap_seconds'] == 61 * 60
+    # 离线前的最后一个间隔按上一条采样计为在线
+    assert availability['up_seconds'] == (10 + 7 + 4) * 60
+
+    assert report['ip']['current'] == '10.0.0.3'
+    assert report['ip']['changes'] == 2
+    # 只有 10.0.0.2 的完整租期：第12分钟到第80分钟
+    assert report['ip']['leases_seconds']['count'] == 1
+    assert report['ip']['leases_seconds']['median'] == 68 * 60
+    assert report['logins'] is None
+    assert report['latency_ms']['p50'] == 10.0
+
+
+def test_read_only_history():
+    """只读打开时历史数据不存在则报错，不创建任何文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        for backend in ('jsonl', 'sqlite', 'ring', 'segments'):
+            config = {'data_dir': data_dir, 'history_backend': backend}
+            try:
+                DataManager.from_config(config, read_only=True)
+                assert False, f"{backend}: 历史数据不存在时应抛出 FileNotFoundError"
+            except FileNotFoundError:
+                pass
+        assert not os.path.exists(data_dir)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
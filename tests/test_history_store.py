@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+JSON Lines历史存储测试
+验证差异编码的还原、关键帧间隔、尾部读取、写入失败后重试以及压缩后仍能还原
+"""
+import sys
+import os
+import copy
+import json
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.history_store import JsonlHistoryStore, apply_delta, diff_payload
+
+
+def _record(index):
+    wan_status = {'ipaddr': f'10.0.0.{index // 3}', 'proto': 'pppoe', 'up_time': index}
+    if index % 4:
+        wan_status['pri_dns'] = '114.114.114.114'
+    return {'timestamp': f'2024-01-01T00:{index // 60:02d}:{index % 60:02d}',
+            'data': {'network': {'wan_status': wan_status}, 'error_code': 0}}
+
+
+def _raw_lines(data_file):
+    with open(data_file, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_diff_round_trip():
+    """差异包含修改、新增和删除的字段，应用后得到新数据且不改动原数据"""
+    old = {'a': 1, 'b': {'c': 2, 'd': 3, 'e': {'f': 4}}, 'g': [1, 2]}
+    new = {'a': 1, 'b': {'c': 5, 'e': {'f': 4, 'h': True}}, 'g': [1, 2, 3], 'i': None}
+    snapshot = copy.deepcopy(old)
+    delta = diff_payload(old, new)
+    assert 'a' not in delta['set']
+    assert delta['del'] == [['b', 'd']]
+    assert apply_delta(old, delta) == new
+    assert old == snapshot
+    assert diff_payload(new, new) == {}
+    # 类型不同的相等值（1 与 True）也视为变化
+    assert apply_delta({'x': 1}, diff_payload({'x': 1}, {'x': True})) == {'x': True}
+
+
+def test_keyframes_and_rebuild():
+    """每隔keyframe_interval条写一次完整数据，读取时还原为原始记录"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'history.jsonl')
+        store = JsonlHistoryStore(data_file, max_records=None, keyframe_interval=5)
+        records = [_record(index) for index in range(23)]
+        for record in records:
+            store.append(record)
+
+        raw = _raw_lines(data_file)
+        assert [index for index, line in enumerate(raw) if 'data' in line] == [0, 5, 10, 15, 20]
+        assert list(store) == records
+        assert store.tail(7) == records[-7:]
+        assert store.tail(1) == records[-1:]
+        store.close()
+
+        # 重新打开后的第一条记录总是关键帧
+        reopened = JsonlHistoryStore(data_file, max_records=None, keyframe_interval=5)
+        assert reopened.record_count == 23
+        reopened.append(_record(23))
+        assert 'data' in _raw_lines(data_file)[-1]
+        assert list(reopened)[-1] == _record(23)
+        reopened.close()
+
+
+class _FailingFile:
+    """第一次写入失败的文件"""
+
+    def __init__(self, f):
+        self.f = f
+        self.failed = False
+
+    def write(self, data):
+        if not self.failed:
+            self.failed = True
+            raise OSError('disk full')
+        return self.f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def test_failed_write_retry_keeps_history_intact():
+    """写入失败后重试同一条记录，差异仍以已写入的数据为基准"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'history.jsonl')
+        store = JsonlHistoryStore(data_file, max_records=None, keyframe_interval=5)
+        records = [_record(index) for index in range(8)]
+        for record in records[:3]:
+            store.append(record)
+
+        store._file = _FailingFile(store._open())
+        try:
+            store.append(records[3])
+            assert False, "写入失败时应抛出异常"
+        except OSError:
+            pass
+        for record in records[3:]:
+            store.append(record)
+
+        assert list(store) == records
+        # 关键帧间隔按实际写入的记录计算
+        raw = _raw_lines(data_file)
+        assert [index for index, line in enumerate(raw) if 'data' in line] == [0, 5]
+        store.close()
+
+
+def test_compact_keeps_latest_records():
+    """压缩只保留最新的记录，保留部分的第一条改写为关键帧"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'history.jsonl')
+        store = JsonlHistoryStore(data_file, max_records=10, compact_slack=0.1,
+                                  keyframe_interval=4)
+        records = [_record(index) for index in range(12)]
+        for record in records:
+            store.append(record)
+
+        deadline = time.monotonic() + 5
+        while store._compacting and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not store._compacting
+        assert store.record_count == 10
+        assert 'data' in _raw_lines(data_file)[0]
+        assert list(store) == records[-10:]
+        store.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+hosts文件写入测试
+验证更新时保留静态前缀、条目未变化时不重写文件，以及原子替换后保留已有文件的权限
+"""
+import sys
+import os
+import stat
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from managers.hosts_manager import DYNAMIC_MARKER, HostsManager
+
+STATIC_PREFIX = ("# 本机条目，手工维护\n"
+                 "127.0.0.1    localhost\n"
+                 "192.168.1.10 nas.lan nas\n\n")
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def test_static_prefix_preserved():
+    """动态部分标记之前的内容原样保留，没有标记时追加在文件末尾"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'hosts')
+        _write(path, STATIC_PREFIX + DYNAMIC_MARKER + "10.0.0.1    old.example.com\n")
+        manager = HostsManager(path)
+        assert manager.update_hosts_file('10.0.0.2', ['example.com'])
+        content = _read(path)
+        assert content.startswith(STATIC_PREFIX + DYNAMIC_MARKER)
+        assert 'old.example.com' not in content
+        assert manager.lookup('example.com') == '10.0.0.2'
+
+        # 外部修改静态前缀后，下次更新使用新的前缀
+        edited = content.replace('nas.lan nas', 'nas.lan nas files.lan')
+        _write(path, edited)
+        assert manager.update_hosts_file('10.0.0.3', ['example.com'])
+        assert _read(path).startswith(edited[:edited.index(DYNAMIC_MARKER)] + DYNAMIC_MARKER)
+
+        plain = os.path.join(work_dir, 'plain_hosts')
+        _write(plain, STATIC_PREFIX.rstrip('\n'))
+        assert HostsManager(plain).update_hosts_file('10.0.0.2', ['example.com'])
+        assert _read(plain).startswith(STATIC_PREFIX.rstrip('\n') + '\n\n' + DYNAMIC_MARKER)
+        assert sorted(os.listdir(work_dir)) == ['hosts', 'plain_hosts']
+
+
+def test_unchanged_entries_not_rewritten():
+    """条目未变化时不写文件（包括重启后的第一次更新），更新时间行不参与比较"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'hosts')
+        _write(path, STATIC_PREFIX + DYNAMIC_MARKER)
+        manager = HostsManager(path)
+        assert manager.update_hosts_file('10.0.0.2', ['example.com', 'www.example.com'])
+        before = os.stat(path)
+        content = _read(path)
+
+        assert not manager.update_hosts_file('10.0.0.2', ['example.com', 'www.example.com'])
+        restarted = HostsManager(path)
+        assert not restarted.update_hosts_file('10.0.0.2', ['example.com', 'www.example.com'])
+        after = os.stat(path)
+        assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+        assert _read(path) == content
+        assert restarted.current_ip == '10.0.0.2'
+
+        assert restarted.update_hosts_file('10.0.0.3', ['example.com', 'www.example.com'])
+        assert os.stat(path).st_ino != before.st_ino
+
+
+def test_existing_permissions_kept():
+    """原子替换后保留已有文件的权限，新建的文件按umask设置权限"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'hosts')
+        _write(path, STATIC_PREFIX + DYNAMIC_MARKER)
+        for mode in (0o644, 0o640, 0o664):
+            os.chmod(path, mode)
+            manager = HostsManager(path)
+            assert manager.update_hosts_file(f'10.0.0.{mode % 200}', ['example.com'])
+            assert stat.S_IMODE(os.stat(path).st_mode) == mode
+
+        created = os.path.join(work_dir, 'new_hosts')
+        assert HostsManager(created).update_hosts_file('10.0.0.2', ['example.com'])
+        umask = os.umask(0)
+        os.umask(umask)
+        assert stat.S_IMODE(os.stat(created).st_mode) == 0o666 & ~umask
+        assert 'localhost' in _read(created)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+hosts条目模型测试
+验证按组设置、静态覆盖优先、被覆盖条目的生成与解析，以及hosts文件按组读取IP
+"""
+import sys
+import os
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from managers.hosts_manager import HostsManager
+from managers.hosts_table import DEFAULT_GROUP, SHADOWED_PREFIX, STATIC_GROUP, HostsTable
+
+
+def test_set_group_and_indexes():
+    """按域名和按IP查询，只返回生效IP变化的域名"""
+    table = HostsTable()
+    assert table.set_group(DEFAULT_GROUP, '10.0.0.1', ['a.com', 'b.com']) == {'a.com', 'b.com'}
+    assert table.lookup('a.com') == '10.0.0.1'
+    assert sorted(table.domains_for('10.0.0.1')) == ['a.com', 'b.com']
+
+    assert table.set_group(DEFAULT_GROUP, '10.0.0.1', ['a.com', 'b.com']) == set()
+    assert table.set_group(DEFAULT_GROUP, '10.0.0.2', ['a.com']) == {'a.com', 'b.com'}
+    assert table.lookup('b.com') is None
+    assert table.domains_for('10.0.0.1') == []
+    assert table.group_ip(DEFAULT_GROUP) == '10.0.0.2'
+    assert len(table) == 1
+
+
+def test_static_overrides_take_precedence():
+    """静态覆盖优先，其次是先加入的组；删除覆盖后恢复"""
+    table = HostsTable()
+    table.set_group('home', '10.0.0.1', ['a.com', 'b.com'])
+    table.set_group('office', '10.0.1.1', ['b.com', 'c.com'])
+    assert table.lookup('b.com') == '10.0.0.1'
+    assert table.owner('b.com') == 'home'
+
+    assert table.set_group_entries(STATIC_GROUP, {'a.com': '192.168.1.10'}) == {'a.com'}
+    assert table.lookup('a.com') == '192.168.1.10'
+    # 静态覆盖不是路由器的IP
+    assert table.group_ip(STATIC_GROUP) is None
+
+    assert table.remove_group(STATIC_GROUP) == {'a.com'}
+    assert table.lookup('a.com') == '10.0.0.1'
+    assert table.remove_group('home') == {'a.com', 'b.com'}
+    assert table.lookup('b.com') == '10.0.1.1'
+
+
+def test_render_parse_round_trip_with_shadowed_group():
+    """全部条目被覆盖的组保留组标记，解析后组的IP和域名不丢失"""
+    table = HostsTable()
+    table.set_group(DEFAULT_GROUP, '10.0.0.1', ['a.com', 'b.com'])
+    table.set_group('office', '10.0.1.1', ['b.com'])
+    text = table.render()
+    assert '# group: office\n' in text
+    assert f'{SHADOWED_PREFIX}10.0.1.1    b.com\n' in text
+
+    parsed = HostsTable.parse(text)
+    assert parsed.groups == [DEFAULT_GROUP, 'office']
+    assert parsed.group_ip('office') == '10.0.1.1'
+    assert parsed.lookup('b.com') == '10.0.0.1'
+    assert parsed.render() == text
+
+
+def test_render_only_changed_groups():
+    """只重新生成有变化的组"""
+    table = HostsTable()
+    table.set_group(DEFAULT_GROUP, '10.0.0.1', ['a.com'])
+    table.set_group('office', '10.0.1.1', ['c.com'])
+    table.render()
+    cached = table._rendered['office']
+    table.set_group(DEFAULT_GROUP, '10.0.0.2', ['a.com'])
+    assert DEFAULT_GROUP not in table._rendered
+    assert table._rendered['office'] is cached
+    assert '10.0.0.2    a.com' in table.render()
+
+
+def test_manager_group_ip_and_skip_unchanged():
+    """按组读取IP，没有该组时不使用其他组的IP；条目未变化时不写文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        hosts_file = os.path.join(work_dir, 'hosts')
+        manager = HostsManager(hosts_file, overrides={'b.com': '192.168.1.10'})
+        assert manager.get_current_ip_from_hosts() is None
+        assert manager.update_hosts_file('10.0.0.1', ['a.com'], group='home')
+        assert not manager.update_hosts_file('10.0.0.1', ['a.com'], group='home')
+        assert manager.update_hosts_file('10.0.1.1', ['b.com'], group='office')
+
+        # 新的管理器从文件中读取
+        reader = HostsManager(hosts_file)
+        assert reader.get_current_ip_from_hosts('home') == '10.0.0.1'
+        assert reader.get_current_ip_from_hosts('office') == '10.0.1.1'
+        assert reader.get_current_ip_from_hosts(DEFAULT_GROUP) is None
+        assert manager.lookup('b.com') == '192.168.1.10'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
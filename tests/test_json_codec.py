@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+JSON编解码测试
+分别加载orjson后端和标准库后端，验证字节与字符串输入、紧凑和缩进输出在两个后端下一致
+"""
+import sys
+import os
+import io
+import importlib.util
+
+# 添加src目录到Python路径
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+SAMPLE = {'host': '路由器', 'ports': [80, 443], 'ratio': 0.5, 'up': True, 'dns': None,
+          'nested': {'empty': {}, 'list': []}}
+
+
+def _load_codec(with_orjson: bool):
+    """加载一份独立的json_codec模块，with_orjson为False时屏蔽orjson"""
+    saved = sys.modules.get('orjson')
+    if not with_orjson:
+        sys.modules['orjson'] = None
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f'json_codec_{with_orjson}', os.path.join(SRC_DIR, 'utils', 'json_codec.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        if saved is not None:
+            sys.modules['orjson'] = saved
+        else:
+            sys.modules.pop('orjson', None)
+
+
+def _codecs():
+    codecs = [_load_codec(False)]
+    try:
+        import orjson  # noqa: F401
+        codecs.append(_load_codec(True))
+    except ImportError:
+        pass
+    return codecs
+
+
+def test_fallback_backend():
+    """屏蔽orjson时回退到标准库"""
+    assert _load_codec(False).BACKEND == 'json'
+
+
+def test_loads_accepts_bytes_and_str():
+    """字节、bytearray、memoryview和字符串输入得到相同结果"""
+    text = '{"host": "路由器", "ports": [80, 443]}'
+    raw = text.encode('utf-8')
+    for codec in _codecs():
+        for data in (text, raw, bytearray(raw), memoryview(raw)):
+            assert codec.loads(data) == {'host': '路由器', 'ports': [80, 443]}, \
+                (codec.BACKEND, type(data))
+        assert codec.load(io.BytesIO(raw))['host'] == '路由器'
+
+
+def test_dumps_output_matches_between_backends():
+    """紧凑和缩进输出在两个后端下逐字节一致，非ASCII字符不转义"""
+    outputs = {}
+    for codec in _codecs():
+        compact = codec.dumps_bytes(SAMPLE)
+        pretty = codec.dumps_bytes(SAMPLE, pretty=True)
+        assert isinstance(compact, bytes) and isinstance(codec.dumps(SAMPLE), str)
+        assert codec.dumps(SAMPLE).encode('utf-8') == compact
+        assert '路由器'.encode('utf-8') in compact
+        assert b'\n  "ports": [\n    80,' in pretty
+        assert codec.loads(compact) == SAMPLE and codec.loads(pretty) == SAMPLE
+        out = io.BytesIO()
+        codec.dump(SAMPLE, out, pretty=True)
+        assert out.getvalue() == pretty
+        outputs[codec.BACKEND] = (compact, pretty)
+    if len(outputs) == 2:
+        assert outputs['json'] == outputs['orjson']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+WAN采样模型测试
+验证真实路由器响应的解析（没有up字段）、地址的整数表示以及还原为历史记录
+"""
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.models import WanSample
+from utils.net_utils import int_to_ip, ip_to_int, wan_is_up
+
+# 真实路由器返回的WAN状态：有link_status、up_time，没有up字段
+REAL_PAYLOAD = {
+    'network': {'wan_status': {
+        'proto': 'pppoe', 'ipaddr': '100.64.12.34', 'netmask': '255.255.255.255',
+        'gateway': '100.64.0.1', 'pri_dns': '114.114.114.114', 'snd_dns': '0.0.0.0',
+        'link_status': 1, 'up_time': 86400, 'error_code': 0
+    }},
+    'error_code': 0
+}
+
+
+def test_ip_helpers_round_trip():
+    """IPv4地址与整数互相转换，无效地址为0"""
+    for ip in ('0.0.0.1', '10.0.0.1', '192.168.1.254', '255.255.255.255'):
+        assert int_to_ip(ip_to_int(ip)) == ip
+    assert ip_to_int('10.0.0.1') == 0x0A000001
+    assert ip_to_int(None) == 0
+    assert ip_to_int('not an ip') == 0
+    assert int_to_ip(0) is None
+
+
+def test_wan_is_up_without_up_field():
+    """没有up字段时按是否有IP判断，有up字段时以up为准"""
+    assert wan_is_up(REAL_PAYLOAD['network']['wan_status'])
+    assert not wan_is_up({'ipaddr': '0.0.0.0', 'link_status': 0})
+    assert not wan_is_up({'ipaddr': ''})
+    assert not wan_is_up(None)
+    assert not wan_is_up({'ipaddr': '10.0.0.1', 'up': False})
+    assert wan_is_up({'up': 1})
+
+
+def test_from_real_payload():
+    """解析真实响应：地址以整数保存，0.0.0.0的DNS被忽略，在线状态按IP推断"""
+    sample = WanSample.from_payload(REAL_PAYLOAD, latency_ms=12.5, timestamp=1700000000)
+    assert sample.ip_address == '100.64.12.34'
+    assert sample.gateway_address == '100.64.0.1'
+    assert sample.dns_servers == ('114.114.114.114',)
+    assert sample.proto == 'pppoe'
+    assert sample.up is True
+    assert not sample.has_payload
+
+    offline = WanSample.from_payload({'network': {'wan_status': {
+        'proto': 'dhcp', 'ipaddr': '0.0.0.0', 'link_status': 0}}, 'error_code': 0})
+    assert offline.ip_address is None
+    assert offline.up is False
+
+
+def test_to_record():
+    """未保留原始响应时按已解析的字段还原，保留时原样输出"""
+    sample = WanSample.from_payload(REAL_PAYLOAD, latency_ms=12.345, timestamp=1700000000)
+    record = sample.to_record()
+    wan_status = record['data']['network']['wan_status']
+    assert wan_status == {'proto': 'pppoe', 'ipaddr': '100.64.12.34', 'up': True,
+                          'gateway': '100.64.0.1', 'pri_dns': '114.114.114.114'}
+    assert record['latency_ms'] == 12.35
+
+    kept = WanSample.from_payload(REAL_PAYLOAD, keep_payload=True, timestamp=1700000000)
+    assert kept.to_record()['data'] is REAL_PAYLOAD
+    assert 'latency_ms' not in kept.to_record()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
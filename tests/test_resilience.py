@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+请求预算与熔断测试
+验证 Deadline 推导超时、CircuitBreaker 状态转换，以及熔断或超出预算时不会重新登录
+"""
+import sys
+import os
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.ds_query import DsQuery, DsResult
+from core.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded
+from core.router_monitor import RouterMonitor
+from core.session_manager import StokSessionManager
+
+
+def test_deadline_caps_timeouts():
+    """超时不超过剩余预算，预算用完后抛出 DeadlineExceeded"""
+    deadline = Deadline(0.5)
+    connect, read = deadline.timeouts(3, 10)
+    assert 0 < connect <= 0.5 and 0 < read <= 0.5
+    assert Deadline(100).timeouts(3, 10) == (3, 10)
+
+    expired = Deadline(0)
+    assert expired.expired
+    try:
+        expired.timeouts(3, 10)
+        assert False, "预算用完后应抛出 DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+
+
+def test_breaker_opens_after_threshold():
+    """连续失败达到阈值后打开，打开期间拒绝请求"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    assert breaker.before_request() == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        breaker.before_request()
+        assert False, "熔断器打开时应拒绝请求"
+    except CircuitOpenError:
+        pass
+    assert breaker.get_stats()['rejected'] == 1
+
+
+def test_breaker_half_open_probe():
+    """冷却后半开；探测失败时冷却时间加倍，成功时关闭"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, max_reset_timeout=0.04)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.before_request() == CircuitBreaker.HALF_OPEN
+    # 半开期间只允许一个探测
+    try:
+        breaker.before_request()
+        assert False, "半开期间应拒绝其他请求"
+    except CircuitOpenError:
+        pass
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.reset_timeout == 0.02
+
+    time.sleep(0.03)
+    assert breaker.before_request() == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.reset_timeout == 0.01
+
+
+class _UnavailableRouter:
+    """熔断中的路由器：查询抛出异常，记录登录次数"""
+
+    def __init__(self, error):
+        self.error = error
+        self.logins = 0
+
+    def execute_query(self, query, stok, deadline=None):
+        raise self.error
+
+    def login(self, encrypt_password=None, deadline=None):
+        self.logins += 1
+        raise self.error
+
+    def encrypt_pwd(self, password):
+        return 'encrypted'
+
+
+def test_session_does_not_relogin_when_router_unavailable():
+    """熔断或超出预算时查询直接失败，不重新登录，也不记为登录失败"""
+    for error in (CircuitOpenError('open'), DeadlineExceeded('late')):
+        router = _UnavailableRouter(error)
+        login_events = []
+        session = StokSessionManager(router, {'stok': 'saved', 'password': 'p'},
+                                     login_listener=lambda ok, reason: login_events.append(ok))
+        try:
+            session.query(DsQuery())
+            assert False, "应抛出路由器不可用的异常"
+        except type(error):
+            pass
+        assert router.logins == 0
+
+        # 没有stok时需要登录，登录请求被熔断也不记为登录失败
+        session = StokSessionManager(router, {'password': 'p'},
+                                     login_listener=lambda ok, reason: login_events.append(ok))
+        try:
+            session.query(DsQuery())
+            assert False, "应抛出路由器不可用的异常"
+        except type(error):
+            pass
+        assert session.stats['login_failures'] == 0
+        assert login_events == []
+
+
+def test_router_execute_query_propagates_circuit_open():
+    """熔断时 execute_query 抛出异常而不是返回None（None会被当作stok失效）"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    router = RouterMonitor('127.0.0.1:9', breaker=breaker)
+    config = {'stok': 'saved', 'encrypt_password': 'encrypted'}
+    try:
+        router.get_with_auth(config, router.wan_status_query())
+        assert False, "熔断时应抛出 CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert config['stok'] == 'saved'
+    assert router.get_wan_status_with_auth(config) is None
+    router.close()
+
+
+def test_ds_result_stok_expired():
+    """error_code -40401 表示stok失效"""
+    assert DsResult({'error_code': -40401}).stok_expired
+    assert not DsResult({'error_code': 0}).stok_expired
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
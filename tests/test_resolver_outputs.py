@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+解析器输出测试
+验证区域文件的SOA序列号同一天内递增并能从已有文件恢复、区域内NS的glue记录、过滤区域外的域名，
+以及舰队模式下输出文件名加上路由器名称后缀
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from managers import resolver_outputs
+from managers.resolver_outputs import DnsmasqTarget, JsonTarget, ResolverOutputs, ZoneTarget
+
+
+class _FixedDatetime(datetime):
+    """固定当前时间，使序列号与测试运行的日期无关"""
+
+    current = datetime(2024, 3, 5, 12, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def _with_fixed_date(test):
+    def wrapper():
+        original = resolver_outputs.datetime
+        resolver_outputs.datetime = _FixedDatetime
+        try:
+            test()
+        finally:
+            resolver_outputs.datetime = original
+    wrapper.__name__ = test.__name__
+    wrapper.__doc__ = test.__doc__
+    return wrapper
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _records(content):
+    """区域文件中的A记录"""
+    return [line.split('\t') for line in content.splitlines() if '\tIN\tA\t' in line]
+
+
+@_with_fixed_date
+def test_zone_serial_increments_within_day():
+    """同一天内每次变化序列号加一，内容不变时不重写，次日从新日期开始"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'example.com.zone')
+        target = ZoneTarget(path, 'example.com')
+        assert target.update('1.1.1.1', ['www.example.com'])
+        assert target.serial == 2024030500
+        assert '2024030500 ; serial' in _read(path)
+
+        assert target.update('1.1.1.2', ['www.example.com'])
+        assert target.serial == 2024030501
+        # 输入变化但生成的记录相同时不重写
+        assert not target.update('1.1.1.2', ['www.example.com', 'other.org'])
+        assert target.serial == 2024030501
+
+        _FixedDatetime.current = datetime(2024, 3, 6, 0, 1)
+        try:
+            assert target.update('1.1.1.3', ['www.example.com'])
+            assert target.serial == 2024030600
+        finally:
+            _FixedDatetime.current = datetime(2024, 3, 5, 12, 0)
+
+
+@_with_fixed_date
+def test_zone_serial_recovered_from_existing_file():
+    """重启后从已有文件读取序列号，记录相同时不重写，变化时在其基础上递增"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'example.com.zone')
+        target = ZoneTarget(path, 'example.com')
+        target.update('1.1.1.1', ['www.example.com'])
+        target.update('1.1.1.2', ['www.example.com'])
+        target.update('1.1.1.3', ['www.example.com'])
+        content = _read(path)
+
+        restarted = ZoneTarget(path, 'example.com')
+        assert not restarted.update('1.1.1.3', ['www.example.com'])
+        assert _read(path) == content
+        assert restarted.serial == 2024030502
+
+        assert restarted.update('1.1.1.4', ['www.example.com'])
+        assert restarted.serial == 2024030503
+
+
+@_with_fixed_date
+def test_zone_glue_for_in_zone_nameserver():
+    """区域内的NS自动生成A记录，可指定地址；已在域名列表中或在区域外时不重复生成"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'example.com.zone')
+        ZoneTarget(path, 'example.com').update('1.1.1.1', ['www.example.com'])
+        assert _records(_read(path)) == [['www', 'IN', 'A', '1.1.1.1'],
+                                         ['ns', 'IN', 'A', '1.1.1.1']]
+
+        ZoneTarget(path, 'example.com', nameserver_ip='10.0.0.53').update(
+            '1.1.1.1', ['www.example.com'])
+        assert ['ns', 'IN', 'A', '10.0.0.53'] in _records(_read(path))
+
+        ZoneTarget(path, 'example.com').update('1.1.1.1', ['ns.example.com', 'example.com'])
+        assert _records(_read(path)) == [['ns', 'IN', 'A', '1.1.1.1'],
+                                         ['@', 'IN', 'A', '1.1.1.1']]
+
+        ZoneTarget(path, 'example.com', nameserver='ns1.provider.net.').update(
+            '1.1.1.1', ['www.example.com'])
+        content = _read(path)
+        assert _records(content) == [['www', 'IN', 'A', '1.1.1.1']]
+        assert '@\tIN\tNS\tns1.provider.net.\n' in content
+
+
+@_with_fixed_date
+def test_zone_skips_out_of_zone_domains():
+    """只写入属于区域的域名（不含仅后缀相同的域名），静态覆盖同样按区域过滤"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'example.com.zone')
+        target = ZoneTarget(path, 'example.com.')
+        target.update('1.1.1.1', ['a.example.com', 'b.a.example.com.', 'badexample.com', 'x.org'],
+                      {'nas.example.com': '192.168.1.10', 'nas.other.net': '192.168.1.11'})
+        names = [record[0] for record in _records(_read(path))]
+        assert names == ['a', 'b.a', 'nas', 'ns']
+        assert '$ORIGIN example.com.\n' in _read(path)
+
+
+def test_from_config_fleet_suffix():
+    """舰队模式下输出文件名加上 _<name> 后缀，各路由器写入各自的文件"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = {
+            'resolver_outputs': [
+                {'format': 'zone', 'path': os.path.join(work_dir, 'example.com.zone'),
+                 'origin': 'example.com'},
+                {'format': 'dnsmasq', 'path': os.path.join(work_dir, 'wan.conf')},
+                {'format': 'json', 'path': os.path.join(work_dir, 'wan')}
+            ],
+            'hosts_overrides': {'nas.example.com': '192.168.1.10'}
+        }
+        outputs = ResolverOutputs.from_config(config, name='home')
+        zone, dnsmasq, json_target = outputs.targets
+        assert isinstance(zone, ZoneTarget) and zone.origin == 'example.com'
+        assert isinstance(dnsmasq, DnsmasqTarget) and isinstance(json_target, JsonTarget)
+        assert [os.path.basename(target.path) for target in outputs.targets] == \
+            ['example.com_home.zone', 'wan_home.conf', 'wan_home']
+
+        written = outputs.update('1.1.1.1', ['www.example.com'])
+        assert written == [target.path for target in outputs.targets]
+        assert 'address=/nas.example.com/192.168.1.10\n' in _read(dnsmasq.path)
+
+        # 未指定名称时使用配置中的路径
+        single = ResolverOutputs.from_config(config)
+        assert [os.path.basename(target.path) for target in single.targets] == \
+            ['example.com.zone', 'wan.conf', 'wan']
+
+        try:
+            ResolverOutputs.from_config({'resolver_outputs': [{'format': 'bind', 'path': 'x'}]})
+            assert False, "不支持的格式应抛出异常"
+        except ValueError:
+            pass
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
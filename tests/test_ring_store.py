@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+内存映射环形存储测试
+验证24字节定长记录、容量满后覆盖最旧的记录、重新打开时恢复写入位置以及只读打开
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils import ring_store
+from utils.ring_store import MmapRingStore
+
+START = datetime(2024, 1, 1)
+
+
+def _record(index, ip=None, proto='pppoe', latency=5.0, **wan_status):
+    wan_status.update({'ipaddr': ip or f'10.0.{index // 256}.{index % 256}', 'proto': proto})
+    return {'timestamp': (START + timedelta(minutes=index)).isoformat(),
+            'latency_ms': latency,
+            'data': {'network': {'wan_status': wan_status}, 'error_code': 0}}
+
+
+def test_record_layout():
+    """每条记录24字节，文件大小固定为 文件头 + 容量 x 记录长度"""
+    assert ring_store._RECORD.size == 24
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'wan_history.ring')
+        store = MmapRingStore(data_file, max_records=10)
+        assert os.path.getsize(data_file) == ring_store._HEADER_SIZE + 10 * 24
+        store.append(_record(1))
+        assert os.path.getsize(data_file) == ring_store._HEADER_SIZE + 10 * 24
+        store.close()
+
+
+def test_round_trip_key_fields():
+    """保存IP、协议、在线状态、延迟和错误码，没有up字段时按是否有IP判断"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = MmapRingStore(os.path.join(work_dir, 'wan_history.ring'), max_records=10)
+        store.append(_record(1, link_status=1))
+        store.append(_record(2, ip='0.0.0.0', proto='dhcp', latency=None))
+        store.append(_record(3, proto='unknown-proto', up=False))
+        first, second, third = list(store)
+
+        assert first['timestamp'] == (START + timedelta(minutes=1)).isoformat()
+        assert first['data']['network']['wan_status'] == \
+            {'proto': 'pppoe', 'ipaddr': '10.0.0.1', 'up': True}
+        assert first['latency_ms'] == 5.0
+        assert second['data']['network']['wan_status'] == \
+            {'proto': 'dhcp', 'ipaddr': None, 'up': False}
+        assert second['latency_ms'] is None
+        assert third['data']['network']['wan_status']['proto'] == ''
+        assert third['data']['network']['wan_status']['up'] is False
+        store.close()
+
+
+def test_ip_round_trip():
+    """IP以4字节整数保存，边界地址可以还原"""
+    ips = ['0.0.0.1', '1.2.3.4', '192.168.255.255', '255.255.255.255']
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = MmapRingStore(os.path.join(work_dir, 'wan_history.ring'), max_records=10)
+        for index, ip in enumerate(ips):
+            store.append(_record(index, ip=ip))
+        assert [r['data']['network']['wan_status']['ipaddr'] for r in store] == ips
+        store.close()
+
+
+def test_wrap_around_at_capacity():
+    """写满后覆盖最旧的记录，按时间顺序读取"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = MmapRingStore(os.path.join(work_dir, 'wan_history.ring'), max_records=5)
+        for index in range(12):
+            assert store.append(_record(index)) == min(index + 1, 5)
+        assert store.written == 12
+        assert store.record_count == 5
+        ips = [r['data']['network']['wan_status']['ipaddr'] for r in store]
+        assert ips == [f'10.0.0.{index}' for index in range(7, 12)]
+        assert [r['data']['network']['wan_status']['ipaddr'] for r in store.tail(2)] == \
+            ['10.0.0.10', '10.0.0.11']
+        assert len(store.tail(100)) == 5
+        store.close()
+
+
+def test_reopen_recovers_position():
+    """重新打开已有文件时恢复累计写入数，继续写入位置；容量不同时沿用文件的容量"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'wan_history.ring')
+        store = MmapRingStore(data_file, max_records=5)
+        for index in range(7):
+            store.append(_record(index))
+        store.close()
+
+        reopened = MmapRingStore(data_file, max_records=50)
+        assert reopened.capacity == 5
+        assert reopened.written == 7
+        reopened.append(_record(7))
+        ips = [r['data']['network']['wan_status']['ipaddr'] for r in reopened]
+        assert ips == [f'10.0.0.{index}' for index in range(3, 8)]
+
+        reader = MmapRingStore(data_file, read_only=True)
+        assert list(reader) == list(reopened)
+        reader.close()
+        reopened.close()
+
+
+def test_invalid_file_is_recreated():
+    """文件头无效时重新创建"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_file = os.path.join(work_dir, 'wan_history.ring')
+        with open(data_file, 'wb') as f:
+            f.write(b'not a ring file' * 10)
+        store = MmapRingStore(data_file, max_records=4)
+        assert store.capacity == 4 and store.record_count == 0
+        store.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
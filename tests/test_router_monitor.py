@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+路由器客户端测试
+验证连接复用统计的计算，以及登录、ds查询和WAN状态查询共用同一个keep-alive连接
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from urllib3.connectionpool import HTTPConnectionPool
+
+from core.router_monitor import RouterMonitor
+from router_simulator import RouterSimulator
+
+
+class _Pools:
+    """模拟连接池管理器中的 pools（RecentlyUsedContainer），已淘汰的键返回None"""
+
+    def __init__(self, pools):
+        self.pools = pools
+
+    def keys(self):
+        return list(self.pools)
+
+    def get(self, key):
+        return self.pools[key]
+
+
+def test_session_stats_from_pools():
+    """按连接池中新建的连接数计算复用率，跳过已淘汰的连接池"""
+    router = RouterMonitor('127.0.0.1:9')
+    stats = router.get_session_stats()
+    assert stats == {'requests': 0, 'connections': 0, 'reused': 0, 'reuse_ratio': 0.0}
+
+    poolmanager = router.adapter.poolmanager
+    router.adapter.poolmanager = SimpleNamespace(pools=_Pools({
+        'a': SimpleNamespace(num_connections=2),
+        'b': SimpleNamespace(num_connections=1),
+        'evicted': None
+    }))
+    router.request_count = 12
+    stats = router.get_session_stats()
+    assert stats == {'requests': 12, 'connections': 3, 'reused': 9, 'reuse_ratio': 0.75}
+
+    # 新建的连接多于请求（连接失败后重连）时复用数不为负
+    router.request_count = 2
+    assert router.get_session_stats()['reused'] == 0
+    router.adapter.poolmanager = poolmanager
+    router.close()
+
+
+def test_one_connection_for_login_query_and_status():
+    """登录、ds查询、WAN状态和主机表请求复用同一个连接"""
+    simulator = RouterSimulator().start()
+    new_conn = HTTPConnectionPool._new_conn
+    opened = []
+
+    def counting_new_conn(pool):
+        opened.append(pool.host)
+        return new_conn(pool)
+
+    HTTPConnectionPool._new_conn = counting_new_conn
+    router = RouterMonitor(simulator.address)
+    try:
+        config = {'encrypt_password': router.encrypt_pwd('admin123')}
+        stok = router.login(encrypt_password=config['encrypt_password'])['stok']
+        result = router.execute_query(router.query().name('network', 'wan_status'), stok)
+        assert result.ok and result.name('network', 'wan_status')['ipaddr'] == simulator.ip
+
+        config['stok'] = stok
+        status = router.get_wan_status_with_auth(config)
+        assert router.extract_wan_ip(status) == simulator.ip
+        assert 'host_info' in router.get_all_host(stok=stok)
+
+        stats = router.get_session_stats()
+        assert stats == {'requests': 4, 'connections': 1, 'reused': 3, 'reuse_ratio': 0.75}
+        assert opened == ['127.0.0.1']
+        assert simulator.stats['logins'] == 1
+    finally:
+        HTTPConnectionPool._new_conn = new_conn
+        router.close()
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+运行状态快照测试
+验证序号递增、组件处理记录、IP在A -> B -> A变化时的判断，以及只在变化时保存和重启后恢复
+"""
+import sys
+import os
+import json
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.runtime_state import RuntimeState
+
+
+def test_observe_and_mark():
+    """IP变化时序号加一，组件处理后为最新"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        state = RuntimeState(os.path.join(work_dir, 'runtime_state.json'))
+        assert state.observe('10.0.0.1') == 1
+        assert state.observe('10.0.0.1') == 1
+        assert not state.is_current('hosts', '10.0.0.1')
+
+        state.mark('hosts', '10.0.0.1')
+        assert state.is_current('hosts', '10.0.0.1')
+        assert not state.is_current('git', '10.0.0.1')
+        assert state.applied_ip('hosts') == '10.0.0.1'
+        assert state.applied_ip('git') is None
+
+        # 已不是最新IP的处理结果不记录
+        assert state.observe('10.0.0.2') == 2
+        state.mark('git', '10.0.0.1')
+        assert state.applied_ip('git') is None
+        assert not state.is_current('hosts', '10.0.0.2')
+
+
+def test_ip_changed_back_is_not_current():
+    """A -> B -> A：组件只处理过第一次的A时仍需要处理"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        state = RuntimeState(os.path.join(work_dir, 'runtime_state.json'))
+        state.observe('10.0.0.1')
+        state.mark('notifier', '10.0.0.1')
+        state.observe('10.0.0.2')
+        assert state.observe('10.0.0.1') == 3
+        assert state.applied_ip('notifier') == '10.0.0.1'
+        assert not state.is_current('notifier', '10.0.0.1')
+
+
+def test_saves_only_on_change_and_restores():
+    """内容不变时不写文件，重新加载后恢复"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        state_file = os.path.join(work_dir, 'runtime_state.json')
+        state = RuntimeState(state_file)
+        state.observe('10.0.0.1')
+        state.mark('hosts', '10.0.0.1')
+        mtime = os.stat(state_file).st_mtime_ns
+        os.utime(state_file, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+        state.observe('10.0.0.1')
+        state.mark('hosts', '10.0.0.1')
+        assert os.stat(state_file).st_mtime_ns == mtime - 10 ** 9
+        assert os.listdir(work_dir) == ['runtime_state.json']
+
+        restored = RuntimeState(state_file)
+        assert restored.last_ip == '10.0.0.1'
+        assert restored.sequence == 1
+        assert restored.is_current('hosts', '10.0.0.1')
+
+
+def test_ignores_corrupt_or_other_version():
+    """快照损坏或版本不匹配时从空状态开始"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        state_file = os.path.join(work_dir, 'runtime_state.json')
+        with open(state_file, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        assert RuntimeState(state_file).last_ip is None
+
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': RuntimeState.VERSION + 1, 'last_ip': '10.0.0.1'}, f)
+        state = RuntimeState(state_file)
+        assert state.last_ip is None and state.sequence == 0
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+轮询调度测试
+验证IP变化和失败后的快速轮询、持续失败时的指数退避，以及截止时间不漂移
+"""
+import sys
+import os
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.scheduler import PollScheduler
+
+
+def test_burst_after_change():
+    """IP变化后按快速间隔轮询burst_count次，然后恢复正常间隔"""
+    scheduler = PollScheduler(base_interval=60, burst_count=2, burst_interval=5)
+    assert scheduler.next_interval(PollScheduler.OK) == 60
+    assert scheduler.next_interval(PollScheduler.CHANGED) == 5
+    assert scheduler.next_interval(PollScheduler.OK) == 5
+    assert scheduler.next_interval(PollScheduler.OK) == 60
+
+
+def test_backoff_on_failures():
+    """失败后先快速重试，之后指数退避到上限，成功后重置"""
+    scheduler = PollScheduler(base_interval=60, backoff_factor=2, max_interval=300,
+                              burst_count=2, burst_interval=5)
+    intervals = [scheduler.next_interval(PollScheduler.FAILED) for _ in range(6)]
+    assert intervals == [5, 5, 120, 240, 300, 300]
+    assert scheduler.get_stats()['consecutive_failures'] == 6
+    assert scheduler.next_interval(PollScheduler.OK) == 60
+    assert scheduler.consecutive_failures == 0
+
+
+def test_jitter_bounds():
+    """抖动在±jitter比例内"""
+    scheduler = PollScheduler(base_interval=100, jitter=0.1)
+    for _ in range(100):
+        assert 90 <= scheduler.next_interval(PollScheduler.OK) <= 110
+
+
+def test_advance_does_not_drift():
+    """截止时间按上一个截止时间累加，轮询耗时超过间隔时跳过错过的截止时间"""
+    scheduler = PollScheduler(base_interval=0.2, burst_count=0)
+    scheduler.start()
+    first = scheduler.next_deadline
+    time.sleep(0.05)
+    wait = scheduler.advance(PollScheduler.OK)
+    assert abs(scheduler.next_deadline - (first + 0.2)) < 1e-9
+    assert 0.1 < wait < 0.2
+
+    time.sleep(0.5)
+    assert scheduler.advance(PollScheduler.OK) == 0
+    assert scheduler.get_stats()['missed_deadlines'] == 1
+
+
+def test_from_config():
+    """从配置读取参数，快速间隔不超过正常间隔"""
+    scheduler = PollScheduler.from_config({'poll_interval': 30, 'poll_burst_interval': 45,
+                                           'poll_max_interval': 10})
+    assert scheduler.base_interval == 30
+    assert scheduler.burst_interval == 30
+    assert scheduler.max_interval == 30
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+分段历史存储测试
+验证按时段切换分段、gzip/zstd压缩、按分段数和天数清理、修改分段周期后的清理以及tail复用读取器
+"""
+import sys
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils import segment_store
+from utils.history_store import JsonlHistoryStore
+from utils.segment_store import SegmentedHistoryStore
+
+START = datetime(2024, 1, 1)
+
+
+def _record(ts, index):
+    return {'timestamp': ts.isoformat(), 'latency_ms': 5.0,
+            'data': {'network': {'wan_status': {'ipaddr': f'10.0.0.{index % 250}',
+                                                'up_time': index}}}}
+
+
+def _fill(store, days, per_day=3):
+    records = []
+    for day in range(days):
+        for index in range(per_day):
+            record = _record(START + timedelta(days=day, hours=index), len(records))
+            store.append(record)
+            records.append(record)
+    return records
+
+
+def _wait(store):
+    deadline = time.monotonic() + 5
+    while store._maintaining and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._maintaining
+
+
+def _files(data_dir):
+    return sorted(name for name in os.listdir(data_dir) if name != 'index.json')
+
+
+def _check_rotation_and_compression(suffix):
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = SegmentedHistoryStore(data_dir, 'day')
+        assert store.compressed_suffix == suffix
+        records = _fill(store, 3)
+        _wait(store)
+        assert _files(data_dir) == [f'20240101.jsonl{suffix}', f'20240102.jsonl{suffix}',
+                                    '20240103.jsonl']
+        assert list(store) == records
+        assert store.tail(4) == records[-4:]
+        store.close()
+
+        # 重新打开时已压缩分段的记录数从索引读取
+        reopened = SegmentedHistoryStore(data_dir, 'day')
+        assert reopened.record_count == 9
+        assert reopened._index == {f'20240101.jsonl{suffix}': 3, f'20240102.jsonl{suffix}': 3}
+        reopened.close()
+
+
+def test_rotation_and_gzip():
+    """进入新的一天时切换分段，已结束的分段用gzip压缩，读取时透明解压"""
+    zstandard = segment_store.zstandard
+    segment_store.zstandard = None
+    try:
+        _check_rotation_and_compression('.gz')
+    finally:
+        segment_store.zstandard = zstandard
+
+
+def test_rotation_and_zstd():
+    """安装了zstandard时用zstd压缩（未安装时只测试gzip）"""
+    if segment_store.zstandard is None:
+        return
+    _check_rotation_and_compression('.zst')
+
+
+def test_retention_by_segment_count():
+    """分段数超出上限时从最旧的分段开始删除，记录数同步减少"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = SegmentedHistoryStore(data_dir, 'day', max_segments=2)
+        records = _fill(store, 4)
+        _wait(store)
+        assert [name.split('.')[0] for name in _files(data_dir)] == ['20240103', '20240104']
+        assert store.record_count == 6
+        assert list(store) == records[-6:]
+        store.close()
+
+
+def test_retention_after_period_change():
+    """修改分段周期后旧周期的分段仍按天数清理，无法识别时间的分段不阻止清理"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = SegmentedHistoryStore(data_dir, 'day')
+        _fill(store, 2)
+        _wait(store)
+        store.close()
+        # 无法识别时间的分段，排在两个按天的分段之间
+        with open(os.path.join(data_dir, '202401015.jsonl'), 'wb'):
+            pass
+
+        store = SegmentedHistoryStore(data_dir, 'hour', max_age_days=30)
+        now = datetime.now()
+        store.append(_record(now, 0))
+        _wait(store)
+        suffix = store.compressed_suffix
+        # 20240101的结束时间无法识别，保留；之后的分段照常清理，
+        # 20240102的结束时间是当前分段的开始时间，未过期
+        assert _files(data_dir) == [f'20240101.jsonl{suffix}', f'20240102.jsonl{suffix}',
+                                    now.strftime('%Y%m%d%H') + '.jsonl']
+        store.close()
+
+
+def test_tail_reuses_reader():
+    """tail读取未压缩的已结束分段时复用读取器，不重复统计整个文件"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = SegmentedHistoryStore(data_dir, 'day')
+        records = _fill(store, 2)
+        _wait(store)
+        store.close()
+        # 最后一个分段未压缩，只读打开时不会被压缩
+        reader = SegmentedHistoryStore(data_dir, 'day', read_only=True)
+
+        counted = []
+        count_records = JsonlHistoryStore._count_records
+
+        def counting(self):
+            counted.append(self.data_file)
+            return count_records(self)
+
+        JsonlHistoryStore._count_records = counting
+        try:
+            for _ in range(3):
+                assert reader.tail(5) == records[-5:]
+        finally:
+            JsonlHistoryStore._count_records = count_records
+        assert counted == [os.path.join(data_dir, '20240102.jsonl')]
+        reader.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+stok会话管理测试
+使用可控时钟验证stok有效期的学习、在截止时间前主动刷新，以及后台刷新线程
+"""
+import sys
+import os
+import time
+from datetime import datetime
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.ds_query import DsQuery, DsResult
+from core.session_manager import StokSessionManager
+
+START = datetime(2024, 1, 1, 8, 0).timestamp()
+
+
+class _Clock:
+    """可手动推进的时钟"""
+
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class _Router:
+    """模拟路由器：每次登录签发新的stok，超过有效期后查询返回stok失效"""
+
+    def __init__(self, clock, lifetime):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.issued = {}
+        self.logins = 0
+
+    def encrypt_pwd(self, password):
+        return 'encrypted'
+
+    def login(self, encrypt_password=None, deadline=None):
+        self.logins += 1
+        stok = f'stok{self.logins}'
+        self.issued[stok] = self.clock()
+        return {'stok': stok}
+
+    def execute_query(self, query, stok, deadline=None):
+        issued_at = self.issued.get(stok)
+        if issued_at is None or self.clock() - issued_at >= self.lifetime:
+            return DsResult({'error_code': -40401})
+        return DsResult({'error_code': 0})
+
+
+def _session(lifetime=600, **options):
+    clock = _Clock()
+    router = _Router(clock, lifetime)
+    session = StokSessionManager(router, {'password': 'p'}, clock=clock, **options)
+    return session, router, clock
+
+
+def _poll(session, clock, seconds, interval=60):
+    """按间隔轮询一段时间"""
+    for _ in range(int(seconds // interval)):
+        clock.advance(interval)
+        assert session.query(DsQuery()).ok
+
+
+def test_lifetime_learned_from_last_success():
+    """过期时以最后一次成功使用的时间作为有效期的保守估计"""
+    session, router, clock = _session(lifetime=610)
+    assert session.estimated_lifetime() is None
+    assert session.query(DsQuery()).ok
+    assert session.config['last_login_time'] == datetime.fromtimestamp(START).isoformat()
+    assert session.seconds_until_refresh() is None
+
+    _poll(session, clock, 600)
+    clock.advance(60)
+    assert session.query(DsQuery()).ok
+    assert router.logins == 2
+    assert session.estimated_lifetime() == 600
+    assert session.stats['expiries'] == 1
+    # 新的stok在有效期的80%处刷新
+    assert session.seconds_until_refresh() == 480
+
+
+def test_short_expiry_not_learned():
+    """小于min_lifetime的过期视为被其他登录挤掉，不参与学习；多个观测取最小值"""
+    session, router, clock = _session(lifetime=30, min_lifetime=60)
+    session.query(DsQuery())
+    clock.advance(40)
+    assert session.query(DsQuery()).ok
+    assert session.stats['expiries'] == 1
+    assert session.estimated_lifetime() is None
+
+    router.lifetime = 900
+    for lifetime in (850, 650):
+        clock.advance(lifetime)
+        assert session.query(DsQuery()).ok
+        clock.advance(100)
+        assert session.query(DsQuery()).ok
+        router.lifetime = 700
+    assert session.stats['expiries'] == 3
+    assert list(session.lifetime_samples) == [850, 650]
+    assert session.estimated_lifetime() == 650
+
+
+def test_refresh_ahead_of_deadline():
+    """到达有效期的refresh_margin处才主动登录，轮询因此不会遇到过期"""
+    session, router, clock = _session(lifetime=600, default_lifetime=600, refresh_margin=0.5)
+    session.query(DsQuery())
+    assert session.seconds_until_refresh() == 300
+
+    clock.advance(299)
+    assert not session.maybe_refresh()
+    assert session.seconds_until_refresh() == 1
+    clock.advance(1)
+    assert session.maybe_refresh()
+    assert session.config['stok'] == 'stok2'
+    assert session.seconds_until_refresh() == 300
+
+    for _ in range(10):
+        _poll(session, clock, 300)
+        assert session.maybe_refresh()
+    assert session.stats['expiries'] == 0
+    assert session.stats['proactive_refreshes'] == 11
+    stats = session.get_stats()
+    assert stats['reuse_ratio'] == stats['stok_reused'] / stats['queries']
+
+
+def test_refresh_uses_saved_login_time():
+    """重启后按配置中保存的登录时间计算刷新时间"""
+    clock = _Clock(START + 500)
+    router = _Router(clock, 600)
+    config = {'password': 'p', 'stok': 'saved',
+              'last_login_time': datetime.fromtimestamp(START).isoformat()}
+    session = StokSessionManager(router, config, default_lifetime=600, clock=clock)
+    assert session.seconds_until_refresh() == 0
+    assert session.maybe_refresh()
+    assert config['stok'] == 'stok1'
+    assert config['last_login_time'] == datetime.fromtimestamp(START + 500).isoformat()
+
+
+def test_background_refresh_thread():
+    """后台线程在到达刷新时间时登录，stop后退出"""
+    session, router, clock = _session(lifetime=600, default_lifetime=600)
+    session.query(DsQuery())
+    clock.advance(480)
+    session.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not session.stats['proactive_refreshes'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert session.stats['proactive_refreshes'] == 1
+        assert router.logins == 2
+    finally:
+        session.stop()
+    assert not session._thread.is_alive()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")
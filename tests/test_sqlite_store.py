@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding:utf8 -*-
+"""
+SQLite历史存储测试
+验证批量提交、按时间范围查询、提交失败时数据不丢失、在线状态统计以及只读打开
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.sqlite_store import SqliteHistoryStore
+
+
+def _record(timestamp, ip, up=1):
+    return {'timestamp': timestamp.isoformat(), 'latency_ms': 5.0,
+            'data': {'network': {'wan_status': {'ipaddr': ip, 'proto': 'pppoe', 'up': up}}}}
+
+
+def test_batch_commit_and_range_query():
+    """按批提交，按时间范围查询"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = SqliteHistoryStore(os.path.join(work_dir, 'history.db'), batch_size=3)
+        start = datetime(2024, 1, 1)
+        for index in range(10):
+            store.append(_record(start + timedelta(minutes=index), f'10.0.0.{index}'))
+        records = list(store.samples_between(start + timedelta(minutes=2),
+                                             start + timedelta(minutes=5)))
+        assert [r['data']['network']['wan_status']['ipaddr'] for r in records] == \
+            ['10.0.0.2', '10.0.0.3', '10.0.0.4']
+        assert len(store.tail(4)) == 4
+        store.close()
+
+
+def test_failed_commit_keeps_pending_rows():
+    """提交失败时数据保留，下次提交时写入"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_file = os.path.join(work_dir, 'history.db')
+        store = SqliteHistoryStore(db_file, batch_size=100)
+        # 让插入失败，模拟数据库被锁定等错误
+        store._conn.execute("CREATE TRIGGER fail BEFORE INSERT ON samples "
+                            "BEGIN SELECT RAISE(ABORT, 'simulated failure'); END")
+        start = datetime(2024, 1, 1)
+        for index in range(3):
+            store.append(_record(start + timedelta(minutes=index), '10.0.0.1'))
+        store.record_ip_change('10.0.0.1', '10.0.0.2', start)
+        store.flush()
+        assert len(store._pending_samples) == 3
+
+        store._conn.execute("DROP TRIGGER fail")
+        store.flush()
+        assert not store._pending_samples
+        assert len(list(store)) == 3
+        assert len(store.ip_changes_between()) == 1
+        store.close()
+
+
+def test_summary_without_up_field():
+    """真实路由器的WAN状态没有up字段时按是否有IP统计在线状态，旧版本的NULL也一样"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = SqliteHistoryStore(os.path.join(work_dir, 'history.db'), batch_size=1)
+        start = datetime(2024, 1, 1)
+        for index, ip in enumerate(['10.0.0.1', '0.0.0.0', '', '10.0.0.2']):
+            store.append({'timestamp': (start + timedelta(minutes=index)).isoformat(),
+                          'data': {'network': {'wan_status': {
+                              'ipaddr': ip, 'proto': 'dhcp', 'link_status': 1,
+                              'up_time': 100}}}})
+        # 旧版本写入的up为NULL
+        store._conn.execute("UPDATE samples SET up = NULL WHERE ip = '10.0.0.2'")
+        store._conn.commit()
+
+        summary = store.summary()
+        assert summary['samples'] == 4
+        assert summary['up_samples'] == 2
+        assert summary['availability'] == 0.5
+        assert summary['downtime_seconds'] == 120
+        store.close()
+
+
+def test_read_only_does_not_modify():
+    """只读打开时不建表，不能写入"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_file = os.path.join(work_dir, 'history.db')
+        store = SqliteHistoryStore(db_file)
+        store.append(_record(datetime(2024, 1, 1), '10.0.0.1'))
+        store.close()
+
+        reader = SqliteHistoryStore(db_file, read_only=True)
+        assert len(list(reader)) == 1
+        try:
+            reader._conn.execute('DELETE FROM samples')
+            assert False, "只读连接不应允许写入"
+        except sqlite3.OperationalError:
+            pass
+        reader.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✓ {name}")